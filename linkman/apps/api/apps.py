@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.api"
+
+    def ready(self) -> None:
+        from django.db.backends.signals import connection_created
+
+        from .metrics import install_query_timer
+
+        # count and time the queries of every connection, see `metrics.py`
+        connection_created.connect(install_query_timer)
@@ -0,0 +1,164 @@
+"""
+This module stores the async versions of the `api` views
+
+They are routed instead of the views of `views.py` when the project is served
+over ASGI with `ASYNC_API=True` (see `settings.py` for why this is opt-in and
+`gunicorn.conf.py`). Every middleware is async capable and reads go through
+the async ORM, so a worker keeps serving other requests while it waits on the
+database, the cache or a slow client. Writes are rare compared to reads and
+share their validation with the sync views, so they are delegated to the sync
+views through `sync_to_async`.
+"""
+
+from functools import wraps
+from typing import Any, Awaitable, Callable
+
+from asgiref.sync import sync_to_async
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.cache import cache_control
+
+from ..api import cache, pagination, utils, views
+from ..api.serializers import GROUP_SCHEMA, LINK_SCHEMA, USER_SCHEMA, JsonResponse
+from ..authentication.models import CustomUser
+from ..main.models import Group, Link
+
+AsyncView = Callable[..., Awaitable[HttpResponse]]
+AsyncEtagFunc = Callable[..., Awaitable[str | None]]
+
+READ_METHODS: tuple[str, ...] = ("GET", "HEAD")
+
+
+def async_condition(etag_func: AsyncEtagFunc) -> Callable[[AsyncView], AsyncView]:
+    """
+    Async version of `django.views.decorators.http.condition`
+    :param etag_func: Coroutine function computing the ETag of the response
+    :return: View decorator answering conditional requests with a 304
+    """
+
+    # `condition` calls its etag function synchronously, which can not load the user
+    def decorator(view: AsyncView) -> AsyncView:
+        @wraps(view)
+        async def inner(
+            request: HttpRequest, *args: Any, **kwargs: Any
+        ) -> HttpResponse:
+            etag: str | None = await etag_func(request, *args, **kwargs)
+            response: HttpResponse | None = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if etag and request.method in READ_METHODS:
+                response.headers.setdefault("ETag", etag)
+            return response
+
+        return inner
+
+    return decorator
+
+
+@cache_control(private=True, no_cache=True)
+@async_condition(cache.adata_version_etag)
+async def group_all(request: HttpRequest) -> HttpResponse:
+    if request.method not in READ_METHODS:
+        return await sync_to_async(views.group_all)(request)
+    # Request is a simple api/group GET
+    user = await request.auser()
+    if not utils.validate_authentication(user):
+        return JsonResponse({"detail": "User not authenticated"}, status=401)
+    assert isinstance(user, CustomUser)
+    params: dict[str, Any] = request.GET.dict()
+
+    async def build_listing() -> dict[str, Any]:
+        groups, next_cursor = await pagination.apaginate(
+            Group.objects.for_user(user), params, pagination.GROUP_FIELDS
+        )
+        return {"groups": groups, "next_cursor": next_cursor}
+
+    try:
+        body: bytes = await cache.aget_cached_listing(
+            user.pk, "groups", params, build_listing
+        )
+    except pagination.PaginationError as e:
+        return JsonResponse({"detail": str(e)}, status=400)
+    return HttpResponse(body, content_type="application/json")
+
+
+@cache_control(private=True, no_cache=True)
+@async_condition(cache.adata_version_etag)
+async def group_one(request: HttpRequest, group_id: int) -> HttpResponse:
+    if request.method not in READ_METHODS:
+        return await sync_to_async(views.group_one)(request, group_id)
+    # Request is a simple api/groups/id GET
+    user = await request.auser()
+    if not utils.validate_authentication(user):
+        return JsonResponse({"detail": "User not authenticated"}, status=401)
+    assert isinstance(user, CustomUser)
+    group: Group | None = (
+        await Group.objects.for_user(user).filter(id=group_id).afirst()
+    )
+    if not group:
+        return JsonResponse({"detail": "Group not found"}, status=404)
+    group_data: dict[str, Any] = GROUP_SCHEMA.serialize(group)
+    return JsonResponse({"detail": "group found", "group": group_data}, status=200)
+
+
+@cache_control(private=True, no_cache=True)
+@async_condition(cache.adata_version_etag)
+async def link_all(request: HttpRequest) -> HttpResponse:
+    if request.method not in READ_METHODS:
+        return await sync_to_async(views.link_all)(request)
+    # request is a simple /api/links GET
+    user = await request.auser()
+    if not utils.validate_authentication(user):
+        return JsonResponse({"detail": "User not authenticated"}, status=401)
+    assert isinstance(user, CustomUser)
+    params: dict[str, Any] = request.GET.dict()
+
+    async def build_listing() -> dict[str, Any]:
+        links, next_cursor = await pagination.apaginate(
+            pagination.filter_group(Link.objects.for_user(user), params.get("group")),
+            params,
+            pagination.LINK_FIELDS,
+            pagination.LINK_SORTS,
+        )
+        return {"links": links, "next_cursor": next_cursor}
+
+    try:
+        body: bytes = await cache.aget_cached_listing(
+            user.pk, "links", params, build_listing
+        )
+    except pagination.PaginationError as e:
+        return JsonResponse({"detail": str(e)}, status=400)
+    return HttpResponse(body, content_type="application/json")
+
+
+@cache_control(private=True, no_cache=True)
+@async_condition(cache.adata_version_etag)
+async def link_one(request: HttpRequest, link_id: int) -> HttpResponse:
+    if request.method not in READ_METHODS:
+        return await sync_to_async(views.link_one)(request, link_id)
+    # request is a simple /api/links/:id GET
+    user = await request.auser()
+    if not utils.validate_authentication(user):
+        return JsonResponse({"detail": "User not authenticated"}, status=401)
+    assert isinstance(user, CustomUser)
+    link: Link | None = await Link.objects.for_user(user).filter(id=link_id).afirst()
+    if link is None:
+        return JsonResponse({"detail": "Link does not exist"}, status=400)
+    link_data: dict[str, Any] = LINK_SCHEMA.serialize(link)
+    return JsonResponse({"detail": "Link found", "link": link_data}, status=200)
+
+
+@cache_control(private=True, no_cache=True)
+@async_condition(cache.auser_etag)
+async def users_one(request: HttpRequest) -> HttpResponse:
+    if request.method not in READ_METHODS:
+        return await sync_to_async(views.users_one)(request)
+    # request is a simple /api/users/:id GET
+    user = await request.auser()
+    if not utils.validate_authentication(user):
+        return JsonResponse({"detail": "User not authenticated"}, status=401)
+    assert isinstance(user, CustomUser)
+    user_data: dict[str, Any] = USER_SCHEMA.serialize(user)
+    return JsonResponse(
+        {"detail": "User successfully retrieved", "user": user_data}, status=201
+    )
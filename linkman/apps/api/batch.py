@@ -0,0 +1,448 @@
+"""
+This module stores the batch mutation logic of the `api` application
+
+A batch is a list of operations on the links and groups of one user:
+
+- `{"op": "create", "type": "group", "group_name": ...}`
+- `{"op": "create", "type": "link", "group_id": ..., "link_name": ..., "link_url": ...}`
+- `{"op": "update", "type": "group", "id": ..., "name": ...}`
+- `{"op": "update", "type": "link", "id": ..., "link_name": ..., "link_url": ...}`
+- `{"op": "move", "type": "link", "ids": [...], "group_id": ...}`
+- `{"op": "delete", "type": "group" | "link", "ids": [...]}`
+
+Every operation is validated first with one query for the referenced links
+and one for the referenced groups. If any operation is invalid nothing is
+applied. Otherwise the operations are applied in one transaction, grouped by
+kind so each kind is a single set based query no matter how many objects it
+touches. They are applied in this order: group creates, group updates, link
+creates, link updates, moves, link deletes, group deletes. So an object
+deleted in a batch is deleted even if an earlier operation of the same batch
+updated it.
+
+The `count` of a move or delete is the amount of rows it actually changed:
+the rows are locked before the set based query, and a row listed by two
+deletes of the batch only counts for the first one.
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Callable, Iterable
+
+from django.db import transaction
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from ..api import cache, deletion, schemas, sync
+from ..main.models import CustomUser, Group, Link, Tombstone
+from ..main.normalization import hash_url
+
+MAX_BATCH_OPERATIONS: int = 500
+BATCH_SIZE: int = 1000
+
+OPERATION_TYPES: dict[str, tuple[str, ...]] = {
+    "create": ("group", "link"),
+    "update": ("group", "link"),
+    "move": ("link",),
+    "delete": ("group", "link"),
+}
+
+
+# index of an operation -> result of the operation
+Results = dict[int, dict[str, Any]]
+Step = Callable[[CustomUser, list[dict[str, Any]], list[int], Results, datetime], None]
+
+
+class BatchError(ValueError):
+    """Raised when the batch itself is malformed"""
+
+
+def is_id(value: Any) -> bool:
+    """
+    Checks whether a value can be the id of a row
+    :param value: Raw value
+    :return: True if the value is an integer, `bool` is a subclass of `int` but not an id
+    """
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def parse_ids(value: Any) -> list[int] | None:
+    """
+    Parses the `ids` of an operation
+    :param value: Raw `ids` value
+    :return: List of unique ids, else None if the value is invalid
+    """
+    if not isinstance(value, list) or not value:
+        return None
+    if not all(is_id(item) for item in value):
+        return None
+    return list(dict.fromkeys(value))
+
+
+def validate_shape(operation: dict[str, Any]) -> str | None:
+    """
+    Validates the fields of one operation, without querying the database
+    :param operation: Operation to validate
+    :return: String explaining why the operation is invalid, else None
+    """
+    op: Any = operation.get("op")
+    kind: Any = operation.get("type")
+    if op not in OPERATION_TYPES or kind not in OPERATION_TYPES[op]:
+        return f"Unknown operation '{op} {kind}'"
+    if op in ("move", "delete"):
+        if parse_ids(operation.get("ids")) is None:
+            return "ids must be a non empty list of ids"
+    elif op == "update" and not is_id(operation.get("id")):
+        return "id is missing"
+    if (op, kind) in (("create", "link"), ("move", "link")):
+        if not schemas.GROUP_ID.is_valid(operation.get("group_id")):
+            return schemas.GROUP_ID.missing
+    if kind == "link" and op in ("create", "update"):
+        name: Any = operation.get("link_name")
+        if not schemas.LINK_NAME.is_valid(name):
+            return schemas.INVALID_LINK_NAME
+        url: Any = operation.get("link_url")
+        if not schemas.LINK_URL.is_valid(url):
+            return schemas.INVALID_LINK_URL
+    if kind == "group" and op in ("create", "update"):
+        name = operation.get("group_name" if op == "create" else "name")
+        if not schemas.GROUP_NAME.is_valid(name):
+            return schemas.INVALID_GROUP_NAME
+    return None
+
+
+def group_name(operation: dict[str, Any]) -> str:
+    """
+    Gets the name a `create group` or `update group` operation writes
+    :param operation: Valid operation
+    :return: Stripped group name
+    """
+    name: str = operation["group_name" if operation["op"] == "create" else "name"]
+    return name.strip()
+
+
+def referenced_ids(operation: dict[str, Any]) -> tuple[list[int], list[int]]:
+    """
+    Gets the ids of the existing objects an operation references
+    :param operation: Valid operation
+    :return: Tuple of (link ids, group ids)
+    """
+    ids: list[int] = parse_ids(operation.get("ids")) or []
+    if "id" in operation and operation["op"] == "update":
+        ids = [operation["id"]]
+    group_ids: list[int] = (
+        [operation["group_id"]] if is_id(operation.get("group_id")) else []
+    )
+    if operation["type"] == "link":
+        return ids, group_ids
+    return [], ids + group_ids
+
+
+def validate_batch(
+    user: CustomUser, operations: list[dict[str, Any]]
+) -> list[dict[str, Any]]:
+    """
+    Validates every operation of a batch
+    :param user: User the batch belongs to
+    :param operations: Operations to validate
+    :return: Errors of the invalid operations, empty if the batch is valid
+    """
+    errors: dict[int, str] = {}
+    link_ids: set[int] = set()
+    group_ids: set[int] = set()
+    new_group_names: list[str] = []
+    for index, operation in enumerate(operations):
+        error: str | None = validate_shape(operation)
+        if error is not None:
+            errors[index] = error
+            continue
+        operation_link_ids, operation_group_ids = referenced_ids(operation)
+        link_ids.update(operation_link_ids)
+        group_ids.update(operation_group_ids)
+        if operation["type"] == "group" and operation["op"] in ("create", "update"):
+            new_group_names.append(group_name(operation))
+    # one query per table for every referenced object, scoped to the user
+    owned_links: set[int] = set(
+        Link.objects.for_user(user).filter(id__in=link_ids).values_list("id", flat=True)
+    )
+    owned_groups: dict[int, str] = {}
+    taken_names: set[str] = set()
+    for group_id, name in (
+        Group.objects.for_user(user)
+        .filter(Q(id__in=group_ids) | Q(name__in=new_group_names))
+        .values_list("id", "name")
+    ):
+        owned_groups[group_id] = name
+        taken_names.add(name)
+    for index, operation in enumerate(operations):
+        if index in errors:
+            continue
+        operation_link_ids, operation_group_ids = referenced_ids(operation)
+        if not owned_links.issuperset(operation_link_ids):
+            errors[index] = "Link does not exist"
+        elif not owned_groups.keys() >= set(operation_group_ids):
+            errors[index] = "Group does not exist"
+        elif operation["type"] == "group" and operation["op"] in ("create", "update"):
+            new_name: str = group_name(operation)
+            # renaming a group to its current name is not a conflict
+            unchanged: bool = (
+                operation["op"] == "update"
+                and owned_groups[operation["id"]] == new_name
+            )
+            if new_name in taken_names and not unchanged:
+                errors[index] = f"A group with the name '{new_name}' already exists"
+            taken_names.add(new_name)
+    return [{"index": index, "detail": errors[index]} for index in sorted(errors)]
+
+
+def run_batch(
+    user: CustomUser, operations: list[dict[str, Any]]
+) -> list[dict[str, Any]]:
+    """
+    Applies a validated batch in one transaction
+    :param user: User the batch belongs to
+    :param operations: Operations validated by `validate_batch`
+    :return: Result of every operation, in the order of the operations
+    """
+    by_kind: dict[tuple[str, str], list[int]] = defaultdict(list)
+    for index, operation in enumerate(operations):
+        by_kind[(operation["op"], operation["type"])].append(index)
+    results: Results = {}
+    now: datetime = timezone.now()
+    steps: list[tuple[tuple[str, str], Step]] = [
+        (("create", "group"), create_groups),
+        (("update", "group"), update_groups),
+        (("create", "link"), create_links),
+        (("update", "link"), update_links),
+        (("move", "link"), move_links),
+        (("delete", "link"), delete_links),
+        (("delete", "group"), delete_groups),
+    ]
+    with transaction.atomic():
+        for kind, step in steps:
+            if by_kind[kind]:
+                step(user, operations, by_kind[kind], results, now)
+        cache.bump_data_version(user.pk)
+    return [{"index": index, **results[index]} for index in sorted(results)]
+
+
+def create_groups(
+    user: CustomUser,
+    operations: list[dict[str, Any]],
+    indexes: list[int],
+    results: Results,
+    now: datetime,
+) -> None:
+    """Creates the groups of the `create group` operations"""
+    groups: list[Group] = Group.objects.bulk_create(
+        [Group(user=user, name=group_name(operations[i])) for i in indexes],
+        batch_size=BATCH_SIZE,
+    )
+    CustomUser.objects.adjust_totals(user.pk, groups=len(groups))
+    for index, group in zip(indexes, groups):
+        results[index] = {"detail": "Group successfully created", "id": group.pk}
+
+
+def update_groups(
+    user: CustomUser,
+    operations: list[dict[str, Any]],
+    indexes: list[int],
+    results: Results,
+    now: datetime,
+) -> None:
+    """Renames the groups of the `update group` operations"""
+    Group.objects.bulk_update(
+        [
+            Group(
+                id=operations[i]["id"], name=group_name(operations[i]), updated_at=now
+            )
+            for i in indexes
+        ],
+        ["name", "updated_at"],
+        batch_size=BATCH_SIZE,
+    )
+    for index in indexes:
+        results[index] = {"detail": "Group Updated", "id": operations[index]["id"]}
+
+
+def create_links(
+    user: CustomUser,
+    operations: list[dict[str, Any]],
+    indexes: list[int],
+    results: Results,
+    now: datetime,
+) -> None:
+    """Creates the links of the `create link` operations"""
+    links: list[Link] = Link.objects.bulk_create(
+        [
+            Link(
+                user=user,
+                group_id=operations[i]["group_id"],
+                name=operations[i]["link_name"].strip(),
+                url=operations[i]["link_url"].strip(),
+                url_hash=hash_url(operations[i]["link_url"]),
+            )
+            for i in indexes
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    CustomUser.objects.adjust_totals(user.pk, links=len(links))
+    for index, link in zip(indexes, links):
+        results[index] = {"detail": "Link successfully created", "id": link.pk}
+
+
+def update_links(
+    user: CustomUser,
+    operations: list[dict[str, Any]],
+    indexes: list[int],
+    results: Results,
+    now: datetime,
+) -> None:
+    """Updates the links of the `update link` operations"""
+    Link.objects.bulk_update(
+        [
+            Link(
+                id=operations[i]["id"],
+                name=operations[i]["link_name"].strip(),
+                url=operations[i]["link_url"].strip(),
+                url_hash=hash_url(operations[i]["link_url"]),
+                updated_at=now,
+            )
+            for i in indexes
+        ],
+        ["name", "url", "url_hash", "updated_at"],
+        batch_size=BATCH_SIZE,
+    )
+    for index in indexes:
+        results[index] = {
+            "detail": "Link successfully updated",
+            "id": operations[index]["id"],
+        }
+
+
+def lock_ids(queryset: QuerySet[Any], ids: Iterable[int]) -> set[int]:
+    """
+    Locks the rows of the provided ids until the batch transaction ends
+    :param queryset: Rows the ids are looked up in, scoped to the user
+    :param ids: IDs of the rows to lock
+    :return: IDs of the rows that exist, the update or delete that follows changes exactly these
+    """
+    return set(
+        queryset.filter(id__in=list(ids))
+        .select_for_update(of=("self",))
+        .values_list("id", flat=True)
+    )
+
+
+def count_per_operation(
+    operations: list[dict[str, Any]],
+    indexes: list[int],
+    changed_ids: set[int],
+    shared: bool,
+) -> dict[int, int]:
+    """
+    Attributes the rows changed by a set based query to the operations that listed them
+    :param operations: Operations of the batch
+    :param indexes: Indexes of the operations the query applied
+    :param changed_ids: IDs of the rows the query changed
+    :param shared: Whether a row listed by many operations counts for each of them,
+        else it only counts for the first one (a row is deleted once)
+    :return: Dictionary of operation index to its amount of changed rows
+    """
+    remaining: set[int] = set(changed_ids)
+    counts: dict[int, int] = {}
+    for index in indexes:
+        ids: set[int] = set(parse_ids(operations[index]["ids"]) or [])
+        counts[index] = len(ids & remaining)
+        if not shared:
+            remaining -= ids
+    return counts
+
+
+def move_links(
+    user: CustomUser,
+    operations: list[dict[str, Any]],
+    indexes: list[int],
+    results: Results,
+    now: datetime,
+) -> None:
+    """Moves the links of the `move` operations"""
+    # one UPDATE ... WHERE id IN (...) per target group
+    targets: dict[int, list[int]] = defaultdict(list)
+    for index in indexes:
+        targets[operations[index]["group_id"]].extend(
+            parse_ids(operations[index]["ids"]) or []
+        )
+    existing: set[int] = lock_ids(
+        Link.objects.for_user(user), (i for ids in targets.values() for i in ids)
+    )
+    for group_id, link_ids in targets.items():
+        Link.objects.filter(id__in=existing.intersection(link_ids)).update(
+            group_id=group_id, updated_at=now
+        )
+    counts: dict[int, int] = count_per_operation(
+        operations, indexes, existing, shared=True
+    )
+    for index in indexes:
+        results[index] = {"detail": "Links successfully moved", "count": counts[index]}
+
+
+def delete_links(
+    user: CustomUser,
+    operations: list[dict[str, Any]],
+    indexes: list[int],
+    results: Results,
+    now: datetime,
+) -> None:
+    """Deletes the links of the `delete link` operations"""
+    link_ids: set[int] = set()
+    for index in indexes:
+        link_ids.update(parse_ids(operations[index]["ids"]) or [])
+    existing: set[int] = lock_ids(Link.objects.for_user(user), link_ids)
+    _, deleted = Link.objects.filter(id__in=existing).delete()
+    sync.record_deletions(user.pk, Tombstone.Kind.LINK, existing)
+    CustomUser.objects.adjust_totals(user.pk, links=-deleted.get(Link._meta.label, 0))
+    counts: dict[int, int] = count_per_operation(
+        operations, indexes, existing, shared=False
+    )
+    for index in indexes:
+        results[index] = {
+            "detail": "Links successfully deleted",
+            "count": counts[index],
+        }
+
+
+def delete_groups(
+    user: CustomUser,
+    operations: list[dict[str, Any]],
+    indexes: list[int],
+    results: Results,
+    now: datetime,
+) -> None:
+    """Deletes the groups of the `delete group` operations"""
+    group_ids: set[int] = set()
+    for index in indexes:
+        group_ids.update(parse_ids(operations[index]["ids"]) or [])
+    existing: set[int] = lock_ids(Group.objects.for_user(user), group_ids)
+    # the groups and their links are hidden now and purged in the background
+    deletion.soft_delete_groups(user.pk, existing)
+    counts: dict[int, int] = count_per_operation(
+        operations, indexes, existing, shared=False
+    )
+    for index in indexes:
+        results[index] = {"detail": "Groups deleted", "count": counts[index]}
+
+
+def parse_batch(data: Any) -> list[dict[str, Any]]:
+    """
+    Parses the body of a batch request
+    :param data: Decoded JSON body
+    :return: List of operations
+    """
+    operations: Any = data.get("operations") if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        raise BatchError("operations must be a non empty list")
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise BatchError(f"A batch can have at most {MAX_BATCH_OPERATIONS} operations")
+    if not all(isinstance(operation, dict) for operation in operations):
+        raise BatchError("Every operation must be an object")
+    return operations
@@ -0,0 +1,522 @@
+"""
+This module stores the benchmark suite of the `api` endpoints
+
+Every size seeds a dedicated user (`bench-{size}@linkman.invalid`) with
+`bulk_create`, so the numbers of different runs are measured on the same data.
+The seeded users are reused as long as they have the expected amount of links.
+
+The phases of `PHASES` are measured per size:
+
+- client: every scenario of `SCENARIOS`, reads and writes, is sent through the
+  Django test client. Reports the latency percentiles and the queries per
+  request, without any network or server in the way.
+- http: the read endpoints of `HTTP_PATHS` are driven by the `loadtest` load
+  generator against a local gunicorn (see `gunicorn.conf.py`), or against an
+  already running server. Reports the throughput and latency percentiles under
+  concurrency, optionally next to slow clients that tie up sync workers.
+- sessions: the queries and duration of a listing request per combination of
+  session engine and authentication backend, i.e. what the session and user
+  lookups cost before the view does any work.
+- connections: the latency of `/api/groups/` per database connection profile
+  of `CONNECTION_PROFILES` and gunicorn worker count. Sessions are stored in
+  the database so every request queries it.
+
+The serializers phase does not need a seeded user and runs once per run: it
+compares the per-object cost of the removed `serialize_object` implementation
+with the schema serializers of `serializers.py` on objects built in memory.
+
+The results are plain dictionaries, stored as JSON by the `benchmark` command
+so runs can be compared over time with `compare_results()`.
+"""
+
+import asyncio
+import json
+import platform
+import subprocess
+import time
+import timeit
+from pathlib import Path
+from typing import Any, Callable
+
+import django
+from django.conf import settings
+from django.core import serializers as django_serializers
+from django.db import connection, transaction
+from django.db.models import Model
+from django.http import HttpResponseBase
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ..api import utils
+from ..api.loadtest import create_session_cookie, percentile, run_load_test, run_server
+from ..api.serializers import GROUP_SCHEMA, LINK_SCHEMA, USER_SCHEMA, ModelSchema, dumps
+from ..authentication.models import CustomUser
+from ..main.models import Group, Link
+from ..main.normalization import hash_url
+
+SIZES: dict[str, int] = {"small": 100, "medium": 10_000, "large": 100_000}
+BENCH_EMAIL: str = "bench-{size}@linkman.invalid"
+GROUPS_PER_USER: int = 20
+SEED_BATCH_SIZE: int = 1000
+
+PHASES: tuple[str, ...] = ("client", "http", "sessions", "connections", "serializers")
+HTTP_PATHS: tuple[str, ...] = ("/api/links/", "/api/groups/", "/dashboard/")
+SESSION_MODES: tuple[str, ...] = ("db", "cached_db", "cache")
+AUTH_BACKENDS: dict[str, str] = {
+    "model": "django.contrib.auth.backends.ModelBackend",
+    "cached": "apps.authentication.backends.CachedModelBackend",
+}
+CONNECTION_PROFILES: dict[str, dict[str, str]] = {
+    "per-request": {"DB_CONN_MAX_AGE": "0", "DB_POOL": "False"},
+    "persistent": {"DB_CONN_MAX_AGE": "60", "DB_POOL": "False"},
+    "pool": {"DB_CONN_MAX_AGE": "0", "DB_POOL": "True"},  # requires `linkman[pool]`
+}
+
+
+class BenchmarkState:
+    """Objects the scenarios of one size work on"""
+
+    def __init__(self, user: CustomUser) -> None:
+        self.user: CustomUser = user
+        self.group: Group = Group.objects.for_user(user).earliest("id")
+        self.link: Link = Link.objects.for_user(user).earliest("id")
+        self.created_link_ids: list[int] = []
+
+
+def list_links(client: Client, state: BenchmarkState) -> HttpResponseBase:
+    return client.get("/api/links/")
+
+
+def list_groups(client: Client, state: BenchmarkState) -> HttpResponseBase:
+    return client.get("/api/groups/")
+
+
+def create_link(client: Client, state: BenchmarkState) -> HttpResponseBase:
+    response = client.post(
+        "/api/links/",
+        {
+            "group_id": state.group.id,
+            "link_name": "Benchmark link",
+            "link_url": "https://example.com/benchmark",
+        },
+        content_type="application/json",
+    )
+    if response.status_code == 200:
+        state.created_link_ids.append(json.loads(response.content)["link"]["id"])
+    return response
+
+
+def update_link(client: Client, state: BenchmarkState) -> HttpResponseBase:
+    return client.put(
+        f"/api/links/{state.link.id}/",
+        {
+            "group_id": state.link.group_id,
+            "link_name": state.link.name,
+            "link_url": state.link.url,
+        },
+        content_type="application/json",
+    )
+
+
+def click_link(client: Client, state: BenchmarkState) -> HttpResponseBase:
+    return client.put(
+        f"/api/links/{state.link.id}/",
+        {"for_clicked": True},
+        content_type="application/json",
+    )
+
+
+def redirect_click(client: Client, state: BenchmarkState) -> HttpResponseBase:
+    return client.get(f"/r/{state.link.id}")
+
+
+def dashboard(client: Client, state: BenchmarkState) -> HttpResponseBase:
+    return client.get("/dashboard/")
+
+
+# name -> request, the writes run last so the reads are not measured after them
+SCENARIOS: dict[str, Callable[[Client, BenchmarkState], HttpResponseBase]] = {
+    "GET /api/links/": list_links,
+    "GET /api/groups/": list_groups,
+    "GET /dashboard/": dashboard,
+    "POST /api/links/": create_link,
+    "PUT /api/links/:id/": update_link,
+    "PUT /api/links/:id/ click": click_link,
+    "GET /r/:id": redirect_click,
+}
+
+
+def seed_user(size: str) -> CustomUser:
+    """
+    Gets the benchmark user of a size, seeding it when missing or incomplete
+    :param size: Key of `SIZES`
+    :return: User owning exactly `SIZES[size]` links
+    """
+    email: str = BENCH_EMAIL.format(size=size)
+    total_links: int = SIZES[size]
+    user: CustomUser | None = CustomUser.objects.filter(email=email).first()
+    if user is not None:
+        if Link.objects.for_user(user).count() == total_links:
+            return user
+        user.delete()
+    with transaction.atomic():
+        user = CustomUser.objects.create_user(email, is_verified=True)
+        groups: list[Group] = Group.objects.bulk_create(
+            Group(user=user, name=f"Group {index}") for index in range(GROUPS_PER_USER)
+        )
+        for start in range(0, total_links, SEED_BATCH_SIZE):
+            Link.objects.bulk_create(
+                Link(
+                    user=user,
+                    group=groups[index % GROUPS_PER_USER],
+                    name=f"Link {index}",
+                    url=f"https://example.com/{size}/{index}",
+                    url_hash=hash_url(f"https://example.com/{size}/{index}"),
+                    click_count=index % 50,
+                )
+                for index in range(start, min(start + SEED_BATCH_SIZE, total_links))
+            )
+        user.total_groups = GROUPS_PER_USER
+        user.total_links = total_links
+        user.save(update_fields=["total_groups", "total_links"])
+    return user
+
+
+def delete_seeded_users() -> int:
+    """
+    Deletes the benchmark users and their data
+    :return: Amount of deleted users
+    """
+    emails: list[str] = [BENCH_EMAIL.format(size=size) for size in SIZES]
+    users: list[CustomUser] = list(CustomUser.objects.filter(email__in=emails))
+    for user in users:
+        user.delete()
+    return len(users)
+
+
+def summarize(latencies: list[float]) -> dict[str, float]:
+    """
+    Summarizes request latencies
+    :param latencies: Latencies in seconds
+    :return: Dictionary of the percentiles in milliseconds
+    """
+    latencies = sorted(latencies)
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round((latencies[-1] if latencies else 0) * 1000, 2),
+    }
+
+
+def run_client_benchmark(user: CustomUser, requests: int) -> dict[str, Any]:
+    """
+    Sends every scenario through the test client
+    :param user: User to send the requests as
+    :param requests: Amount of measured requests per scenario
+    :return: Dictionary of scenario name to its results
+    """
+    state = BenchmarkState(user)
+    results: dict[str, Any] = {}
+    with override_settings(ALLOWED_HOSTS=["testserver", *settings.ALLOWED_HOSTS]):
+        client = Client()
+        client.force_login(user)
+        try:
+            for name, scenario in SCENARIOS.items():
+                scenario(client, state)  # warm the session, user and listing caches
+                latencies: list[float] = []
+                errors: int = 0
+                with CaptureQueriesContext(connection) as context:
+                    for _ in range(requests):
+                        started: float = time.perf_counter()
+                        response: HttpResponseBase = scenario(client, state)
+                        latencies.append(time.perf_counter() - started)
+                        errors += response.status_code >= 400
+                results[name] = {
+                    "requests": requests,
+                    "errors": errors,
+                    "queries_per_request": round(
+                        len(context.captured_queries) / requests, 2
+                    ),
+                    **summarize(latencies),
+                }
+        finally:
+            # like the API deletes them, so the totals and sync tombstones stay right
+            with transaction.atomic():
+                for link_id in state.created_link_ids:
+                    utils.delete_link_in_db(link_id, user)
+    return results
+
+
+def run_session_benchmark(user: CustomUser, requests: int) -> dict[str, Any]:
+    """
+    Measures a listing request per session engine and authentication backend
+    :param user: User to send the requests as
+    :param requests: Amount of measured requests per combination
+    :return: Dictionary of `{session mode}/{backend}` to its results
+    """
+    results: dict[str, Any] = {}
+    for session_mode in SESSION_MODES:
+        for backend_name, backend in AUTH_BACKENDS.items():
+            with override_settings(
+                SESSION_ENGINE=settings.SESSION_ENGINES[session_mode],
+                AUTHENTICATION_BACKENDS=[backend],
+                ALLOWED_HOSTS=["testserver", *settings.ALLOWED_HOSTS],
+            ):
+                client = Client()
+                client.force_login(user, backend=backend)
+                client.get("/api/links/")  # warm the session, user and listing caches
+                latencies: list[float] = []
+                with CaptureQueriesContext(connection) as context:
+                    for _ in range(requests):
+                        started: float = time.perf_counter()
+                        client.get("/api/links/")
+                        latencies.append(time.perf_counter() - started)
+            results[f"{session_mode}/{backend_name}"] = {
+                "requests": requests,
+                "queries_per_request": round(
+                    len(context.captured_queries) / requests, 2
+                ),
+                **summarize(latencies),
+            }
+    return results
+
+
+def load_test_paths(
+    base_url: str,
+    cookie: str,
+    paths: tuple[str, ...],
+    concurrency: int,
+    duration: float,
+    slow_clients: int = 0,
+) -> dict[str, Any]:
+    """
+    Drives every path of a running server with the load generator in turn
+    :param base_url: Base URL of the server, e.g. `http://127.0.0.1:8011`
+    :param cookie: Session cookie sent with every request
+    :param paths: Paths to load test
+    :param concurrency: Amount of concurrent clients
+    :param duration: Seconds per path
+    :param slow_clients: Amount of extra clients trickling a request during each test
+    :return: Dictionary of path to its load test results
+    """
+    return {
+        path: asyncio.run(
+            run_load_test(
+                base_url,
+                [path],
+                concurrency,
+                duration,
+                cookie=cookie,
+                slow_clients=slow_clients,
+            )
+        )
+        for path in paths
+    }
+
+
+def run_http_benchmark(
+    user: CustomUser,
+    bind: str,
+    env: dict[str, str],
+    concurrency: int,
+    duration: float,
+    slow_clients: int = 0,
+    url: str | None = None,
+) -> dict[str, Any]:
+    """
+    Drives the read endpoints of a local gunicorn with the load generator
+    :param user: User to send the requests as
+    :param bind: Address gunicorn binds to, e.g. `127.0.0.1:8011`
+    :param env: Environment of the server, e.g. `GUNICORN_WORKERS`
+    :param concurrency: Amount of concurrent clients
+    :param duration: Seconds per path
+    :param slow_clients: Amount of extra clients trickling a request during each test
+    :param url: Base URL of an already running server to drive instead, else None
+    :return: Dictionary of path to its load test results
+    """
+    cookie: str = create_session_cookie(user)
+    if url is not None:
+        return load_test_paths(
+            url, cookie, HTTP_PATHS, concurrency, duration, slow_clients
+        )
+    with run_server(bind, env):
+        return load_test_paths(
+            f"http://{bind}", cookie, HTTP_PATHS, concurrency, duration, slow_clients
+        )
+
+
+def run_connection_benchmark(
+    user: CustomUser,
+    bind: str,
+    profiles: list[str],
+    workers: list[int],
+    concurrency: int,
+    duration: float,
+) -> dict[str, Any]:
+    """
+    Drives `/api/groups/` of a local gunicorn per connection profile and worker count
+    :param user: User to send the requests as
+    :param bind: Address gunicorn binds to, e.g. `127.0.0.1:8011`
+    :param profiles: Keys of `CONNECTION_PROFILES` to compare
+    :param workers: Worker counts to compare
+    :param concurrency: Amount of concurrent clients
+    :param duration: Seconds per measurement
+    :return: Dictionary of `{profile}/{workers}` to its load test results
+    """
+    # the cached session, user and listing would hide the cost of opening connections
+    with override_settings(SESSION_ENGINE=settings.SESSION_ENGINES["db"]):
+        cookie: str = create_session_cookie(user)
+    results: dict[str, Any] = {}
+    for profile in profiles:
+        for worker_count in workers:
+            env: dict[str, str] = {
+                **CONNECTION_PROFILES[profile],
+                "GUNICORN_WORKERS": str(worker_count),
+                "SERVER_MODE": "wsgi",
+                "SESSION_MODE": "db",
+            }
+            with run_server(bind, env):
+                results[f"{profile}/{worker_count}"] = load_test_paths(
+                    f"http://{bind}", cookie, ("/api/groups/",), concurrency, duration
+                )["/api/groups/"]
+    return results
+
+
+def legacy_serialize(obj: Model) -> dict[str, Any]:
+    """
+    Serializes the provided object the way `utils.serialize_object` used to
+    :param obj: Object to serialize
+    :return: Serialized object json dictionary
+    """
+    serialized: list[dict[str, Any]] = json.loads(
+        django_serializers.serialize("json", [obj])
+    )
+    data: dict[str, Any] = serialized[0]["fields"]
+    data["id"] = obj.pk
+    return data
+
+
+def build_serializer_cases() -> list[tuple[str, Model, ModelSchema]]:
+    """
+    Builds one unsaved object per serialized model
+    :return: List of (model name, object, schema of the model)
+    """
+    now = timezone.now()
+    user = CustomUser(id=1, email="bench@example.com", created_at=now, updated_at=now)
+    group = Group(id=1, user=user, name="Default", created_at=now, updated_at=now)
+    link = Link(
+        id=1,
+        user=user,
+        group=group,
+        name="Django documentation",
+        url="https://docs.djangoproject.com/en/5.2/",
+        click_count=42,
+        created_at=now,
+        updated_at=now,
+    )
+    return [
+        ("Group", group, GROUP_SCHEMA),
+        ("Link", link, LINK_SCHEMA),
+        ("CustomUser", user, USER_SCHEMA),
+    ]
+
+
+def measure_call(func: Callable[[], Any], iterations: int) -> float:
+    """
+    Measures the average duration of a function call
+    :param func: Function to measure
+    :param iterations: Amount of calls per measurement
+    :return: Best average duration of 5 measurements in microseconds
+    """
+    best: float = min(timeit.repeat(func, number=iterations, repeat=5))
+    return round(best / iterations * 1_000_000, 2)
+
+
+def run_serializer_benchmark(iterations: int) -> dict[str, Any]:
+    """
+    Compares the per-object cost of the legacy and schema serializers
+    :param iterations: Amount of objects to serialize per measurement
+    :return: Dictionary of model name to its durations in microseconds
+    """
+    results: dict[str, Any] = {}
+    for name, obj, schema in build_serializer_cases():
+        legacy: float = measure_call(lambda: legacy_serialize(obj), iterations)
+        schema_only: float = measure_call(lambda: schema.serialize(obj), iterations)
+        results[name] = {
+            "legacy_us": legacy,
+            "schema_us": schema_only,
+            "schema_dumps_us": measure_call(
+                lambda: dumps(schema.serialize(obj)), iterations
+            ),
+            "speedup": round(legacy / schema_only, 1) if schema_only else None,
+        }
+    return results
+
+
+def get_commit() -> str | None:
+    """
+    Gets the commit the benchmark runs on
+    :return: Short commit hash, else None outside of a git checkout
+    """
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+        )
+    except OSError:  # git is not installed
+        return None
+    return completed.stdout.strip() if completed.returncode == 0 else None
+
+
+def describe_environment() -> dict[str, Any]:
+    """
+    Describes what the benchmark ran on, so results are only compared with their kind
+    :return: Dictionary of the environment
+    """
+    return {
+        "started_at": timezone.now().isoformat(),
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "cache": settings.CACHES["default"]["BACKEND"],
+        "server_mode": settings.SERVER_MODE,
+    }
+
+
+def compare_results(
+    previous: dict[str, Any], current: dict[str, Any]
+) -> list[tuple[str, str, float, float]]:
+    """
+    Compares the p50 latencies of two runs
+    :param previous: Results of the earlier run
+    :param current: Results of the later run
+    :return: List of (size, scenario or path, previous p50 ms, current p50 ms)
+    """
+    rows: list[tuple[str, str, float, float]] = []
+    for size, size_results in current["sizes"].items():
+        previous_size: dict[str, Any] = previous["sizes"].get(size, {})
+        for phase in ("client", "http"):
+            for name, result in size_results.get(phase, {}).items():
+                previous_result: dict[str, Any] | None = previous_size.get(
+                    phase, {}
+                ).get(name)
+                if previous_result is not None:
+                    rows.append(
+                        (size, name, previous_result["p50_ms"], result["p50_ms"])
+                    )
+    return rows
+
+
+def write_results(results: dict[str, Any], path: Path) -> None:
+    """
+    Stores results as JSON
+    :param results: Results of a run
+    :param path: File to write, its directory is created when missing
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2) + "\n")
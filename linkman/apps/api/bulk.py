@@ -0,0 +1,317 @@
+"""
+This module stores the bulk link import and export of the `api` application
+
+Imports accept either JSON lines (one `{"name", "url", "group"}` object per
+line) or a Netscape bookmark file, which is what every browser exports. The
+request body is read in chunks and parsed incrementally, every link is
+validated in a single pass and the links are inserted with `bulk_create` in
+batches, creating the groups that do not exist yet.
+
+Exports are streamed as JSON lines in the same format, reading the links with
+`.iterator()` so memory use does not grow with the amount of links.
+"""
+
+import codecs
+import json
+from html.parser import HTMLParser
+from typing import Any, Iterator, NamedTuple, Protocol
+
+from django.db import transaction
+
+from ..api import cache, schemas
+from ..api.serializers import dumps
+from ..main.models import CustomUser, Group, Link
+from ..main.normalization import hash_url
+
+MAX_IMPORT_BYTES: int = 20 * 1024 * 1024  # bookmark exports inline their favicons
+READ_CHUNK_SIZE: int = 64 * 1024
+IMPORT_BATCH_SIZE: int = 1000
+EXPORT_CHUNK_SIZE: int = 2000
+MAX_REPORTED_ERRORS: int = 50
+DEFAULT_GROUP_NAME: str = "Default"
+NAME_MAX_LENGTH: int = 50
+
+JSON_LINES_FORMAT: str = "jsonl"
+NETSCAPE_FORMAT: str = "netscape"
+NETSCAPE_DOCTYPE: bytes = b"<!doctype netscape-bookmark-file"
+
+
+class BulkImportError(ValueError):
+    """Raised when an import request can not be read"""
+
+
+class ImportTooLargeError(BulkImportError):
+    """Raised when an import request is larger than `MAX_IMPORT_BYTES`"""
+
+
+class ByteStream(Protocol):
+    """Readable binary stream, e.g. a file or an `HttpRequest`"""
+
+    def read(self, size: int, /) -> bytes: ...
+
+
+class ImportedLink(NamedTuple):
+    line: int
+    group: str
+    name: str
+    url: str
+
+
+def read_chunks(
+    stream: ByteStream, max_bytes: int = MAX_IMPORT_BYTES
+) -> Iterator[bytes]:
+    """
+    Reads the provided stream in chunks, enforcing a size limit
+    :param stream: Stream to read, usually the request itself
+    :param max_bytes: Largest amount of bytes that may be read
+    :return: Iterator of byte chunks
+    """
+    total: int = 0
+    while chunk := stream.read(READ_CHUNK_SIZE):
+        total += len(chunk)
+        if total > max_bytes:
+            raise ImportTooLargeError(
+                f"Imports must be smaller than {max_bytes // (1024 * 1024)} MB"
+            )
+        yield chunk
+
+
+def detect_format(content_type: str, first_chunk: bytes) -> str:
+    """
+    Detects the format of an import
+    :param content_type: Content type of the request
+    :param first_chunk: First chunk of the request body
+    :return: `JSON_LINES_FORMAT` or `NETSCAPE_FORMAT`
+    """
+    if content_type == "text/html":
+        return NETSCAPE_FORMAT
+    if first_chunk.lstrip().lower().startswith(NETSCAPE_DOCTYPE):
+        return NETSCAPE_FORMAT
+    return JSON_LINES_FORMAT
+
+
+def iter_lines(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """
+    Splits byte chunks into lines
+    :param chunks: Byte chunks to split
+    :return: Iterator of lines without their line endings
+    """
+    pending: bytes = b""
+    for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        yield from lines
+    if pending:
+        yield pending
+
+
+def validate_link(line: int, group: Any, name: Any, url: Any) -> ImportedLink | str:
+    """
+    Validates one imported link
+    :param line: Line or position of the link in the import
+    :param group: Name of the group of the link
+    :param name: Name of the link
+    :param url: URL of the link
+    :return: Validated link, else a string explaining why the link is invalid
+    """
+    if not schemas.LINK_NAME.is_valid(name):
+        return "Link name must be between 0 to 50 characters"
+    if not schemas.LINK_URL.is_valid(url):
+        return "Link URL must be between 0 to 2000 characters"
+    if not schemas.GROUP_NAME.is_valid(group):
+        return "Group name must be between 0 - 50 characters"
+    return ImportedLink(line, group.strip(), name.strip(), url.strip())
+
+
+def parse_json_lines(
+    chunks: Iterator[bytes],
+) -> tuple[list[ImportedLink], list[dict[str, Any]]]:
+    """
+    Parses and validates a JSON lines import
+    :param chunks: Byte chunks of the import
+    :return: Tuple of (valid links, errors)
+    """
+    links: list[ImportedLink] = []
+    errors: list[dict[str, Any]] = []
+    for number, raw_line in enumerate(iter_lines(chunks), start=1):
+        if not raw_line.strip():
+            continue
+        try:
+            item = json.loads(raw_line)
+        except ValueError:
+            errors.append({"line": number, "detail": "Invalid JSON"})
+            continue
+        if not isinstance(item, dict):
+            errors.append({"line": number, "detail": "Line must be a JSON object"})
+            continue
+        result: ImportedLink | str = validate_link(
+            number,
+            item.get("group", DEFAULT_GROUP_NAME),
+            item.get("name"),
+            item.get("url"),
+        )
+        if isinstance(result, str):
+            errors.append({"line": number, "detail": result})
+        else:
+            links.append(result)
+    return links, errors
+
+
+class NetscapeBookmarkParser(HTMLParser):
+    """
+    Collects the bookmarks of a Netscape bookmark file
+
+    Each bookmark is imported into a group named after the folder that directly
+    contains it, bookmarks outside of any folder go to the default group.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.bookmarks: list[tuple[str, str, str]] = []  # (folder, title, url)
+        self.folders: list[str] = []
+        self.folder_title: str | None = None  # title of the last closed <H3>
+        self.text: list[str] | None = None  # text of the open <H3> or <A>
+        self.href: str | None = None
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag == "dl":
+            # a folder's <DL> directly follows its <H3>
+            parent: str = self.folders[-1] if self.folders else DEFAULT_GROUP_NAME
+            self.folders.append(self.folder_title or parent)
+            self.folder_title = None
+        elif tag == "h3":
+            self.text = []
+        elif tag == "a":
+            self.href = dict(attrs).get("href") or ""
+            self.text = []
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "dl" and self.folders:
+            self.folders.pop()
+        elif tag == "h3" and self.text is not None:
+            self.folder_title = "".join(self.text).strip()
+            self.text = None
+        elif tag == "a" and self.href is not None:
+            folder: str = self.folders[-1] if self.folders else DEFAULT_GROUP_NAME
+            self.bookmarks.append((folder, "".join(self.text or []).strip(), self.href))
+            self.href = None
+            self.text = None
+
+    def handle_data(self, data: str) -> None:
+        if self.text is not None:
+            self.text.append(data)
+
+
+def parse_netscape_html(
+    chunks: Iterator[bytes],
+) -> tuple[list[ImportedLink], list[dict[str, Any]]]:
+    """
+    Parses and validates a Netscape bookmark file import
+    :param chunks: Byte chunks of the import
+    :return: Tuple of (valid links, errors)
+    """
+    parser = NetscapeBookmarkParser()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for chunk in chunks:
+        parser.feed(decoder.decode(chunk))
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    links: list[ImportedLink] = []
+    errors: list[dict[str, Any]] = []
+    for number, (folder, title, url) in enumerate(parser.bookmarks, start=1):
+        if url.startswith("place:"):
+            continue  # firefox smart folders, not actual bookmarks
+        # titles and folders come from the browser, fit them instead of rejecting them
+        name: str = (title or url)[:NAME_MAX_LENGTH].strip()
+        group: str = folder[:NAME_MAX_LENGTH].strip() or DEFAULT_GROUP_NAME
+        result: ImportedLink | str = validate_link(number, group, name, url)
+        if isinstance(result, str):
+            errors.append({"line": number, "detail": result})
+        else:
+            links.append(result)
+    return links, errors
+
+
+def parse_import(
+    stream: ByteStream, content_type: str
+) -> tuple[list[ImportedLink], list[dict[str, Any]]]:
+    """
+    Reads, parses and validates an import
+    :param stream: Stream of the import body
+    :param content_type: Content type of the request
+    :return: Tuple of (valid links, errors)
+    """
+    chunks: Iterator[bytes] = read_chunks(stream)
+    first_chunk: bytes = next(chunks, b"")
+    if not first_chunk.strip():
+        raise BulkImportError("Import is empty")
+
+    def all_chunks() -> Iterator[bytes]:
+        yield first_chunk
+        yield from chunks
+
+    if detect_format(content_type, first_chunk) == NETSCAPE_FORMAT:
+        return parse_netscape_html(all_chunks())
+    return parse_json_lines(all_chunks())
+
+
+def import_links(user: CustomUser, links: list[ImportedLink]) -> tuple[int, int]:
+    """
+    Inserts the provided links, creating the groups that do not exist yet
+    :param user: User who the links belong to
+    :param links: Validated links to insert
+    :return: Tuple of (created links, created groups)
+    """
+    group_names: set[str] = {link.group for link in links}
+    with transaction.atomic():
+        groups: dict[str, Group] = {
+            group.name: group
+            for group in Group.objects.for_user(user).filter(name__in=group_names)
+        }
+        created_groups: int = 0
+        for name in group_names - groups.keys():
+            # a parallel request may create the same group, the unique constraint
+            # makes `get_or_create` read that group instead of failing
+            groups[name], created = Group.objects.get_or_create(user=user, name=name)
+            created_groups += created
+        Link.objects.bulk_create(
+            (
+                Link(
+                    user=user,
+                    group=groups[link.group],
+                    name=link.name,
+                    url=link.url,
+                    url_hash=hash_url(link.url),
+                )
+                for link in links
+            ),
+            batch_size=IMPORT_BATCH_SIZE,
+        )
+        CustomUser.objects.adjust_totals(
+            user.pk, groups=created_groups, links=len(links)
+        )
+        cache.bump_data_version(user.pk)
+    return len(links), created_groups
+
+
+def export_lines(user: CustomUser) -> Iterator[bytes]:
+    """
+    Streams the links of the provided user as JSON lines
+    :param user: User whose links are exported
+    :return: Iterator of encoded lines, in the format accepted by the import
+    """
+    rows = (
+        Link.objects.for_user(user)
+        .order_by("id")
+        .values_list("name", "url", "group__name", "click_count", "created_at")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for name, url, group, click_count, created_at in rows:
+        line: dict[str, Any] = {
+            "name": name,
+            "url": url,
+            "group": group,
+            "click_count": click_count,
+            "created_at": created_at,
+        }
+        yield dumps(line) + b"\n"
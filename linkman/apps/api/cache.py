@@ -0,0 +1,231 @@
+"""
+This module stores the per-user response cache of the `api` application
+
+Every user has a data version stored in the `default` cache. Cached listings
+are keyed by that version, so bumping it after a create/update/delete
+invalidates every cached listing of the user in O(1); stale entries are never
+read again and simply expire.
+
+The same version is used to build the ETags of the API responses, so a
+conditional GET is answered with a 304 without querying any rows.
+"""
+
+import hashlib
+import time
+from functools import partial
+from typing import Any, Awaitable, Callable
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpRequest
+
+from ..api import metrics
+from ..api.serializers import dumps
+from ..authentication.models import CustomUser
+
+LISTING_TIMEOUT: int = 60 * 60  # seconds, cached listings of an inactive user expire
+VERSION_KEY: str = "api:user:{user_id}:version"
+LISTING_KEY: str = "api:user:{user_id}:v{version}:{name}:{params}"
+
+
+def new_version() -> int:
+    """
+    Creates a data version that was never used before
+    :return: Version based on the current time
+    """
+    # time based so a version that was evicted from the cache is never reused
+    return time.time_ns()
+
+
+def get_data_version(user_id: int) -> int:
+    """
+    Gets the current data version of the provided user
+    :param user_id: ID of the user
+    :return: Current data version
+    """
+    key: str = VERSION_KEY.format(user_id=user_id)
+    version: int | None = cache.get(key)
+    if version is None:
+        cache.add(key, new_version(), timeout=None)
+        version = cache.get(key)
+    return version if version is not None else new_version()
+
+
+async def aget_data_version(user_id: int) -> int:
+    """
+    Async version of `get_data_version`
+    :param user_id: ID of the user
+    :return: Current data version
+    """
+    key: str = VERSION_KEY.format(user_id=user_id)
+    version: int | None = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, new_version(), timeout=None)
+        version = await cache.aget(key)
+    return version if version is not None else new_version()
+
+
+def bump_data_version(*user_ids: int) -> None:
+    """
+    Invalidates every cached listing of the provided users once the current transaction commits
+    :param user_ids: IDs of the users whose data changed
+    """
+    # bumping before the commit would let a reader cache the old rows under the new version
+    transaction.on_commit(partial(increment_versions, user_ids))
+
+
+def increment_versions(user_ids: tuple[int, ...]) -> None:
+    """
+    Increments the data version of the provided users
+    :param user_ids: IDs of the users whose data changed
+    """
+    for user_id in user_ids:
+        key: str = VERSION_KEY.format(user_id=user_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, new_version(), timeout=None)
+
+
+def params_digest(params: dict[str, Any]) -> str:
+    """
+    Creates a stable digest of the query parameters of a listing
+    :param params: Query parameters of the request
+    :return: Short hex digest
+    """
+    canonical: str = "&".join(f"{key}={params[key]}" for key in sorted(params))
+    return hashlib.blake2b(canonical.encode(), digest_size=8).hexdigest()
+
+
+def get_cached_listing(
+    user_id: int,
+    name: str,
+    params: dict[str, Any],
+    build: Callable[[], dict[str, Any]],
+) -> bytes:
+    """
+    Gets an encoded listing from the cache, building and caching it on a miss
+    :param user_id: ID of the user the listing belongs to
+    :param name: Name of the listing
+    :param params: Query parameters the listing depends on
+    :param build: Function that builds the listing response data
+    :return: Encoded JSON body of the listing
+    """
+    key: str = LISTING_KEY.format(
+        user_id=user_id,
+        version=get_data_version(user_id),
+        name=name,
+        params=params_digest(params),
+    )
+    body: bytes | None = cache.get(key)
+    metrics.record_cache(hit=body is not None)
+    if body is None:
+        body = dumps(build())
+        cache.set(key, body, timeout=LISTING_TIMEOUT)
+    return body
+
+
+async def aget_cached_listing(
+    user_id: int,
+    name: str,
+    params: dict[str, Any],
+    build: Callable[[], Awaitable[dict[str, Any]]],
+) -> bytes:
+    """
+    Async version of `get_cached_listing`, shares its cache entries
+    :param user_id: ID of the user the listing belongs to
+    :param name: Name of the listing
+    :param params: Query parameters the listing depends on
+    :param build: Coroutine function that builds the listing response data
+    :return: Encoded JSON body of the listing
+    """
+    key: str = LISTING_KEY.format(
+        user_id=user_id,
+        version=await aget_data_version(user_id),
+        name=name,
+        params=params_digest(params),
+    )
+    body: bytes | None = await cache.aget(key)
+    metrics.record_cache(hit=body is not None)
+    if body is None:
+        body = dumps(await build())
+        await cache.aset(key, body, timeout=LISTING_TIMEOUT)
+    return body
+
+
+def data_version_etag(request: HttpRequest, *args: Any, **kwargs: Any) -> str | None:
+    """
+    Builds the ETag of an API response from the data version of the user
+    :param request: Request object sent by the client
+    :return: Strong ETag, else None if the request can not be answered with a 304
+    """
+    if request.method not in ("GET", "HEAD") or not request.user.is_authenticated:
+        return None
+    user_id: int = request.user.pk
+    return etag_from_parts(
+        user_id,
+        get_data_version(user_id),
+        request.path,
+        params_digest(request.GET.dict()),
+    )
+
+
+def user_etag(request: HttpRequest, *args: Any, **kwargs: Any) -> str | None:
+    """
+    Builds the ETag of the current user response
+    :param request: Request object sent by the client
+    :return: Strong ETag, else None if the request can not be answered with a 304
+    """
+    etag: str | None = data_version_etag(request)
+    if etag is None:
+        return None
+    # the user row is already loaded by the authentication middleware
+    assert isinstance(request.user, CustomUser)
+    return etag_from_parts(etag, request.user.updated_at, request.user.last_login)
+
+
+async def adata_version_etag(
+    request: HttpRequest, *args: Any, **kwargs: Any
+) -> str | None:
+    """
+    Async version of `data_version_etag`, loads the user through `request.auser()`
+    :param request: Request object sent by the client
+    :return: Strong ETag, else None if the request can not be answered with a 304
+    """
+    if request.method not in ("GET", "HEAD"):
+        return None
+    user = await request.auser()
+    if not user.is_authenticated:
+        return None
+    return etag_from_parts(
+        user.pk,
+        await aget_data_version(user.pk),
+        request.path,
+        params_digest(request.GET.dict()),
+    )
+
+
+async def auser_etag(request: HttpRequest, *args: Any, **kwargs: Any) -> str | None:
+    """
+    Async version of `user_etag`
+    :param request: Request object sent by the client
+    :return: Strong ETag, else None if the request can not be answered with a 304
+    """
+    etag: str | None = await adata_version_etag(request)
+    if etag is None:
+        return None
+    user = await request.auser()
+    assert isinstance(user, CustomUser)
+    return etag_from_parts(etag, user.updated_at, user.last_login)
+
+
+def etag_from_parts(*parts: Any) -> str:
+    """
+    Hashes the provided parts into a quoted ETag
+    :param parts: Values the response depends on
+    :return: Strong ETag
+    """
+    digest: str = hashlib.blake2b(
+        "|".join(map(str, parts)).encode(), digest_size=16
+    ).hexdigest()
+    return f'"{digest}"'
@@ -0,0 +1,219 @@
+"""
+This module stores the write-behind click buffer for the `api` application
+
+Clicks are counted in Redis (the `default` cache) instead of updating the
+`Link` row on every click. `flush_clicks()` moves the buffered clicks into the
+database in batches: one `bulk_update` adding `F("click_count") + n` to every
+clicked link and one `bulk_update` of `Group.last_accessed_at`.
+
+The flush stamps `updated_at` of the links and groups it writes with the time
+of the flush, not of the clicks: `/api/sync` finds changes by `updated_at`, so
+a row changed now must not look like it changed when it was clicked, which can
+be long before the flush and behind a sync token handed out in between.
+
+Loss guarantee: a click is durable in Redis as soon as `record_click()`
+returns, so a crashed web worker loses nothing. Buffered clicks are only
+lost if Redis itself loses data before the next flush, which bounds the loss
+to one flush interval (see the `flush_clicks` management command) plus the
+Redis persistence window. The buffer is renamed to a "flushing" snapshot
+before it is written and the snapshot is only deleted once the database
+transaction committed, so a flusher that crashes mid-way retries the same
+snapshot on its next run instead of dropping it. A crash in the short window
+between the commit and the delete applies that snapshot twice, so clicks are
+never lost to a flusher crash but can be over-counted in that case.
+
+When the cache is not backed by Redis (e.g. local development with the
+local memory cache), clicks are written straight to the database with
+atomic `F()` updates.
+
+The `/r/<link_id>` redirect resolves the group and URL of a clicked link
+through `get_click_target()`, cached under the data version of the user
+(see `cache.py`). A click through a warm cache runs no SQL query.
+"""
+
+import logging
+from datetime import UTC, datetime
+
+from django.core.cache import cache as django_cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis import Redis
+from redis.exceptions import ResponseError
+
+from ..api import cache, metrics
+from ..authentication.utils import LogLevel
+from ..main.models import Group, Link
+
+logger = logging.getLogger(__name__)
+
+CLICK_COUNTS_KEY: str = "linkman:clicks:counts"  # link id -> buffered clicks
+GROUP_CLICKED_AT_KEY: str = "linkman:clicks:groups"  # group id -> last click time
+CLICKED_USERS_KEY: str = "linkman:clicks:users"  # ids of the users who clicked
+BUFFER_KEYS: tuple[str, ...] = (
+    CLICK_COUNTS_KEY,
+    GROUP_CLICKED_AT_KEY,
+    CLICKED_USERS_KEY,
+)
+FLUSHING_SUFFIX: str = ":flushing"
+FLUSH_LOCK_KEY: str = "linkman:clicks:flush-lock"
+FLUSH_LOCK_TIMEOUT: int = 60  # seconds
+FLUSH_BATCH_SIZE: int = 500
+TARGET_KEY: str = "linkman:clicks:target:{user_id}:v{version}:{link_id}"
+
+
+def get_buffer_connection() -> Redis | None:
+    """
+    Gets the raw redis connection used for the click buffer
+    :return: Redis connection, else None if the cache is not backed by redis
+    """
+    try:
+        conn: Redis = get_redis_connection("default")
+    except NotImplementedError:
+        return None
+    return conn
+
+
+def record_click(link_id: int, group_id: int, user_id: int) -> int:
+    """
+    Records a click of the provided link
+    :param link_id: ID of the clicked link
+    :param group_id: ID of the group the clicked link belongs to
+    :param user_id: ID of the user the clicked link belongs to
+    :return: Amount of clicks that a copy of the link read before this call is missing
+    """
+    conn: Redis | None = get_buffer_connection()
+    if conn is None:
+        now = timezone.now()
+        Link.objects.filter(id=link_id).update(
+            click_count=F("click_count") + 1, updated_at=now
+        )
+        Group.objects.filter(id=group_id).update(last_accessed_at=now, updated_at=now)
+        cache.bump_data_version(user_id)
+        return 1
+    clicked_at: float = timezone.now().timestamp()
+    pipe = conn.pipeline(transaction=True)
+    pipe.hincrby(CLICK_COUNTS_KEY, str(link_id), 1)
+    pipe.hset(GROUP_CLICKED_AT_KEY, str(group_id), clicked_at)
+    pipe.sadd(CLICKED_USERS_KEY, str(user_id))
+    pending_clicks, *_ = pipe.execute()
+    return int(pending_clicks)
+
+
+def get_click_target(link_id: int, user_id: int) -> tuple[int, str] | None:
+    """
+    Gets the group and URL of a link of the provided user, from the cache when possible
+    :param link_id: ID of the clicked link
+    :param user_id: ID of the user clicking the link
+    :return: Tuple of (group id, url), else None if the user has no such link
+    """
+    key: str = TARGET_KEY.format(
+        user_id=user_id, version=cache.get_data_version(user_id), link_id=link_id
+    )
+    target: tuple[int, str] | None = django_cache.get(key)
+    metrics.record_cache(hit=target is not None)
+    if target is None:
+        target = (
+            Link.objects.filter(id=link_id, user_id=user_id)
+            .values_list("group_id", "url")
+            .first()
+        )
+        if target is None:
+            return None
+        django_cache.set(key, target, timeout=cache.LISTING_TIMEOUT)
+    return target
+
+
+def snapshot_buffer(conn: Redis) -> bool:
+    """
+    Moves the click buffer to the flushing keys, unless a previous snapshot is still pending
+    :param conn: Redis connection
+    :return: True if there is a snapshot to flush, else False
+    """
+    if conn.exists(CLICK_COUNTS_KEY + FLUSHING_SUFFIX):
+        return True  # a previous flush did not finish, retry its snapshot first
+    pipe = conn.pipeline(transaction=True)
+    for key in BUFFER_KEYS:
+        pipe.rename(key, key + FLUSHING_SUFFIX)
+    try:
+        pipe.execute()
+    except ResponseError:
+        # the buffer is empty, `record_click` always writes every key together
+        return False
+    return True
+
+
+def read_timestamps(conn: Redis, key: str) -> dict[int, datetime]:
+    """
+    Reads a hash of click timestamps
+    :param conn: Redis connection
+    :param key: Key of the hash to read
+    :return: Dictionary of object id to click time
+    """
+    return {
+        int(object_id): datetime.fromtimestamp(float(clicked_at), tz=UTC)
+        for object_id, clicked_at in conn.hgetall(key).items()
+    }
+
+
+def write_snapshot(conn: Redis) -> tuple[int, int]:
+    """
+    Writes the flushing snapshot to the database, then deletes it
+    :param conn: Redis connection
+    :return: Tuple of (updated links, flushed clicks)
+    """
+    counts: dict[int, int] = {
+        int(link_id): int(count)
+        for link_id, count in conn.hgetall(CLICK_COUNTS_KEY + FLUSHING_SUFFIX).items()
+    }
+    group_clicked_at = read_timestamps(conn, GROUP_CLICKED_AT_KEY + FLUSHING_SUFFIX)
+    # the time of the flush, see the module docstring
+    now: datetime = timezone.now()
+    links: list[Link] = [
+        Link(id=link_id, click_count=F("click_count") + count, updated_at=now)
+        for link_id, count in counts.items()
+    ]
+    groups: list[Group] = [
+        Group(id=group_id, last_accessed_at=clicked_at, updated_at=now)
+        for group_id, clicked_at in group_clicked_at.items()
+    ]
+    user_ids: list[int] = [
+        int(user_id) for user_id in conn.smembers(CLICKED_USERS_KEY + FLUSHING_SUFFIX)
+    ]
+    with transaction.atomic():
+        Link.objects.bulk_update(
+            links, ["click_count", "updated_at"], batch_size=FLUSH_BATCH_SIZE
+        )
+        Group.objects.bulk_update(
+            groups, ["last_accessed_at", "updated_at"], batch_size=FLUSH_BATCH_SIZE
+        )
+        cache.bump_data_version(*user_ids)
+    # only drop the snapshot once it is committed, a crash before this line retries it
+    conn.delete(*(key + FLUSHING_SUFFIX for key in BUFFER_KEYS))
+    return len(links), sum(counts.values())
+
+
+def flush_clicks() -> int:
+    """
+    Writes the buffered clicks to the database
+    :return: Amount of links that were updated
+    """
+    conn: Redis | None = get_buffer_connection()
+    if conn is None:
+        return 0  # clicks are written directly without redis
+    lock = conn.lock(FLUSH_LOCK_KEY, timeout=FLUSH_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        return 0  # another flusher is running
+    try:
+        if not snapshot_buffer(conn):
+            return 0
+        updated_links, flushed_clicks = write_snapshot(conn)
+    finally:
+        lock.release()
+    logger.log(
+        level=LogLevel.INFO.value,
+        msg="Flushed buffered clicks",
+        extra={"links": updated_links, "clicks": flushed_clicks},
+    )
+    return updated_links
@@ -0,0 +1,66 @@
+"""
+This module stores the reconciliation of the per-user `total_groups` and `total_links` counters
+
+The counters are adjusted with `CustomUserManager.adjust_totals` on every path
+that creates or deletes groups and links. Rows changed outside of these paths
+(the admin, a shell, a failed deploy) make them drift, `reconcile_counters`
+recounts the rows of the drifted users and repairs them.
+"""
+
+from django.core.cache import cache
+from django.db.models import Count, F, IntegerField, Model, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from ..authentication.models import USER_CACHE_KEY, CustomUser
+from ..main.models import Group, Link
+
+RECONCILE_BATCH_SIZE: int = 1000
+
+
+def count_rows(model: type[Model]) -> Coalesce:
+    """
+    Builds a subquery counting the rows of a model that belong to the outer user
+    :param model: Model with a `user` foreign key
+    :return: Count expression, 0 for users without rows
+    """
+    rows = (
+        model._default_manager.filter(user=OuterRef("pk"))
+        .order_by()
+        .values("user")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def get_drifted_user_ids() -> list[int]:
+    """
+    Gets the users whose counters do not match their rows
+    :return: List of user ids
+    """
+    return list(
+        CustomUser.objects.annotate(
+            actual_groups=count_rows(Group), actual_links=count_rows(Link)
+        )
+        .exclude(total_groups=F("actual_groups"), total_links=F("actual_links"))
+        .values_list("pk", flat=True)
+    )
+
+
+def reconcile_counters(dry_run: bool = False) -> list[int]:
+    """
+    Recounts the counters of the drifted users
+    :param dry_run: Only find the drifted users, without repairing them
+    :return: List of the ids of the drifted users
+    """
+    user_ids: list[int] = get_drifted_user_ids()
+    if dry_run:
+        return user_ids
+    for start in range(0, len(user_ids), RECONCILE_BATCH_SIZE):
+        batch: list[int] = user_ids[start : start + RECONCILE_BATCH_SIZE]
+        # recounted inside the UPDATE, so concurrent adjustments are not lost
+        CustomUser.objects.filter(pk__in=batch).update(
+            total_groups=count_rows(Group), total_links=count_rows(Link)
+        )
+        cache.delete_many([USER_CACHE_KEY.format(user_id=pk) for pk in batch])
+    return user_ids
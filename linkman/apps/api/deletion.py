@@ -0,0 +1,148 @@
+"""
+This module stores the soft deletion and purge of groups and accounts
+
+Deleting a group or an account only marks its row with `deleted_at`, so the
+request runs the same few queries whether it owns ten links or fifty
+thousand. The default managers of `Group` and `Link` hide the marked groups
+and their links, and a marked account can no longer log in.
+
+`purge_deleted()` (see the `purge_deleted` management command) removes the
+marked rows later. The links are deleted with `_raw_delete()` in batches of
+`PURGE_BATCH_SIZE`, each batch one `DELETE ... WHERE id IN (...)` in its own
+transaction, instead of the collector loading every link into memory. Nothing
+references a link, so skipping the collector for them is safe; the group and
+account rows themselves go through `delete()`, which cascades whatever is left.
+"""
+
+import logging
+from typing import Iterable
+
+from django.db import router, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from ..api import sync
+from ..authentication.models import CustomUser
+from ..authentication.utils import LogLevel
+from ..main.models import Group, Link, Tombstone
+
+logger = logging.getLogger(__name__)
+
+PURGE_BATCH_SIZE: int = 5000
+DELETED_EMAIL: str = "deleted-{user_id}@linkman.invalid"
+
+
+def soft_delete_groups(user_id: int, group_ids: Iterable[int]) -> tuple[int, int]:
+    """
+    Marks groups of a user as deleted, their links are hidden with them
+    :param user_id: ID of the user the groups belong to
+    :param group_ids: IDs of the groups to delete, the ids of other users are ignored
+    :return: Tuple of (deleted groups, hidden links)
+    """
+    with transaction.atomic():
+        # the locks make a parallel delete of the same groups wait, then skip
+        # them, and make a link created in them wait until they are marked
+        owned_ids: list[int] = list(
+            Group.all_objects.filter(
+                user_id=user_id, id__in=list(group_ids), deleted_at__isnull=True
+            )
+            .select_for_update()
+            .values_list("id", flat=True)
+        )
+        if not owned_ids:
+            return 0, 0
+        # counted from `link_group_created_idx`, the links are not loaded
+        links: int = Link.objects.filter(group_id__in=owned_ids).count()
+        Group.all_objects.filter(id__in=owned_ids).update(deleted_at=timezone.now())
+        sync.record_deletions(user_id, Tombstone.Kind.GROUP, owned_ids)
+        CustomUser.objects.adjust_totals(user_id, groups=-len(owned_ids), links=-links)
+    return len(owned_ids), links
+
+
+def soft_delete_user(user: CustomUser) -> None:
+    """
+    Marks an account as deleted, it can no longer log in
+    :param user: User to delete
+    """
+    # the email is released right away, so it can sign up again before the purge
+    CustomUser.objects.filter(pk=user.pk).update(
+        deleted_at=timezone.now(),
+        is_active=False,
+        email=DELETED_EMAIL.format(user_id=user.pk),
+    )
+    user.invalidate_cache()
+
+
+def purge_links(links: QuerySet[Link]) -> int:
+    """
+    Deletes links in batches without loading them
+    :param links: Links to delete, from `Link.all_objects`
+    :return: Amount of deleted links
+    """
+    using: str = router.db_for_write(Link)
+    purged: int = 0
+    while True:
+        link_ids: list[int] = list(
+            links.values_list("id", flat=True)[:PURGE_BATCH_SIZE]
+        )
+        if not link_ids:
+            return purged
+        purged += Link.all_objects.filter(id__in=link_ids)._raw_delete(using)
+
+
+def purge_groups(limit: int | None = None) -> tuple[int, int]:
+    """
+    Deletes the groups marked as deleted, with their links
+    :param limit: Maximum amount of groups to purge, None for all of them
+    :return: Tuple of (purged groups, purged links)
+    """
+    group_ids: list[int] = list(
+        Group.all_objects.filter(deleted_at__isnull=False)
+        .order_by("deleted_at")
+        .values_list("id", flat=True)[:limit]
+    )
+    links: int = 0
+    for group_id in group_ids:
+        links += purge_links(Link.all_objects.filter(group_id=group_id))
+        # only links created while the batches ran are left for the collector
+        _, deleted = Group.all_objects.filter(id=group_id).delete()
+        links += deleted.get(Link._meta.label, 0)
+    return len(group_ids), links
+
+
+def purge_users(limit: int | None = None) -> tuple[int, int]:
+    """
+    Deletes the accounts marked as deleted, with their groups and links
+    :param limit: Maximum amount of accounts to purge, None for all of them
+    :return: Tuple of (purged accounts, purged links)
+    """
+    users: list[CustomUser] = list(
+        CustomUser.objects.filter(deleted_at__isnull=False).order_by("deleted_at")[
+            :limit
+        ]
+    )
+    links: int = 0
+    for user in users:
+        links += purge_links(Link.all_objects.filter(user_id=user.pk))
+        user.delete()  # the groups, tombstones and the rest of the account
+    return len(users), links
+
+
+def purge_deleted(limit: int | None = None) -> dict[str, int]:
+    """
+    Deletes the accounts and groups marked as deleted
+    :param limit: Maximum amount of accounts and of groups to purge, None for all
+    :return: Dictionary of purged accounts, groups and links
+    """
+    users, user_links = purge_users(limit)
+    groups, group_links = purge_groups(limit)
+    purged: dict[str, int] = {
+        "users": users,
+        "groups": groups,
+        "links": user_links + group_links,
+    }
+    if users or groups:
+        logger.log(
+            level=LogLevel.INFO.value, msg="Purged deleted objects", extra=purged
+        )
+    return purged
@@ -0,0 +1,261 @@
+"""
+This module stores a small HTTP load generator for the `api` endpoints
+
+It drives a running server (`runserver`, gunicorn sync workers or uvicorn
+workers) with a fixed amount of concurrent keep-alive clients and reports the
+throughput and latency percentiles. Optional slow clients send their request
+one byte at a time, the way a client on a bad connection does, to show how
+many workers they tie up: a sync worker is blocked until the slow request is
+complete, an async worker keeps serving the other clients.
+
+Only the standard library is used, so it runs anywhere the project runs.
+"""
+
+import asyncio
+import os
+import socket
+import subprocess
+import time
+from contextlib import contextmanager
+from importlib import import_module
+from typing import Any, Iterator
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+
+from ..authentication.models import CustomUser
+
+REQUEST_TIMEOUT: float = 30  # seconds
+SLOW_CLIENT_INTERVAL: float = 1  # seconds between two bytes of a slow client
+SERVER_START_TIMEOUT: float = 30  # seconds
+
+
+def create_session_cookie(user: CustomUser) -> str:
+    """
+    Logs the provided user in on a new session, the way `Client.force_login` does
+    :param user: User to log in
+    :return: Cookie header value of the session
+    """
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+    return f"{settings.SESSION_COOKIE_NAME}={session.session_key}"
+
+
+def build_request(host: str, path: str, cookie: str | None) -> bytes:
+    """
+    Builds a keep-alive GET request
+    :param host: Host header value
+    :param path: Path of the request, with its query string
+    :param cookie: Cookie header value, else None
+    :return: Encoded request
+    """
+    lines: list[str] = [
+        f"GET {path} HTTP/1.1",
+        f"Host: {host}",
+        "Accept: application/json",
+        "Connection: keep-alive",
+    ]
+    if cookie:
+        lines.append(f"Cookie: {cookie}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode()
+
+
+async def read_response(reader: asyncio.StreamReader) -> tuple[int, bool]:
+    """
+    Reads one HTTP/1.1 response
+    :param reader: Stream of the connection
+    :return: Tuple of (status code, whether the connection can be reused)
+    """
+    head: bytes = await reader.readuntil(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    status: int = int(status_line.split(" ", 2)[1])
+    headers: dict[str, str] = {}
+    for line in header_lines:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    keep_alive: bool = headers.get("connection", "").lower() != "close"
+    if "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    elif headers.get("transfer-encoding", "").lower() == "chunked":
+        while size := int((await reader.readuntil(b"\r\n")).split(b";")[0], 16):
+            await reader.readexactly(size + 2)
+        await reader.readuntil(b"\r\n")
+    else:
+        await reader.read()  # body ends when the server closes the connection
+        keep_alive = False
+    return status, keep_alive
+
+
+async def run_client(
+    address: tuple[str, int],
+    requests: list[bytes],
+    deadline: float,
+    latencies: list[float],
+    errors: list[str],
+) -> None:
+    """
+    Sends requests back to back until the deadline, reusing its connection
+    :param address: Tuple of (host, port) of the server
+    :param requests: Requests to send in turn
+    :param deadline: Loop time at which the client stops
+    :param latencies: List the latency of every successful request is added to
+    :param errors: List the description of every failed request is added to
+    """
+    loop = asyncio.get_running_loop()
+    connection: tuple[asyncio.StreamReader, asyncio.StreamWriter] | None = None
+    sent: int = 0
+    while loop.time() < deadline:
+        request: bytes = requests[sent % len(requests)]
+        sent += 1
+        started: float = time.perf_counter()
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection(*address)
+            reader, writer = connection
+            writer.write(request)
+            status, keep_alive = await asyncio.wait_for(
+                read_response(reader), REQUEST_TIMEOUT
+            )
+        except (OSError, ValueError, asyncio.IncompleteReadError, TimeoutError) as e:
+            errors.append(type(e).__name__)
+            keep_alive = False
+        else:
+            if status >= 400:
+                errors.append(f"HTTP {status}")
+            else:
+                latencies.append(time.perf_counter() - started)
+        if not keep_alive and connection is not None:
+            connection[1].close()
+            connection = None
+    if connection is not None:
+        connection[1].close()
+
+
+async def run_slow_client(
+    address: tuple[str, int], request: bytes, deadline: float
+) -> None:
+    """
+    Sends a request one byte at a time until the deadline
+    :param address: Tuple of (host, port) of the server
+    :param request: Request to trickle
+    :param deadline: Loop time at which the client stops
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        _, writer = await asyncio.open_connection(*address)
+    except OSError:
+        return
+    try:
+        for index in range(len(request)):
+            if loop.time() >= deadline:
+                break
+            writer.write(request[index : index + 1])
+            await writer.drain()
+            await asyncio.sleep(SLOW_CLIENT_INTERVAL)
+    except OSError:
+        pass
+    finally:
+        writer.close()
+
+
+def percentile(sorted_values: list[float], percent: float) -> float:
+    """
+    Gets a percentile with the nearest rank method
+    :param sorted_values: Values sorted in ascending order
+    :param percent: Percentile to get, between 0 and 100
+    :return: Percentile value, 0 if there are no values
+    """
+    if not sorted_values:
+        return 0.0
+    rank: int = max(
+        0, min(len(sorted_values) - 1, round(percent / 100 * len(sorted_values)) - 1)
+    )
+    return sorted_values[rank]
+
+
+async def run_load_test(
+    base_url: str,
+    paths: list[str],
+    concurrency: int,
+    duration: float,
+    cookie: str | None = None,
+    slow_clients: int = 0,
+) -> dict[str, Any]:
+    """
+    Drives a running server with concurrent clients
+    :param base_url: Base URL of the server, e.g. `http://127.0.0.1:8000`
+    :param paths: Paths the clients request in turn
+    :param concurrency: Amount of concurrent clients
+    :param duration: Duration of the test in seconds
+    :param cookie: Cookie header sent with every request, else None
+    :param slow_clients: Amount of extra clients trickling a request during the test
+    :return: Dictionary of the test results
+    """
+    url = urlsplit(base_url)
+    address: tuple[str, int] = (url.hostname or "127.0.0.1", url.port or 80)
+    requests: list[bytes] = [build_request(url.netloc, path, cookie) for path in paths]
+    latencies: list[float] = []
+    errors: list[str] = []
+    loop = asyncio.get_running_loop()
+    deadline: float = loop.time() + duration
+    started: float = time.perf_counter()
+    await asyncio.gather(
+        *(run_slow_client(address, requests[0], deadline) for _ in range(slow_clients)),
+        *(
+            run_client(address, requests, deadline, latencies, errors)
+            for _ in range(concurrency)
+        ),
+    )
+    elapsed: float = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "paths": paths,
+        "concurrency": concurrency,
+        "slow_clients": slow_clients,
+        "duration": round(elapsed, 3),
+        "requests": len(latencies),
+        "errors": len(errors),
+        "error_kinds": sorted(set(errors)),
+        "throughput": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round((latencies[-1] if latencies else 0) * 1000, 2),
+    }
+
+
+@contextmanager
+def run_server(bind: str, env: dict[str, str]) -> Iterator[subprocess.Popen[bytes]]:
+    """
+    Runs gunicorn (configured by `gunicorn.conf.py`) for the duration of the block
+    :param bind: Address to bind, e.g. `127.0.0.1:8011`
+    :param env: Environment variables to set on top of the current environment
+    :return: Server process, ready to accept connections
+    """
+    host, port = bind.rsplit(":", 1)
+    process = subprocess.Popen(
+        ["gunicorn", "--log-level", "warning"],
+        cwd=settings.BASE_DIR,
+        env={**os.environ, **env, "GUNICORN_BIND": bind},
+    )
+    try:
+        deadline: float = time.monotonic() + SERVER_START_TIMEOUT
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with code {process.returncode}")
+            try:
+                socket.create_connection((host, int(port)), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+        yield process
+    finally:
+        process.terminate()
+        process.wait()
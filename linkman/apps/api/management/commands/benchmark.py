@@ -0,0 +1,213 @@
+"""
+Management command that runs the benchmark suite, see `benchmark.py`
+
+    python manage.py benchmark --sizes small medium --workers 2
+    python manage.py benchmark --compare benchmarks/20250101-120000.json
+    python manage.py benchmark --phases serializers
+    python manage.py benchmark --phases sessions connections --workers 1 2 4
+
+Compare the deployment profiles by driving a server started with each of them:
+
+    SERVER_MODE=asgi ASYNC_API=True GUNICORN_WORKERS=2 gunicorn
+    python manage.py benchmark --phases http --url http://127.0.0.1:8000 --slow-clients 2
+
+Results are written to `benchmarks/` next to `manage.py` unless `--output` is set.
+The http and connections phases start gunicorn, so run them from an environment
+with the server's settings, and against a database and cache the workers share
+(PostgreSQL, Redis).
+"""
+
+import json
+from pathlib import Path
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.utils import timezone
+
+from ... import benchmark
+
+
+class Command(BaseCommand):
+    help = "Benchmarks the api endpoints on seeded users and stores the results"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            choices=list(benchmark.SIZES),
+            default=["small", "medium"],
+            help="Seeded users to benchmark, by amount of links",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=100,
+            help="Test client requests per scenario",
+        )
+        parser.add_argument(
+            "--phases",
+            nargs="+",
+            choices=benchmark.PHASES,
+            default=["client", "http"],
+            help="Phases to measure, see `benchmark.py`",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            nargs="+",
+            default=[2],
+            help="Gunicorn workers, the http phase uses the first, "
+            "the connections phase compares all of them",
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=20, help="Amount of concurrent clients"
+        )
+        parser.add_argument(
+            "--duration", type=float, default=10, help="Seconds per http path"
+        )
+        parser.add_argument(
+            "--slow-clients",
+            type=int,
+            default=0,
+            help="Extra clients of the http phase sending one byte per second",
+        )
+        parser.add_argument(
+            "--bind", default="127.0.0.1:8011", help="Address gunicorn binds to"
+        )
+        parser.add_argument(
+            "--url",
+            help="Base URL of a running server the http phase drives instead of gunicorn",
+        )
+        parser.add_argument(
+            "--profiles",
+            nargs="+",
+            choices=list(benchmark.CONNECTION_PROFILES),
+            default=list(benchmark.CONNECTION_PROFILES),
+            help="Database connection profiles of the connections phase",
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=10000,
+            help="Objects serialized per measurement of the serializers phase",
+        )
+        parser.add_argument("--output", type=Path, help="File to write the results to")
+        parser.add_argument(
+            "--compare",
+            type=Path,
+            help="Earlier results to compare the p50 latencies to",
+        )
+        parser.add_argument(
+            "--drop", action="store_true", help="Delete the seeded users afterwards"
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        previous: dict[str, Any] | None = None
+        if options["compare"]:
+            try:
+                previous = json.loads(options["compare"].read_text())
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Can not read {options['compare']}: {e}")
+        phases: list[str] = options["phases"]
+        results: dict[str, Any] = {**benchmark.describe_environment(), "sizes": {}}
+        if "serializers" in phases:
+            results["serializers"] = benchmark.run_serializer_benchmark(
+                options["iterations"]
+            )
+            self.write_serializer_results(results["serializers"])
+        for size in options["sizes"]:
+            if not set(phases) - {"serializers"}:
+                break
+            self.stdout.write(f"Seeding {size} ({benchmark.SIZES[size]} links)")
+            user = benchmark.seed_user(size)
+            size_results: dict[str, Any] = {"links": benchmark.SIZES[size]}
+            if "client" in phases:
+                size_results["client"] = benchmark.run_client_benchmark(
+                    user, options["requests"]
+                )
+                self.write_client_results(size_results["client"])
+            if "http" in phases:
+                size_results["http"] = benchmark.run_http_benchmark(
+                    user,
+                    options["bind"],
+                    {"GUNICORN_WORKERS": str(options["workers"][0])},
+                    options["concurrency"],
+                    options["duration"],
+                    slow_clients=options["slow_clients"],
+                    url=options["url"],
+                )
+                self.write_http_results(size_results["http"])
+            if "sessions" in phases:
+                size_results["sessions"] = benchmark.run_session_benchmark(
+                    user, options["requests"]
+                )
+                self.write_client_results(size_results["sessions"])
+            if "connections" in phases:
+                size_results["connections"] = benchmark.run_connection_benchmark(
+                    user,
+                    options["bind"],
+                    options["profiles"],
+                    options["workers"],
+                    options["concurrency"],
+                    options["duration"],
+                )
+                self.write_http_results(size_results["connections"])
+            results["sizes"][size] = size_results
+        output: Path = options["output"] or (
+            Path(settings.BASE_DIR)
+            / "benchmarks"
+            / f"{timezone.now():%Y%m%d-%H%M%S}.json"
+        )
+        benchmark.write_results(results, output)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {output}"))
+        if previous is not None:
+            self.write_comparison(benchmark.compare_results(previous, results))
+        if options["drop"]:
+            benchmark.delete_seeded_users()
+
+    def write_client_results(self, results: dict[str, Any]) -> None:
+        self.stdout.write(
+            f"  {'scenario':<28}{'queries':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'errors':>8}"
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"  {name:<28}{result['queries_per_request']:>9}{result['p50_ms']:>9}"
+                f"{result['p95_ms']:>9}{result['p99_ms']:>9}"
+                f"{result.get('errors', '-'):>8}"
+            )
+
+    def write_http_results(self, results: dict[str, Any]) -> None:
+        self.stdout.write(
+            f"  {'path':<28}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'errors':>8}"
+        )
+        for path, result in results.items():
+            self.stdout.write(
+                f"  {path:<28}{result['throughput']:>9}{result['p50_ms']:>9}"
+                f"{result['p95_ms']:>9}{result['p99_ms']:>9}{result['errors']:>8}"
+            )
+
+    def write_serializer_results(self, results: dict[str, Any]) -> None:
+        self.stdout.write(
+            f"  {'model':<12}{'legacy us':>12}{'schema us':>12}{'+dumps us':>12}"
+            f"{'speedup':>10}"
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"  {name:<12}{result['legacy_us']:>12}{result['schema_us']:>12}"
+                f"{result['schema_dumps_us']:>12}{result['speedup']:>9}x"
+            )
+
+    def write_comparison(self, rows: list[tuple[str, str, float, float]]) -> None:
+        self.stdout.write(f"{'size':<8}{'scenario':<28}{'p50 ms':>16}{'change':>9}")
+        for size, name, previous_p50, current_p50 in rows:
+            change: str = (
+                f"{(current_p50 - previous_p50) / previous_p50:+.0%}"
+                if previous_p50
+                else "-"
+            )
+            self.stdout.write(
+                f"{size:<8}{name:<28}{f'{previous_p50} -> {current_p50}':>16}{change:>9}"
+            )
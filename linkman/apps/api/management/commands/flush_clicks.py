@@ -0,0 +1,53 @@
+"""
+Management command that writes the buffered link clicks to the database
+
+Run it once (e.g. from cron) or keep it running with `--interval`. The
+interval is the upper bound on how long a click stays only in Redis. A running
+worker logs a failed flush and retries it on the next interval: the snapshot
+of the failed flush stays in Redis, so no click is lost.
+"""
+
+import logging
+import time
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import DatabaseError, close_old_connections
+from redis.exceptions import RedisError
+
+from ....authentication.utils import LogLevel
+from ...clicks import flush_clicks
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Writes the link clicks buffered in Redis to the database"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Keep flushing every INTERVAL seconds instead of flushing once",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        interval: float = options["interval"]
+        while True:
+            # drops a connection the database closed while the worker slept
+            close_old_connections()
+            try:
+                updated_links: int = flush_clicks()
+                self.stdout.write(f"Flushed clicks of {updated_links} link(s)")
+            except (RedisError, DatabaseError) as e:
+                if interval <= 0:
+                    raise
+                logger.log(
+                    level=LogLevel.ERROR.value,
+                    msg="Unable to flush clicks, retrying on the next interval",
+                    extra={"error": str(e)},
+                )
+            if interval <= 0:
+                return
+            time.sleep(interval)
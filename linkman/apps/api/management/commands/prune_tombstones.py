@@ -0,0 +1,20 @@
+"""
+Management command that deletes the tombstones older than the sync retention
+
+Clients whose sync token is older than the retention are asked to reload
+everything, so these tombstones are never read again.
+"""
+
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from ...sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = "Deletes the deletion records that are older than the sync retention"
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        deleted: int = prune_tombstones()
+        self.stdout.write(f"Deleted {deleted} tombstone(s)")
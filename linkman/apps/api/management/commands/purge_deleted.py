@@ -0,0 +1,62 @@
+"""
+Management command that purges the deleted groups and accounts
+
+Deleting a group or an account only marks it (see `deletion.py`), run this
+once (e.g. from cron) or keep it running with `--interval` to remove the
+marked rows and their links in the background. A running worker logs a failed
+purge and retries it on the next interval: every batch is its own transaction,
+so the next run continues with the rows that are still marked.
+"""
+
+import logging
+import time
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import DatabaseError, close_old_connections
+
+from ....authentication.utils import LogLevel
+from ...deletion import purge_deleted
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Deletes the groups and accounts marked as deleted, with their links"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Keep purging every INTERVAL seconds instead of purging once",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Maximum amount of groups and of accounts purged per run",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        interval: float = options["interval"]
+        while True:
+            # drops a connection the database closed while the worker slept
+            close_old_connections()
+            try:
+                purged: dict[str, int] = purge_deleted(options["limit"])
+                self.stdout.write(
+                    f"Purged {purged['users']} account(s), {purged['groups']} "
+                    f"group(s) and {purged['links']} link(s)"
+                )
+            except DatabaseError as e:
+                if interval <= 0:
+                    raise
+                logger.log(
+                    level=LogLevel.ERROR.value,
+                    msg="Unable to purge deleted objects, retrying on the next interval",
+                    extra={"error": str(e)},
+                )
+            if interval <= 0:
+                return
+            time.sleep(interval)
@@ -0,0 +1,28 @@
+"""
+Management command that repairs the `total_groups` and `total_links` counters of the users
+
+The counters are maintained on every create and delete, this only repairs
+drift from changes made around the api (the admin, a shell, raw SQL).
+"""
+
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from ...counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = "Recounts the group and link counters of the users whose counters drifted"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report the drifted users, without repairing them",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        user_ids: list[int] = reconcile_counters(dry_run=options["dry_run"])
+        action: str = "Found" if options["dry_run"] else "Repaired"
+        self.stdout.write(f"{action} {len(user_ids)} user(s) with drifted counters")
@@ -0,0 +1,369 @@
+"""
+This module stores the per-request metrics of the project
+
+`RequestMetricsMiddleware` (see `middleware.py`) creates a `RequestMetrics`
+for every request and makes it current through a context variable, which is
+also visible from the threads `sync_to_async` runs the ORM in. The SQL
+queries are counted and timed by an execute wrapper installed on every
+database connection, the cache lookups and the JSON encoding report
+themselves through `record_cache()` and `timed_serialization()`.
+
+Finished requests are added to per-view histograms buffered in the worker and
+flushed to a Redis hash every `FLUSH_INTERVAL`, so the Prometheus endpoint
+shows the totals of every worker. Without Redis (the local memory cache) the
+totals are only kept in the worker. The request that finds a flush due runs
+it after its response is built, in a thread on the async path so the event
+loop never waits on Redis. Metrics never fail a request: a flush Redis
+rejects is logged and its samples are dropped.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator
+
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django_redis import get_redis_connection
+from redis import Redis
+from redis.exceptions import RedisError
+
+from ..authentication.utils import LogLevel
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY: str = "linkman:metrics"
+FLUSH_INTERVAL: float = 5  # seconds
+
+DURATION_BUCKETS: tuple[float, ...] = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+)
+QUERY_BUCKETS: tuple[float, ...] = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# name -> (help text, buckets)
+HISTOGRAMS: dict[str, tuple[str, tuple[float, ...]]] = {
+    "linkman_request_duration_seconds": ("Total time of a request", DURATION_BUCKETS),
+    "linkman_request_db_duration_seconds": (
+        "Time a request spent in SQL queries",
+        DURATION_BUCKETS,
+    ),
+    "linkman_request_db_queries": ("SQL queries of a request", QUERY_BUCKETS),
+    "linkman_request_serialize_duration_seconds": (
+        "Time a request spent encoding JSON",
+        DURATION_BUCKETS,
+    ),
+}
+CACHE_COUNTER: str = "linkman_cache_lookups_total"
+COUNTERS: dict[str, str] = {CACHE_COUNTER: "Application cache lookups by result"}
+
+
+class RequestMetrics:
+    """Measurements of one request"""
+
+    def __init__(self) -> None:
+        self.started: float = time.perf_counter()
+        self.db_queries: int = 0
+        self.db_time: float = 0.0
+        self.cache_hits: int = 0
+        self.cache_misses: int = 0
+        self.serialize_time: float = 0.0
+
+    def server_timing(self, total: float) -> str:
+        """
+        Formats the measurements as a `Server-Timing` header value
+        :param total: Total duration of the request in seconds
+        :return: Header value
+        """
+        return ", ".join(
+            (
+                f'db;dur={self.db_time * 1000:.2f};desc="{self.db_queries} queries"',
+                f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+                f"serialize;dur={self.serialize_time * 1000:.2f}",
+                f"total;dur={total * 1000:.2f}",
+            )
+        )
+
+
+current_metrics: ContextVar[RequestMetrics | None] = ContextVar(
+    "current_metrics", default=None
+)
+
+
+def record_cache(hit: bool) -> None:
+    """
+    Records an application cache lookup of the current request
+    :param hit: True if the value was found in the cache
+    """
+    metrics: RequestMetrics | None = current_metrics.get()
+    if metrics is None:
+        return
+    if hit:
+        metrics.cache_hits += 1
+    else:
+        metrics.cache_misses += 1
+
+
+@contextmanager
+def timed_serialization() -> Iterator[None]:
+    """
+    Adds the duration of the block to the serialization time of the current request
+    """
+    metrics: RequestMetrics | None = current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    started: float = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serialize_time += time.perf_counter() - started
+
+
+def time_query(
+    execute: Callable[..., Any],
+    sql: str,
+    params: Any,
+    many: bool,
+    context: dict[str, Any],
+) -> Any:
+    """
+    Database execute wrapper counting and timing the queries of the current request
+    """
+    metrics: RequestMetrics | None = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started: float = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def install_query_timer(
+    sender: type[BaseDatabaseWrapper], connection: BaseDatabaseWrapper, **kwargs: Any
+) -> None:
+    """
+    `connection_created` receiver installing `time_query` on every new connection
+    """
+    if time_query not in connection.execute_wrappers:
+        # first, so `execute_wrapper()` blocks still pop their own wrapper
+        connection.execute_wrappers.insert(0, time_query)
+
+
+def format_labels(**labels: Any) -> str:
+    """
+    Formats Prometheus labels
+    :param labels: Label values
+    :return: Labels without the braces, e.g. `view="links",le="0.1"`
+    """
+    return ",".join(
+        f'{name}="{escape_label_value(str(value))}"' for name, value in labels.items()
+    )
+
+
+def escape_label_value(value: str) -> str:
+    """
+    Escapes a Prometheus label value
+    :param value: Raw value
+    :return: Value with backslashes, quotes and newlines escaped
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_value(value: float) -> str:
+    """
+    Formats a sample value without losing precision
+    :param value: Sample value
+    :return: Value as Prometheus reads it
+    """
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def sample_sort_key(field: str) -> tuple[str, float]:
+    """
+    Sorts the samples of a family by labels, then buckets by their upper bound
+    :param field: Sample field, see `MetricsBuffer`
+    :return: Sort key
+    """
+    labels: str = field.split("|", 1)[1]
+    if ',le="' not in labels:
+        return labels, 0.0
+    rest, bound = labels.rsplit(',le="', 1)
+    return rest, float(bound.rstrip('"').replace("+Inf", "inf"))
+
+
+def format_bound(bound: float) -> str:
+    """
+    Formats a histogram bucket bound
+    :param bound: Upper bound of the bucket
+    :return: Bound as Prometheus prints it
+    """
+    return str(float(bound))
+
+
+class MetricsBuffer:
+    """
+    Aggregates finished requests until they are flushed to Redis
+
+    Samples are stored as `{sample}|{labels}` fields, e.g.
+    `linkman_request_db_queries_bucket|view="links",le="2.0"`.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.pending: dict[str, float] = {}
+        self.totals: dict[str, float] = {}  # only used without redis
+        self.last_flush: float = time.monotonic()
+
+    def add(self, field: str, amount: float) -> None:
+        """Adds an amount to a pending sample, the lock must be held"""
+        self.pending[field] = self.pending.get(field, 0.0) + amount
+
+    def observe(self, name: str, view: str, value: float) -> None:
+        """
+        Adds an observation to a histogram
+        :param name: Name of the histogram
+        :param view: View the observation belongs to
+        :param value: Observed value
+        """
+        for bound in HISTOGRAMS[name][1]:
+            # empty buckets are still added, every series must have every bucket
+            self.add(
+                f"{name}_bucket|{format_labels(view=view, le=format_bound(bound))}",
+                1 if value <= bound else 0,
+            )
+        self.add(f"{name}_bucket|{format_labels(view=view, le='+Inf')}", 1)
+        self.add(f"{name}_sum|{format_labels(view=view)}", value)
+        self.add(f"{name}_count|{format_labels(view=view)}", 1)
+
+    def record(self, view: str, metrics: RequestMetrics, total: float) -> bool:
+        """
+        Adds a finished request
+        :param view: Name of the view that served the request
+        :param metrics: Measurements of the request
+        :param total: Total duration of the request in seconds
+        :return: True if the caller must `flush()`, one caller per interval
+        """
+        with self.lock:
+            self.observe("linkman_request_duration_seconds", view, total)
+            self.observe("linkman_request_db_duration_seconds", view, metrics.db_time)
+            self.observe("linkman_request_db_queries", view, metrics.db_queries)
+            self.observe(
+                "linkman_request_serialize_duration_seconds",
+                view,
+                metrics.serialize_time,
+            )
+            if metrics.cache_hits:
+                self.add(
+                    f"{CACHE_COUNTER}|{format_labels(view=view, result='hit')}",
+                    metrics.cache_hits,
+                )
+            if metrics.cache_misses:
+                self.add(
+                    f"{CACHE_COUNTER}|{format_labels(view=view, result='miss')}",
+                    metrics.cache_misses,
+                )
+            now: float = time.monotonic()
+            if now - self.last_flush < FLUSH_INTERVAL:
+                return False
+            self.last_flush = now
+        return True
+
+    def flush(self) -> None:
+        """
+        Moves the pending samples to Redis, or to the local totals without Redis
+        """
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.last_flush = time.monotonic()
+        if not pending:
+            return
+        conn: Redis | None = get_metrics_connection()
+        if conn is None:
+            with self.lock:
+                for field, amount in pending.items():
+                    self.totals[field] = self.totals.get(field, 0.0) + amount
+            return
+        pipe = conn.pipeline(transaction=False)
+        for field, amount in pending.items():
+            pipe.hincrbyfloat(METRICS_KEY, field, amount)
+        try:
+            pipe.execute()
+        except RedisError as e:
+            logger.log(
+                level=LogLevel.WARNING.value,
+                msg="Unable to flush metrics, dropping the samples",
+                extra={"error": str(e)},
+            )
+
+    def read(self) -> dict[str, float]:
+        """
+        Reads the aggregated samples of every worker
+        :return: Dictionary of sample field to value
+        """
+        self.flush()
+        conn: Redis | None = get_metrics_connection()
+        if conn is None:
+            with self.lock:
+                return dict(self.totals)
+        return {
+            field.decode() if isinstance(field, bytes) else field: float(value)
+            for field, value in conn.hgetall(METRICS_KEY).items()
+        }
+
+
+def get_metrics_connection() -> Redis | None:
+    """
+    Gets the raw redis connection the metrics are aggregated in
+    :return: Redis connection, else None if the cache is not backed by redis
+    """
+    try:
+        conn: Redis = get_redis_connection("default")
+    except NotImplementedError:
+        return None
+    return conn
+
+
+buffer = MetricsBuffer()
+
+
+def render_prometheus() -> str:
+    """
+    Renders the aggregated metrics in the Prometheus text exposition format
+    :return: Exposition text
+    """
+    samples: dict[str, float] = buffer.read()
+    lines: list[str] = []
+    families: list[tuple[str, str, str]] = [
+        *(
+            (name, "histogram", help_text)
+            for name, (help_text, _) in HISTOGRAMS.items()
+        ),
+        *((name, "counter", help_text) for name, help_text in COUNTERS.items()),
+    ]
+    for name, kind, help_text in families:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        suffixes: tuple[str, ...] = (
+            ("_bucket", "_sum", "_count") if kind == "histogram" else ("",)
+        )
+        for suffix in suffixes:
+            fields: list[str] = [
+                field for field in samples if field.split("|", 1)[0] == name + suffix
+            ]
+            for field in sorted(fields, key=sample_sort_key):
+                sample, labels = field.split("|", 1)
+                lines.append(f"{sample}{{{labels}}} {format_value(samples[field])}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,140 @@
+"""
+This module stores the middleware of the `api` application
+"""
+
+import logging
+import time
+from typing import Awaitable, Callable
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, HttpResponseBase
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.module_loading import import_string
+from django_ratelimit.exceptions import Ratelimited
+
+from ..api import metrics
+from ..authentication.utils import LogLevel
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """
+    Measures every request, see `metrics.py`
+
+    Adds a `Server-Timing` header to the response and the measurements to the
+    per-view histograms served by the metrics endpoint. The flush to Redis runs
+    in a thread on the async path. A failure to report the measurements is
+    logged, the response is returned regardless.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(
+        self,
+        get_response: Callable[[HttpRequest], HttpResponseBase]
+        | Callable[[HttpRequest], Awaitable[HttpResponseBase]],
+    ) -> None:
+        self.get_response = get_response
+        self.is_async: bool = iscoroutinefunction(self.get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(
+        self, request: HttpRequest
+    ) -> HttpResponseBase | Awaitable[HttpResponseBase]:
+        if self.is_async:
+            return self.__acall__(request)
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current_metrics.set(request_metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current_metrics.reset(token)
+        assert isinstance(response, HttpResponseBase)
+        if self.finish(request, response, request_metrics):
+            self.flush()
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponseBase:
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current_metrics.set(request_metrics)
+        try:
+            response: HttpResponseBase = await self.get_response(request)  # type: ignore[misc]
+        finally:
+            metrics.current_metrics.reset(token)
+        if self.finish(request, response, request_metrics):
+            # the flush blocks on Redis, keep it off the event loop
+            await sync_to_async(self.flush, thread_sensitive=False)()
+        return response
+
+    @staticmethod
+    def finish(
+        request: HttpRequest,
+        response: HttpResponseBase,
+        request_metrics: metrics.RequestMetrics,
+    ) -> bool:
+        """
+        Reports the measurements of a finished request
+        :param request: Request object sent by the client
+        :param response: Response returned by the view
+        :param request_metrics: Measurements of the request
+        :return: True if the buffered measurements are due to be flushed
+        """
+        try:
+            total: float = time.perf_counter() - request_metrics.started
+            response.headers["Server-Timing"] = request_metrics.server_timing(total)
+            match = request.resolver_match
+            # unresolved paths share one label, so random 404s can not add series
+            view: str = match.view_name if match is not None else "unresolved"
+            return metrics.buffer.record(view, request_metrics, total)
+        except Exception as e:
+            logger.log(
+                level=LogLevel.ERROR.value,
+                msg="Unable to record request metrics",
+                extra={"error": str(e), "path": request.path},
+            )
+            return False
+
+    @staticmethod
+    def flush() -> None:
+        """
+        Flushes the buffered measurements of every finished request
+        """
+        try:
+            metrics.buffer.flush()
+        except Exception as e:
+            logger.log(
+                level=LogLevel.ERROR.value,
+                msg="Unable to flush request metrics",
+                extra={"error": str(e)},
+            )
+
+
+class RatelimitMiddleware(MiddlewareMixin):
+    """
+    Answers the requests rejected by a `@ratelimit` view with `RATELIMIT_VIEW`
+
+    Replaces `django_ratelimit.middleware.RatelimitMiddleware`, which is sync
+    only: a single sync only middleware makes Django run the whole stack, and
+    the async views under it, in a thread under ASGI. Without `RATELIMIT_VIEW`
+    the rejection is left to Django, which answers it with a 403.
+    """
+
+    def process_exception(
+        self, request: HttpRequest, exception: Exception
+    ) -> HttpResponse | None:
+        """
+        Renders `RATELIMIT_VIEW` for a `Ratelimited` exception
+        :param request: Request object sent by the client
+        :param exception: Exception raised by the view
+        :return: Response of `RATELIMIT_VIEW`, else None for other exceptions
+        """
+        view_path: str | None = getattr(settings, "RATELIMIT_VIEW", None)
+        if view_path is None or not isinstance(exception, Ratelimited):
+            return None
+        view = import_string(view_path)
+        response: HttpResponse = view(request, exception)
+        return response
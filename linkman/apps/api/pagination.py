@@ -0,0 +1,282 @@
+"""
+This module stores the keyset (cursor) pagination used by the `api` listings
+
+Pages are ordered by the column of the `sort` parameter then `id`, largest
+first (newest by default). The cursor is the position of the last row of a
+page, so fetching the next page is an index range scan no matter how deep into
+the listing the client is. Every sort is backed by a `(user, -column, -id)`
+index, see the `Meta.indexes` of the models.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any
+
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE: int = 500
+MAX_PAGE_SIZE: int = 1000
+
+# `sort` parameter -> column the rows are ordered by, descending
+SORT_COLUMNS: dict[str, str] = {
+    "created": "created_at",
+    "clicks": "click_count",
+    "last_used": "updated_at",
+}
+DEFAULT_SORT: str = "created"
+# column -> type of its cursor value, the bounds of the integer columns
+CURSOR_TYPES: dict[str, type] = {
+    "created_at": datetime,
+    "click_count": int,
+    "updated_at": datetime,
+}
+MAX_CURSOR_INT: int = 2**31 - 1  # `PositiveIntegerField` columns
+MAX_CURSOR_ID: int = 2**63 - 1  # `BigAutoField` ids
+LINK_SORTS: tuple[str, ...] = ("created", "clicks", "last_used")
+
+LINK_FIELDS: tuple[str, ...] = (
+    "id",
+    "user_id",
+    "group_id",
+    "name",
+    "url",
+    "click_count",
+    "created_at",
+    "updated_at",
+)
+GROUP_FIELDS: tuple[str, ...] = (
+    "id",
+    "user_id",
+    "name",
+    "last_accessed_at",
+    "created_at",
+    "updated_at",
+)
+
+
+class PaginationError(ValueError):
+    """Raised when the pagination query parameters are invalid"""
+
+
+def encode_cursor(row: dict[str, Any], sort: str = DEFAULT_SORT) -> str:
+    """
+    Encodes the position of a row into an opaque cursor
+    :param row: Last row of a page, must contain the sort column and `id`
+    :param sort: Sort of the listing, key of `SORT_COLUMNS`
+    :return: URL safe cursor string
+    """
+    value: Any = row[SORT_COLUMNS[sort]]
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    position: list[Any] = [sort, value, row["id"]]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: str = DEFAULT_SORT) -> tuple[Any, int]:
+    """
+    Decodes a cursor created by `encode_cursor`
+    :param cursor: Cursor string sent by the client
+    :param sort: Sort of the listing, the cursor must have been created for it
+    :return: Tuple of (sort column value, id)
+    """
+    try:
+        cursor_sort, value, row_id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode())
+        )
+        value = parse_cursor_value(value, CURSOR_TYPES[SORT_COLUMNS[sort]])
+    except (ValueError, TypeError) as e:
+        raise PaginationError("Invalid cursor") from e
+    # a forged cursor must not reach the query, e.g. a string on the clicks sort
+    if cursor_sort != sort or value is None or not is_cursor_int(row_id, MAX_CURSOR_ID):
+        raise PaginationError("Invalid cursor")
+    return value, row_id
+
+
+def parse_cursor_value(value: Any, kind: type) -> Any:
+    """
+    Parses the sort column value of a decoded cursor
+    :param value: Value stored in the cursor
+    :param kind: Type of the sort column, see `CURSOR_TYPES`
+    :return: Parsed value, else None if it does not match the type of the column
+    """
+    if kind is datetime:
+        parsed: datetime | None = (
+            parse_datetime(value) if isinstance(value, str) else None
+        )
+        # `encode_cursor` always writes the offset of the aware column value
+        return parsed if parsed is not None and parsed.tzinfo is not None else None
+    return value if is_cursor_int(value, MAX_CURSOR_INT) else None
+
+
+def is_cursor_int(value: Any, maximum: int) -> bool:
+    """
+    Checks if a decoded cursor value is an integer the database can compare
+    :param value: Decoded value
+    :param maximum: Largest value of the column
+    :return: True if the value is a non negative integer within the column range
+    """
+    # `bool` is a subclass of `int`, `true` is not a position
+    return (
+        isinstance(value, int) and not isinstance(value, bool) and 0 <= value <= maximum
+    )
+
+
+def parse_sort(raw_sort: str | None, sorts: tuple[str, ...]) -> str:
+    """
+    Parses the `sort` query parameter
+    :param raw_sort: Raw parameter value
+    :param sorts: Sorts the listing supports
+    :return: Key of the sort, `DEFAULT_SORT` if the parameter is missing
+    """
+    if not raw_sort:
+        return DEFAULT_SORT
+    if raw_sort not in sorts:
+        raise PaginationError(f"Sort must be one of: {', '.join(sorts)}")
+    return raw_sort
+
+
+def parse_fields(raw_fields: str | None, allowed: tuple[str, ...]) -> tuple[str, ...]:
+    """
+    Parses the comma separated `fields` query parameter
+    :param raw_fields: Raw parameter value
+    :param allowed: Fields that may be requested
+    :return: Requested fields, all allowed fields if the parameter is missing
+    """
+    if not raw_fields:
+        return allowed
+    fields: tuple[str, ...] = tuple(
+        dict.fromkeys(field.strip() for field in raw_fields.split(","))
+    )
+    invalid: list[str] = [field for field in fields if field not in allowed]
+    if invalid:
+        raise PaginationError(f"Unknown fields: {', '.join(invalid)}")
+    return fields
+
+
+def parse_limit(raw_limit: str | None) -> int:
+    """
+    Parses the `limit` query parameter
+    :param raw_limit: Raw parameter value
+    :return: Page size capped at `MAX_PAGE_SIZE`
+    """
+    if not raw_limit:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(raw_limit)
+    except ValueError as e:
+        raise PaginationError("Limit must be a number") from e
+    if limit <= 0:
+        raise PaginationError("Limit must be greater than 0")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def filter_group(queryset: QuerySet[Any], raw_group: str | None) -> QuerySet[Any]:
+    """
+    Narrows a link listing to the group of the `group` query parameter
+    :param queryset: Links of the user
+    :param raw_group: Raw parameter value
+    :return: Links of the group, all links if the parameter is missing
+    """
+    if not raw_group:
+        return queryset
+    if not raw_group.isdigit():
+        raise PaginationError("Invalid group id")
+    # `created` is served by `link_group_created_idx`, the other sorts walk the
+    # user's sort index and skip the links of other groups
+    return queryset.filter(group_id=int(raw_group))
+
+
+def page_query(
+    queryset: QuerySet[Any],
+    params: dict[str, Any],
+    allowed_fields: tuple[str, ...],
+    sorts: tuple[str, ...] = (DEFAULT_SORT,),
+) -> tuple[QuerySet[Any], tuple[str, ...], int, str]:
+    """
+    Builds the query of one page of the provided queryset
+    :param queryset: Queryset to paginate, already scoped to the user
+    :param params: Query parameters of the request (`cursor`, `limit`, `fields`, `sort`)
+    :param allowed_fields: Fields that may be requested through `fields`
+    :param sorts: Sorts the listing supports, e.g. `LINK_SORTS`
+    :return: Tuple of (query of the page rows plus one, requested fields, page size, sort)
+    """
+    fields: tuple[str, ...] = parse_fields(params.get("fields"), allowed_fields)
+    limit: int = parse_limit(params.get("limit"))
+    sort: str = parse_sort(params.get("sort"), sorts)
+    column: str = SORT_COLUMNS[sort]
+    cursor: str | None = params.get("cursor")
+    if cursor:
+        value, row_id = decode_cursor(cursor, sort)
+        queryset = queryset.filter(
+            Q(**{f"{column}__lt": value}) | Q(**{column: value, "id__lt": row_id})
+        )
+    # the cursor columns are always fetched, then dropped if they were not requested
+    selected: tuple[str, ...] = tuple(dict.fromkeys((*fields, column, "id")))
+    query = queryset.order_by(f"-{column}", "-id").values(*selected)[: limit + 1]
+    return query, fields, limit, sort
+
+
+def finish_page(
+    rows: list[dict[str, Any]],
+    fields: tuple[str, ...],
+    limit: int,
+    sort: str = DEFAULT_SORT,
+) -> tuple[list[dict[str, Any]], str | None]:
+    """
+    Trims the rows fetched by a `page_query` into a page
+    :param rows: Fetched rows
+    :param fields: Requested fields
+    :param limit: Page size
+    :param sort: Sort of the listing
+    :return: Tuple of (rows of the page, cursor of the next page or None)
+    """
+    next_cursor: str | None = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1], sort)
+    extra: list[str] = [
+        field for field in (SORT_COLUMNS[sort], "id") if field not in fields
+    ]
+    if extra:
+        for row in rows:
+            for field in extra:
+                del row[field]
+    return rows, next_cursor
+
+
+def paginate(
+    queryset: QuerySet[Any],
+    params: dict[str, Any],
+    allowed_fields: tuple[str, ...],
+    sorts: tuple[str, ...] = (DEFAULT_SORT,),
+) -> tuple[list[dict[str, Any]], str | None]:
+    """
+    Fetches one page of the provided queryset
+    :param queryset: Queryset to paginate, already scoped to the user
+    :param params: Query parameters of the request (`cursor`, `limit`, `fields`, `sort`)
+    :param allowed_fields: Fields that may be requested through `fields`
+    :param sorts: Sorts the listing supports, e.g. `LINK_SORTS`
+    :return: Tuple of (rows of the page, cursor of the next page or None)
+    """
+    query, fields, limit, sort = page_query(queryset, params, allowed_fields, sorts)
+    return finish_page(list(query), fields, limit, sort)
+
+
+async def apaginate(
+    queryset: QuerySet[Any],
+    params: dict[str, Any],
+    allowed_fields: tuple[str, ...],
+    sorts: tuple[str, ...] = (DEFAULT_SORT,),
+) -> tuple[list[dict[str, Any]], str | None]:
+    """
+    Async version of `paginate`, fetching the rows through the async ORM
+    :param queryset: Queryset to paginate, already scoped to the user
+    :param params: Query parameters of the request (`cursor`, `limit`, `fields`, `sort`)
+    :param allowed_fields: Fields that may be requested through `fields`
+    :param sorts: Sorts the listing supports, e.g. `LINK_SORTS`
+    :return: Tuple of (rows of the page, cursor of the next page or None)
+    """
+    query, fields, limit, sort = page_query(queryset, params, allowed_fields, sorts)
+    return finish_page([row async for row in query], fields, limit, sort)
@@ -0,0 +1,251 @@
+"""
+This module stores the request schemas of the `api` application
+
+A schema lists the fields of a request body and is compiled once, at import
+time: every field picks its type check and reads its length limit from the
+model field it is stored in. Validating a body is then a single pass over the
+fields that returns the cleaned values, or raises `SchemaError` with the 400
+detail of the first invalid field.
+
+Schemas only check the shape of a body. Whatever needs the database, such as a
+unique group name, is left to the constraints of the tables: the write runs
+inside `constraint_errors()`, which turns a violation of the named constraint
+into a `SchemaError`, instead of querying for a conflict before every write.
+The write runs in a savepoint, so the violation leaves the transaction of the
+request usable, and any other `IntegrityError` is raised as is.
+"""
+
+import json
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+from django.db import IntegrityError, transaction
+from django.db.models import Model, UniqueConstraint
+
+from ..main.models import Group, Link
+
+GROUP_NAME_LENGTH: int = Group._meta.get_field("name").max_length or 0
+LINK_NAME_LENGTH: int = Link._meta.get_field("name").max_length or 0
+LINK_URL_LENGTH: int = Link._meta.get_field("url").max_length or 0
+GROUP_NAME_CONSTRAINT: str = "group_user_name_uniq"
+
+INVALID_GROUP_NAME: str = (
+    f"Invalid group name. Group name must be between 0 - {GROUP_NAME_LENGTH} characters"
+)
+INVALID_LINK_NAME: str = f"Link Name must be between 0 to {LINK_NAME_LENGTH} characters"
+INVALID_LINK_URL: str = f"Link URL must be between 0 to {LINK_URL_LENGTH} characters"
+
+
+class SchemaError(ValueError):
+    """Raised when a request body does not match its schema"""
+
+
+class Field:
+    """
+    One field of a request schema
+    """
+
+    def __init__(
+        self,
+        name: str,
+        kind: type,
+        missing: str,
+        invalid: str | None = None,
+        max_length: int | None = None,
+        required: bool = True,
+        default: Any = None,
+    ) -> None:
+        """
+        Compiles the check of the field
+        :param name: Key of the field in the request body
+        :param kind: Expected type of the value, `str`, `int` or `bool`
+        :param missing: Detail of the error raised when a required field is missing
+        :param invalid: Detail of the error raised when the value is invalid, defaults to `missing`
+        :param max_length: Largest accepted length of a stripped string value
+        :param required: Whether the field must be present
+        :param default: Value of an optional field that is missing
+        """
+        self.name = name
+        self.missing = missing
+        self.invalid: str = invalid or missing
+        self.required = required
+        self.default = default
+        self.is_valid: Callable[[Any], bool]
+        if kind is str:
+            limit: int = max_length or 0
+            self.is_valid = lambda value: (
+                isinstance(value, str) and 0 < len(value.strip()) <= limit
+            )
+        elif kind is int:  # `bool` is a subclass of `int`, it is not an id
+            self.is_valid = lambda value: (
+                isinstance(value, int) and not isinstance(value, bool)
+            )
+        else:
+            self.is_valid = lambda value: isinstance(value, kind)
+
+    def clean(self, data: dict[str, Any]) -> Any:
+        """
+        Reads the value of the field from a request body
+        :param data: Request body
+        :return: Value of the field, else the default of a missing optional field
+        """
+        value: Any = data.get(self.name)
+        if value is None:
+            if self.required:
+                raise SchemaError(self.missing)
+            return self.default
+        if not self.is_valid(value):
+            raise SchemaError(self.invalid)
+        return value
+
+
+class RequestSchema:
+    """
+    Validates request bodies against a fixed set of fields
+    """
+
+    def __init__(self, *fields: Field) -> None:
+        """
+        :param fields: Fields of the body, checked in order
+        """
+        self.fields: tuple[Field, ...] = fields
+
+    def validate(self, data: Any) -> dict[str, Any]:
+        """
+        Validates a decoded request body
+        :param data: Decoded request body
+        :return: Dictionary of the field names to their values, unknown keys are dropped
+        """
+        if not isinstance(data, dict):
+            raise SchemaError("Request body must be a JSON object")
+        return {field.name: field.clean(data) for field in self.fields}
+
+    def parse(self, body: bytes) -> dict[str, Any]:
+        """
+        Decodes and validates a JSON request body
+        :param body: Raw request body
+        :return: Dictionary of the field names to their values
+        """
+        return self.validate(parse_json(body))
+
+
+def parse_json(body: bytes) -> Any:
+    """
+    Decodes a JSON request body
+    :param body: Raw request body
+    :return: Decoded body
+    """
+    try:
+        return json.loads(body)
+    except ValueError:
+        raise SchemaError("Invalid JSON") from None
+
+
+def violates_constraint(error: IntegrityError, model: type[Model], name: str) -> bool:
+    """
+    Checks if an `IntegrityError` was raised by a unique constraint of a model
+    :param error: Error raised by the write
+    :param model: Model the constraint is declared on
+    :param name: Name of the constraint in the `Meta.constraints` of the model
+    :return: True if the error is a violation of that constraint
+    """
+    # psycopg reports the violated constraint, other drivers only their message
+    diagnostics: Any = getattr(error.__cause__, "diag", None)
+    constraint_name: str | None = getattr(diagnostics, "constraint_name", None)
+    if constraint_name is not None:
+        return constraint_name == name
+    if f'"{name}"' in str(error):
+        return True
+    # SQLite names the columns of a unique constraint instead of the constraint
+    constraint: UniqueConstraint = next(
+        constraint
+        for constraint in model._meta.constraints
+        if isinstance(constraint, UniqueConstraint) and constraint.name == name
+    )
+    table: str = model._meta.db_table
+    column_names: dict[str, str | None] = {
+        field.name: field.column for field in model._meta.concrete_fields
+    }
+    columns: str = ", ".join(
+        f"{table}.{column_names[field]}" for field in constraint.fields
+    )
+    return str(error) == f"UNIQUE constraint failed: {columns}"
+
+
+@contextmanager
+def constraint_errors(
+    model: type[Model], constraint: str, detail: str
+) -> Iterator[None]:
+    """
+    Raises a `SchemaError` when the wrapped write violates a unique constraint
+    :param model: Model the constraint is declared on
+    :param constraint: Name of the constraint, e.g. `GROUP_NAME_CONSTRAINT`
+    :param detail: Detail of the raised error
+    """
+    try:
+        with transaction.atomic():
+            yield
+    except IntegrityError as e:
+        if not violates_constraint(e, model, constraint):
+            raise
+        raise SchemaError(detail) from e
+
+
+GROUP_NAME = Field(
+    "group_name",
+    str,
+    missing="Error Occurred. Group name is missing",
+    invalid=INVALID_GROUP_NAME,
+    max_length=GROUP_NAME_LENGTH,
+)
+GROUP_ID = Field("group_id", int, missing="Group id is missing")
+LINK_NAME = Field(
+    "link_name",
+    str,
+    missing="Missing Link Name Field",
+    invalid=INVALID_LINK_NAME,
+    max_length=LINK_NAME_LENGTH,
+)
+LINK_URL = Field(
+    "link_url",
+    str,
+    missing="Missing Link URL Field",
+    invalid=INVALID_LINK_URL,
+    max_length=LINK_URL_LENGTH,
+)
+
+GROUP_CREATE_SCHEMA = RequestSchema(GROUP_NAME)
+GROUP_UPDATE_SCHEMA = RequestSchema(
+    Field(
+        "name",
+        str,
+        missing="Missing name field",
+        invalid=INVALID_GROUP_NAME,
+        max_length=GROUP_NAME_LENGTH,
+    )
+)
+LINK_CREATE_SCHEMA = RequestSchema(
+    GROUP_ID,
+    LINK_NAME,
+    LINK_URL,
+    Field(
+        "reject_duplicates",
+        bool,
+        missing="reject_duplicates must be a boolean",
+        required=False,
+        default=False,
+    ),
+)
+LINK_UPDATE_SCHEMA = RequestSchema(GROUP_ID, LINK_NAME, LINK_URL)
+LINK_CLICK_SCHEMA = RequestSchema(
+    Field(
+        "for_clicked",
+        bool,
+        missing="for_clicked must be a boolean",
+        required=False,
+        default=False,
+    )
+)
+DUPLICATES_QUERY_SCHEMA = RequestSchema(
+    Field("url", str, missing=INVALID_LINK_URL, max_length=LINK_URL_LENGTH)
+)
@@ -0,0 +1,291 @@
+"""
+This module stores the server side fuzzy search used by the `api` application
+
+Scoring mirrors the Fuse.js options the dashboard used client side
+(`threshold: 0.3`, `ignoreLocation: true`, `minMatchCharLength: 2`,
+`includeMatches: true`) so results and highlights stay the same after moving
+the search to the server.
+
+On PostgreSQL, the matching links are found, ranked and paginated by the
+database through the `pg_trgm` GIN indexes of `Link` (`TrigramIndex`): a page
+costs one count and one `ORDER BY similarity LIMIT` query, and only the links
+of the page are scored in Python for their highlights. On other databases (e.g. SQLite test runs) every
+link of the user is scored in Python.
+"""
+
+import math
+import sys
+from typing import Any
+
+from django.db import connection, transaction
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.models import F, Lookup, Q, QuerySet
+from django.db.models.functions import Greatest
+from django.db.models.sql.compiler import SQLCompiler
+
+from ..main.models import Link
+
+FUSE_THRESHOLD: float = 0.3
+MIN_MATCH_CHAR_LENGTH: int = 2
+MIN_SCORE: float = 0.001  # Fuse never reports a fuzzy score lower than this
+SEARCH_KEYS: tuple[str, ...] = ("name", "url")
+DEFAULT_SEARCH_KEYS: tuple[str, ...] = ("name",)  # keys the dashboard searched
+DEFAULT_PAGE_SIZE: int = 20
+MAX_PAGE_SIZE: int = 100
+TRIGRAM_WORD_SIMILARITY_THRESHOLD: float = 0.3
+
+
+class ILike(Lookup):
+    """
+    Case insensitive `LIKE` on the bare column
+
+    Unlike `icontains`, which compares `UPPER(column::text)`, the trigram
+    indexes can serve it.
+    """
+
+    def as_sql(
+        self, compiler: SQLCompiler, connection: BaseDatabaseWrapper
+    ) -> tuple[str, tuple[Any, ...]]:
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} ILIKE {rhs}", (*lhs_params, *rhs_params)
+
+
+def match_condition(pattern: str, keys: tuple[str, ...]) -> Q:
+    """
+    Builds the filter of the links matching the pattern in the database
+    :param pattern: Lowercased search pattern
+    :param keys: Link fields to search in
+    :return: Condition served by the trigram indexes of the keys
+    """
+    like: str = f"%{connection.ops.prep_for_like_query(pattern)}%"
+    condition = Q()
+    for key in keys:
+        condition |= Q(**{f"{key}__trigram_word_similar": pattern})
+        condition |= Q(ILike(F(key), like))
+    return condition
+
+
+def max_errors(pattern: str) -> int:
+    """
+    Calculates the amount of edits allowed for a pattern to still be a match
+    :param pattern: Lowercased search pattern
+    :return: Maximum edit distance that stays within `FUSE_THRESHOLD`
+    """
+    return math.floor(FUSE_THRESHOLD * len(pattern) + 1e-9)
+
+
+def approximate_distance(pattern: str, text: str, limit: int) -> int | None:
+    """
+    Calculates the smallest edit distance between the pattern and any substring of the text
+    :param pattern: Lowercased search pattern
+    :param text: Lowercased text to search in
+    :param limit: Largest distance that is still considered a match
+    :return: The edit distance if it is within the limit, else None
+    """
+    previous: list[int] = list(range(len(pattern) + 1))
+    best: int = previous[-1]
+    for char in text:
+        current: list[int] = [0]
+        for i, pattern_char in enumerate(pattern, start=1):
+            cost = 0 if pattern_char == char else 1
+            current.append(
+                min(previous[i - 1] + cost, previous[i] + 1, current[i - 1] + 1)
+            )
+        previous = current
+        best = min(best, current[-1])
+        if best == 0:
+            break
+    return best if best <= limit else None
+
+
+def match_indices(pattern: str, text: str) -> list[list[int]]:
+    """
+    Calculates the highlighted ranges of a matched text, the same way Fuse builds its match mask
+    :param pattern: Lowercased search pattern
+    :param text: Lowercased text that matched the pattern
+    :return: List of inclusive [start, end] ranges at least `MIN_MATCH_CHAR_LENGTH` long
+    """
+    pattern_chars: set[str] = set(pattern)
+    mask: list[bool] = [char in pattern_chars for char in text]
+    start: int = text.find(pattern)
+    while start != -1:
+        mask[start : start + len(pattern)] = [True] * len(pattern)
+        start = text.find(pattern, start + len(pattern))
+    indices: list[list[int]] = []
+    run_start: int = -1
+    for i, marked in enumerate([*mask, False]):
+        if marked and run_start == -1:
+            run_start = i
+        elif not marked and run_start != -1:
+            if i - run_start >= MIN_MATCH_CHAR_LENGTH:
+                indices.append([run_start, i - 1])
+            run_start = -1
+    return indices
+
+
+def field_norm(value: str) -> float:
+    """
+    Calculates the Fuse field-length norm of a value
+    :param value: Field value to calculate the norm for
+    :return: Norm rounded to three decimals, shorter fields weigh more
+    """
+    tokens: int = max(1, len(value.split()))
+    return round(1 / math.sqrt(tokens), 3)
+
+
+def score_value(pattern: str, value: str) -> tuple[float, list[list[int]]] | None:
+    """
+    Scores a single field value against the search pattern
+    :param pattern: Lowercased search pattern
+    :param value: Field value to score
+    :return: Tuple of (score, highlight indices) if the value matches, else None
+    """
+    text: str = value.lower()
+    if pattern == text:
+        return 0.0, [[0, len(text) - 1]]
+    distance: int | None = approximate_distance(pattern, text, max_errors(pattern))
+    if distance is None:
+        return None
+    indices: list[list[int]] = match_indices(pattern, text)
+    if not indices:
+        return None
+    return max(MIN_SCORE, distance / len(pattern)), indices
+
+
+def score_link(
+    pattern: str, link: dict[str, Any], keys: tuple[str, ...]
+) -> dict[str, Any] | None:
+    """
+    Scores a link against the search pattern across the provided keys
+    :param pattern: Lowercased search pattern
+    :param link: Link values to score
+    :param keys: Link fields to search in
+    :return: Fuse style result dictionary if the link matches, else None
+    """
+    weight: float = 1 / len(keys)
+    total_score: float = 1.0
+    matches: list[dict[str, Any]] = []
+    for key in keys:
+        value: str = link[key]
+        result = score_value(pattern, value)
+        if result is None:
+            continue
+        score, indices = result
+        base: float = sys.float_info.epsilon if score == 0 else score
+        total_score *= base ** (weight * field_norm(value))
+        matches.append({"key": key, "value": value, "indices": indices})
+    if not matches:
+        return None
+    return {"item": link, "score": total_score, "matches": matches}
+
+
+def rank_in_database(
+    queryset: QuerySet[Link],
+    pattern: str,
+    keys: tuple[str, ...],
+    offset: int,
+    limit: int,
+) -> tuple[list[dict[str, Any]], int]:
+    """
+    Ranks and paginates the matching links with the `pg_trgm` indexes
+    :param queryset: Links of the user to search in
+    :param pattern: Lowercased search pattern
+    :param keys: Link fields to search in
+    :param offset: Amount of results to skip
+    :param limit: Maximum amount of results to return
+    :return: Tuple of (results of the page, total amount of results)
+    """
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    similarities = [TrigramWordSimilarity(pattern, key) for key in keys]
+    similarity = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+    matches: QuerySet[Link] = queryset.filter(match_condition(pattern, keys))
+    with transaction.atomic(), connection.cursor() as cursor:
+        # SET LOCAL only lasts until the end of this transaction
+        cursor.execute(
+            "SET LOCAL pg_trgm.word_similarity_threshold = %s",
+            [TRIGRAM_WORD_SIMILARITY_THRESHOLD],
+        )
+        count: int = matches.count()
+        rows: list[dict[str, Any]] = [
+            dict(row)
+            for row in matches.annotate(similarity=similarity)
+            .order_by("-similarity", "id")
+            .values()[offset : offset + limit]
+        ]
+    results: list[dict[str, Any]] = []
+    for link in rows:
+        similarity_score: float = link.pop("similarity")
+        # the trigram match decides the order, Fuse only adds its highlights
+        result = score_link(pattern, link, keys)
+        if result is None:
+            result = {"item": link, "score": 1 - similarity_score, "matches": []}
+        results.append(result)
+    return results, count
+
+
+def rank_in_python(
+    queryset: QuerySet[Link],
+    pattern: str,
+    keys: tuple[str, ...],
+    offset: int,
+    limit: int,
+) -> tuple[list[dict[str, Any]], int]:
+    """
+    Scores every link of the queryset with the Fuse rules and paginates the results
+    :param queryset: Links of the user to search in
+    :param pattern: Lowercased search pattern
+    :param keys: Link fields to search in
+    :param offset: Amount of results to skip
+    :param limit: Maximum amount of results to return
+    :return: Tuple of (results of the page, total amount of results)
+    """
+    results: list[dict[str, Any]] = []
+    for row in queryset.values().iterator(chunk_size=2000):
+        result = score_link(pattern, dict(row), keys)
+        if result is not None:
+            results.append(result)
+    # python's sort is stable, ties keep the database order like Fuse keeps refIndex
+    results.sort(key=lambda result: result["score"])
+    return results[offset : offset + limit], len(results)
+
+
+def search_links(
+    queryset: QuerySet[Link],
+    query: str,
+    keys: tuple[str, ...] = DEFAULT_SEARCH_KEYS,
+    offset: int = 0,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> tuple[list[dict[str, Any]], int]:
+    """
+    Fuzzy searches the provided links
+    :param queryset: Links of the user to search in
+    :param query: Raw search query
+    :param keys: Link fields to search in
+    :param offset: Amount of results to skip
+    :param limit: Maximum amount of results to return
+    :return: Tuple of (Fuse style results of the page from best to worst match, total amount of results)
+    """
+    pattern: str = query.strip().lower()
+    if len(pattern) < MIN_MATCH_CHAR_LENGTH:
+        return [], 0
+    if connection.vendor == "postgresql":
+        return rank_in_database(queryset, pattern, keys, offset, limit)
+    return rank_in_python(queryset, pattern, keys, offset, limit)
+
+
+def parse_search_keys(raw_keys: str | None) -> tuple[str, ...] | None:
+    """
+    Parses the comma separated `keys` query parameter
+    :param raw_keys: Raw parameter value
+    :return: Tuple of valid keys, default keys if missing, else None if invalid
+    """
+    if not raw_keys:
+        return DEFAULT_SEARCH_KEYS
+    keys: tuple[str, ...] = tuple(
+        dict.fromkeys(key.strip() for key in raw_keys.split(","))
+    )
+    if not all(key in SEARCH_KEYS for key in keys):
+        return None
+    return keys
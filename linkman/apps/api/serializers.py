@@ -0,0 +1,160 @@
+"""
+This module stores the schema based serializers used by the `api` application
+
+Each schema precomputes which attributes of a model instance are read, so
+serializing an object is a single dictionary build instead of a round trip
+through `django.core.serializers` and `json.loads`. The output matches what
+`serializers.serialize("json", ...)` produced (foreign keys as ids, datetimes
+as ECMA-262 strings), minus the private fields of `CustomUser`.
+
+Responses are encoded with `orjson` when it is installed (`linkman[fast]`),
+otherwise with the standard library `json` module.
+"""
+
+import datetime
+import json
+from typing import Any, Iterable
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Field, Model
+from django.http import JsonResponse as DjangoJsonResponse
+
+from ..api import metrics
+from ..authentication.models import CustomUser
+from ..main.models import Group, Link
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional dependency
+    orjson = None  # type: ignore[assignment]
+
+
+def format_datetime(value: datetime.datetime | None) -> str | None:
+    """
+    Formats a datetime the same way `DjangoJSONEncoder` does
+    :param value: Datetime to format
+    :return: ISO 8601 string with millisecond precision, else None
+    """
+    if value is None:
+        return None
+    formatted: str = value.isoformat()
+    if value.microsecond:
+        formatted = formatted[:23] + formatted[26:]
+    if formatted.endswith("+00:00"):
+        formatted = formatted.removesuffix("+00:00") + "Z"
+    return formatted
+
+
+class ModelSchema:
+    """
+    Serializes instances of a model to dictionaries
+    """
+
+    def __init__(self, model: type[Model], fields: Iterable[str]) -> None:
+        """
+        Precomputes the attributes to read for each field
+        :param model: Model class the schema serializes
+        :param fields: Names of the model fields to include, `id` is always included
+        """
+        self.model = model
+        self.fields: tuple[str, ...] = tuple(fields)
+        # only concrete fields are stored on the instance, a relation raises KeyError
+        columns: dict[str, Field[Any, Any]] = {
+            field.name: field for field in model._meta.concrete_fields
+        }
+        self.attributes: tuple[tuple[str, str], ...] = tuple(
+            (name, columns[name].attname) for name in self.fields
+        )
+        self.datetime_fields: frozenset[str] = frozenset(
+            name
+            for name in self.fields
+            if columns[name].get_internal_type() == "DateTimeField"
+        )
+
+    def serialize(self, obj: Model) -> dict[str, Any]:
+        """
+        Serializes the provided object to a dict
+        :param obj: Object to serialize
+        :return: Serialized object dictionary
+        """
+        data: dict[str, Any] = {
+            name: getattr(obj, attname) for name, attname in self.attributes
+        }
+        for name in self.datetime_fields:
+            data[name] = format_datetime(data[name])
+        data["id"] = obj.pk
+        return data
+
+    def serialize_many(self, objs: Iterable[Model]) -> list[dict[str, Any]]:
+        """
+        Serializes the provided objects to a list of dicts
+        :param objs: Objects to serialize
+        :return: List of serialized object dictionaries
+        """
+        return [self.serialize(obj) for obj in objs]
+
+
+GROUP_SCHEMA = ModelSchema(
+    Group, ("user", "name", "last_accessed_at", "created_at", "updated_at")
+)
+LINK_SCHEMA = ModelSchema(
+    Link, ("user", "group", "name", "url", "click_count", "created_at", "updated_at")
+)
+USER_SCHEMA = ModelSchema(
+    CustomUser,
+    (
+        "email",
+        "first_name",
+        "last_name",
+        "is_active",
+        "is_verified",
+        "total_groups",
+        "total_links",
+        "last_login",
+        "date_joined",
+        "created_at",
+        "updated_at",
+    ),
+)
+
+
+def json_default(value: Any) -> Any:
+    """
+    Encodes the values orjson does not support natively
+    :param value: Value to encode
+    :return: JSON compatible value
+    """
+    if isinstance(value, datetime.datetime):
+        return format_datetime(value)
+    return DjangoJSONEncoder().default(value)
+
+
+def dumps(data: Any) -> bytes:
+    """
+    Encodes the provided data to JSON
+    :param data: Data to encode
+    :return: Encoded JSON bytes
+    """
+    with metrics.timed_serialization():
+        if orjson is not None:
+            return orjson.dumps(
+                data, default=json_default, option=orjson.OPT_PASSTHROUGH_DATETIME
+            )
+        return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+class JsonResponse(DjangoJsonResponse):
+    """
+    Drop in replacement of `django.http.JsonResponse` encoded through `dumps`
+    """
+
+    def __init__(self, data: Any, **kwargs: Any) -> None:
+        if orjson is None:
+            with metrics.timed_serialization():
+                super().__init__(data, **kwargs)
+            return
+        for option in ("encoder", "safe", "json_dumps_params"):
+            kwargs.pop(option, None)
+        kwargs.setdefault("content_type", "application/json")
+        # skip JsonResponse's own encoding and hand the bytes to HttpResponse
+        super(DjangoJsonResponse, self).__init__(content=dumps(data), **kwargs)
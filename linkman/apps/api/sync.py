@@ -0,0 +1,147 @@
+"""
+This module stores the incremental sync ("changes since") logic of the `api` application
+
+A sync token is the point in time the client is synced up to. Changes are
+found through `updated_at` on `Group` and `Link` and through `Tombstone`
+rows written when groups or links are deleted. Deleting a group also deletes
+its links, so a group tombstone implies the deletion of every link that
+belonged to it.
+
+`updated_at` is set before a transaction commits, so a change only becomes
+visible once its transaction commits and returned tokens lag `SYNC_OVERLAP`
+behind the current time. The overlap covers the longest write transaction,
+which is a flush of the click buffer: buffered clicks are stamped with the
+time of their flush (see `clicks.py`) and a flush runs at most for the
+timeout of its lock. Clients receive recent changes more than once and must
+apply them idempotently (upsert by id).
+"""
+
+import base64
+import json
+from datetime import datetime, timedelta
+from typing import Any, Iterable
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..api.clicks import FLUSH_LOCK_TIMEOUT
+from ..api.pagination import GROUP_FIELDS, LINK_FIELDS
+from ..authentication.models import CustomUser
+from ..main.models import Group, Link, Tombstone
+
+WRITE_TIMEOUT: int = 30  # seconds, longest request transaction
+SYNC_OVERLAP: timedelta = timedelta(seconds=max(WRITE_TIMEOUT, FLUSH_LOCK_TIMEOUT))
+TOMBSTONE_RETENTION: timedelta = timedelta(days=30)
+MAX_SYNC_CHANGES: int = 5000  # past this, a full reload is cheaper for the client
+
+
+class SyncTokenError(ValueError):
+    """Raised when a sync token can not be decoded"""
+
+
+def encode_token(synced_at: datetime) -> str:
+    """
+    Encodes a point in time into an opaque sync token
+    :param synced_at: Time the client is synced up to
+    :return: URL safe sync token
+    """
+    return base64.urlsafe_b64encode(json.dumps(synced_at.isoformat()).encode()).decode()
+
+
+def decode_token(token: str) -> datetime:
+    """
+    Decodes a token created by `encode_token`
+    :param token: Sync token sent by the client
+    :return: Time the client is synced up to
+    """
+    try:
+        synced_at = parse_datetime(json.loads(base64.urlsafe_b64decode(token.encode())))
+    except (ValueError, TypeError) as e:
+        raise SyncTokenError("Invalid sync token") from e
+    if synced_at is None:
+        raise SyncTokenError("Invalid sync token")
+    return synced_at
+
+
+def new_token() -> str:
+    """
+    Creates the token of a sync happening now
+    :return: Sync token
+    """
+    return encode_token(timezone.now() - SYNC_OVERLAP)
+
+
+def get_changes(user: CustomUser, since: datetime) -> dict[str, Any]:
+    """
+    Gets the groups and links of the user that changed since the provided time
+    :param user: User to get the changes of
+    :param since: Time the client is synced up to
+    :return: Sync response data, with `reset` set if the client must reload everything
+    """
+    token: str = new_token()  # taken before querying so no change falls in between
+    if since < timezone.now() - TOMBSTONE_RETENTION:
+        return {"reset": True, "next_token": token}
+    groups: list[dict[str, Any]] = list(
+        Group.objects.for_user(user)
+        .filter(updated_at__gt=since)
+        .values(*GROUP_FIELDS)[: MAX_SYNC_CHANGES + 1]
+    )
+    links: list[dict[str, Any]] = list(
+        Link.objects.for_user(user)
+        .filter(updated_at__gt=since)
+        .values(*LINK_FIELDS)[: MAX_SYNC_CHANGES + 1]
+    )
+    deleted: dict[str, list[int]] = {"group": [], "link": []}
+    for kind, object_id in Tombstone.objects.filter(
+        user=user, deleted_at__gt=since
+    ).values_list("kind", "object_id")[: MAX_SYNC_CHANGES + 1]:
+        deleted[kind].append(object_id)
+    change_count: int = (
+        len(groups) + len(links) + sum(len(ids) for ids in deleted.values())
+    )
+    if change_count > MAX_SYNC_CHANGES:
+        return {"reset": True, "next_token": token}
+    return {
+        "reset": False,
+        "groups": groups,
+        "links": links,
+        "deleted": {"groups": deleted["group"], "links": deleted["link"]},
+        "next_token": token,
+    }
+
+
+def record_deletion(user_id: int, kind: Tombstone.Kind, object_id: int) -> Tombstone:
+    """
+    Records the deletion of a group or link so it is synced to the dashboard
+    :param user_id: ID of the user the object belonged to
+    :param kind: Type of the deleted object
+    :param object_id: ID of the deleted object
+    :return: Created tombstone
+    """
+    return Tombstone.objects.create(user_id=user_id, kind=kind, object_id=object_id)
+
+
+def record_deletions(
+    user_id: int, kind: Tombstone.Kind, object_ids: Iterable[int]
+) -> list[Tombstone]:
+    """
+    Records the deletion of many groups or links in one query
+    :param user_id: ID of the user the objects belonged to
+    :param kind: Type of the deleted objects
+    :param object_ids: IDs of the deleted objects
+    :return: Created tombstones
+    """
+    return Tombstone.objects.bulk_create(
+        Tombstone(user_id=user_id, kind=kind, object_id=object_id)
+        for object_id in object_ids
+    )
+
+
+def prune_tombstones() -> int:
+    """
+    Deletes the tombstones older than `TOMBSTONE_RETENTION`
+    :return: Amount of deleted tombstones
+    """
+    cutoff: datetime = timezone.now() - TOMBSTONE_RETENTION
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
@@ -1 +1,1687 @@
-# Create your tests here.
+import atexit
+import base64
+import datetime
+import importlib
+import io
+import json
+import logging
+import os
+import queue
+import re
+import runpy
+import threading
+from typing import Any
+from unittest import mock, skipIf, skipUnless
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError, connection
+from django.http import HttpRequest, HttpResponse
+from django.test import (
+    AsyncRequestFactory,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from django_ratelimit.exceptions import Ratelimited
+from redis.exceptions import RedisError
+
+from linkman.log_handlers import ModelQueueHandler, StartedQueueListener
+
+from ..api import (
+    async_views,
+    benchmark,
+    bulk,
+    clicks,
+    counters,
+    deletion,
+    metrics,
+    pagination,
+    schemas,
+    search,
+    serializers,
+    sync,
+    utils,
+)
+from ..api import cache as api_cache
+from ..api.middleware import RatelimitMiddleware, RequestMetricsMiddleware
+from ..authentication.models import CustomUser
+from ..main.models import Group, Link, Tombstone
+
+PASSWORD: str = "Str0ng!password"
+
+
+class ApiTestCase(TestCase):
+    """
+    Test case with a logged-in user owning one group
+    """
+
+    user: CustomUser
+    group: Group
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = CustomUser.objects.create_user(
+            email="user@linkman.com", password=PASSWORD
+        )
+        cls.group = create_group(cls.user, "Default")
+
+    def setUp(self) -> None:
+        cache.clear()  # cached listings and versions outlive the rolled back rows
+        self.client.force_login(self.user)
+
+    def send_json(self, method: str, path: str, data: Any) -> Any:
+        """
+        Sends a JSON body with the provided method
+        :param method: Lowercased HTTP method, e.g. `post`
+        :param path: Path to send the request to
+        :param data: Body to encode
+        :return: Response of the test client
+        """
+        return getattr(self.client, method)(
+            path, json.dumps(data), content_type="application/json"
+        )
+
+
+def create_group(user: CustomUser, name: str) -> Group:
+    """
+    Creates a group and counts it in the totals of its user
+    :param user: User owning the group
+    :param name: Name of the group
+    :return: Created group
+    """
+    group: Group = Group.objects.create(user=user, name=name)
+    CustomUser.objects.adjust_totals(user.pk, groups=1)
+    return group
+
+
+def create_link(group: Group, name: str, url: str = "https://example.com") -> Link:
+    """
+    Creates a link and counts it in the totals of its user
+    :param group: Group of the link, its user owns the link
+    :param name: Name of the link
+    :param url: URL of the link
+    :return: Created link
+    """
+    link: Link = Link.objects.create(user=group.user, group=group, name=name, url=url)
+    CustomUser.objects.adjust_totals(group.user_id, links=1)
+    return link
+
+
+class SearchTests(ApiTestCase):
+    """
+    Tests of `search.py` and `/api/links/search/`
+    """
+
+    def test_fuzzy_match_with_highlights(self) -> None:
+        create_link(self.group, "Django documentation")
+        create_link(self.group, "Python tutorial")
+        page, count = search.search_links(
+            Link.objects.for_user(self.user), "documantation", ("name",)
+        )
+        self.assertEqual(count, 1)
+        self.assertEqual(page[0]["item"]["name"], "Django documentation")
+        self.assertEqual(page[0]["matches"][0]["key"], "name")
+        self.assertTrue(page[0]["matches"][0]["indices"])
+
+    def test_exact_match_ranks_first(self) -> None:
+        create_link(self.group, "github issues")
+        create_link(self.group, "github")
+        page, _ = search.search_links(Link.objects.for_user(self.user), "github")
+        self.assertEqual(
+            [result["item"]["name"] for result in page], ["github", "github issues"]
+        )
+
+    def test_short_query_matches_nothing(self) -> None:
+        create_link(self.group, "a")
+        self.assertEqual(
+            search.search_links(Link.objects.for_user(self.user), "a"), ([], 0)
+        )
+
+    def test_pages_report_the_total_count(self) -> None:
+        for i in range(5):
+            create_link(self.group, f"report {i}")
+        response = self.client.get(
+            "/api/links/search/", {"q": "report", "limit": "2", "offset": "2"}
+        )
+        self.assertEqual(response.status_code, 200)
+        data: dict[str, Any] = response.json()
+        self.assertEqual(data["count"], 5)
+        self.assertEqual(len(data["results"]), 2)
+        self.assertEqual(data["next_offset"], 4)
+        last_page = self.client.get(
+            "/api/links/search/", {"q": "report", "limit": "2", "offset": "4"}
+        ).json()
+        self.assertEqual(len(last_page["results"]), 1)
+        self.assertIsNone(last_page["next_offset"])
+
+    def test_only_searches_the_links_of_the_user(self) -> None:
+        other: CustomUser = CustomUser.objects.create_user(
+            email="other@linkman.com", password=PASSWORD
+        )
+        create_link(create_group(other, "Default"), "secret report")
+        data = self.client.get("/api/links/search/", {"q": "secret"}).json()
+        self.assertEqual(data["count"], 0)
+
+    def test_invalid_parameters(self) -> None:
+        self.assertEqual(
+            self.client.get("/api/links/search/", {"q": "x", "keys": "id"}).status_code,
+            400,
+        )
+        self.assertEqual(
+            self.client.get("/api/links/search/", {"q": "x", "limit": "0"}).status_code,
+            400,
+        )
+        self.assertEqual(
+            self.client.get("/api/links/search/", {"q": "x", "group": "a"}).status_code,
+            400,
+        )
+
+    @skipUnless(connection.vendor == "postgresql", "pg_trgm only exists on PostgreSQL")
+    def test_database_ranking_counts_every_match(self) -> None:
+        Link.objects.bulk_create(
+            Link(user=self.user, group=self.group, name=f"report {i}", url="r")
+            for i in range(600)
+        )
+        page, count = search.search_links(
+            Link.objects.for_user(self.user), "report", limit=10
+        )
+        self.assertEqual(count, 600)
+        self.assertEqual(len(page), 10)
+
+    def test_only_accepts_get(self) -> None:
+        self.assertEqual(self.client.post("/api/links/search/").status_code, 405)
+
+
+class PaginationTests(ApiTestCase):
+    """
+    Tests of the keyset pagination of `pagination.py`
+    """
+
+    def test_cursor_walks_every_link_once(self) -> None:
+        created: list[int] = [create_link(self.group, f"link {i}").id for i in range(7)]
+        seen: list[int] = []
+        params: dict[str, str] = {"limit": "3"}
+        while True:
+            data = self.client.get("/api/links/", params).json()
+            seen.extend(link["id"] for link in data["links"])
+            if data["next_cursor"] is None:
+                break
+            params["cursor"] = data["next_cursor"]
+        self.assertEqual(seen, sorted(created, reverse=True))
+
+    def test_clicks_sort(self) -> None:
+        for click_count in (5, 1, 9):
+            link: Link = create_link(self.group, f"clicked {click_count}")
+            Link.objects.filter(id=link.id).update(click_count=click_count)
+        first = self.client.get("/api/links/", {"sort": "clicks", "limit": "2"}).json()
+        self.assertEqual([link["click_count"] for link in first["links"]], [9, 5])
+        second = self.client.get(
+            "/api/links/",
+            {"sort": "clicks", "limit": "2", "cursor": first["next_cursor"]},
+        ).json()
+        self.assertEqual([link["click_count"] for link in second["links"]], [1])
+        self.assertIsNone(second["next_cursor"])
+
+    def test_forged_cursors_are_rejected(self) -> None:
+        now: str = timezone.now().isoformat()
+        forged: dict[str, list[Any]] = {
+            "clicks": ["clicks", "not a number", 1],
+            "created": ["created", 5, 1],
+        }
+        for sort, position in forged.items():
+            response = self.client.get(
+                "/api/links/", {"sort": sort, "cursor": encode_position(position)}
+            )
+            self.assertEqual(response.status_code, 400, position)
+        for position in (
+            ["created", now, True],
+            ["created", "2024-01-01T00:00:00", 1],  # no offset
+            ["created", now, -1],
+            ["clicks", 2**40, 1],
+            ["last_used", now, 1],  # created for another sort
+            ["created", now],
+        ):
+            response = self.client.get(
+                "/api/links/", {"cursor": encode_position(position)}
+            )
+            self.assertEqual(response.status_code, 400, position)
+        self.assertEqual(
+            self.client.get("/api/links/", {"cursor": "%%%"}).status_code, 400
+        )
+
+    def test_invalid_parameters(self) -> None:
+        for params in ({"sort": "name"}, {"limit": "0"}, {"fields": "secret"}):
+            self.assertEqual(self.client.get("/api/links/", params).status_code, 400)
+
+    def test_fields_parameter(self) -> None:
+        create_link(self.group, "only the name")
+        data = self.client.get("/api/links/", {"fields": "name"}).json()
+        self.assertEqual(data["links"], [{"name": "only the name"}])
+
+    def test_group_listing(self) -> None:
+        create_group(self.user, "Second")
+        data = self.client.get("/api/groups/", {"limit": "1"}).json()
+        self.assertEqual([group["name"] for group in data["groups"]], ["Second"])
+        data = self.client.get(
+            "/api/groups/", {"limit": "1", "cursor": data["next_cursor"]}
+        ).json()
+        self.assertEqual([group["name"] for group in data["groups"]], ["Default"])
+
+
+class ListingFilterTests(ApiTestCase):
+    """
+    Tests of the `sort` and `group` parameters of `/api/links/`
+    """
+
+    def names(self, params: dict[str, str]) -> list[str]:
+        """
+        Lists the names of the links of a listing
+        :param params: Query parameters of the listing
+        :return: Link names in listing order
+        """
+        data = self.client.get("/api/links/", params).json()
+        return [link["name"] for link in data["links"]]
+
+    def test_group_filter(self) -> None:
+        other: Group = create_group(self.user, "Other")
+        create_link(self.group, "first")
+        create_link(other, "second")
+        create_link(self.group, "third")
+        self.assertEqual(self.names({"group": str(self.group.id)}), ["third", "first"])
+        self.assertEqual(self.names({"group": str(other.id)}), ["second"])
+        self.assertEqual(self.names({}), ["third", "second", "first"])
+
+    def test_group_of_another_user_is_empty(self) -> None:
+        stranger: CustomUser = CustomUser.objects.create_user(
+            email="stranger@linkman.com", password=PASSWORD
+        )
+        create_link(create_group(stranger, "Theirs"), "private")
+        group_id: int = Group.objects.get(name="Theirs").id
+        self.assertEqual(self.names({"group": str(group_id)}), [])
+
+    def test_invalid_group(self) -> None:
+        for group in ("abc", "-1", "1.5"):
+            response = self.client.get("/api/links/", {"group": group})
+            self.assertEqual(response.status_code, 400, group)
+
+    def test_last_used_sort_with_group_and_cursor(self) -> None:
+        other: Group = create_group(self.user, "Other")
+        now = timezone.now()
+        for minutes, group, name in (
+            (3, self.group, "old"),
+            (1, self.group, "recent"),
+            (0, other, "other group"),
+            (2, self.group, "middle"),
+        ):
+            link: Link = create_link(group, name)
+            Link.objects.filter(id=link.id).update(
+                updated_at=now - datetime.timedelta(minutes=minutes)
+            )
+        params: dict[str, str] = {
+            "sort": "last_used",
+            "group": str(self.group.id),
+            "limit": "2",
+        }
+        first = self.client.get("/api/links/", params).json()
+        self.assertEqual(
+            [link["name"] for link in first["links"]], ["recent", "middle"]
+        )
+        params["cursor"] = first["next_cursor"]
+        self.assertEqual(self.names(params), ["old"])
+
+    def test_listings_are_cached_per_parameters(self) -> None:
+        other: Group = create_group(self.user, "Other")
+        create_link(self.group, "first")
+        create_link(other, "second")
+        self.assertEqual(self.names({"group": str(other.id)}), ["second"])
+        # a cached page of one group is not served for another one
+        self.assertEqual(self.names({"group": str(self.group.id)}), ["first"])
+        self.assertEqual(self.names({"sort": "clicks"}), ["second", "first"])
+
+
+def encode_position(position: list[Any]) -> str:
+    """
+    Encodes a cursor the way `pagination.encode_cursor` does, without validating it
+    :param position: Decoded cursor
+    :return: Cursor string
+    """
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+class ClickTests(ApiTestCase):
+    """
+    Tests of the click buffer of `clicks.py`
+    """
+
+    @skipUnless(clicks.get_buffer_connection() is not None, "needs a redis cache")
+    def test_flush_stamps_the_flush_time(self) -> None:
+        link: Link = create_link(self.group, "clicked")
+        clicks.record_click(link.id, self.group.id, self.user.pk)
+        clicks.record_click(link.id, self.group.id, self.user.pk)
+        flushed_after = timezone.now()
+        self.assertEqual(clicks.flush_clicks(), 1)
+        link.refresh_from_db()
+        group: Group = Group.objects.get(id=self.group.id)
+        self.assertEqual(link.click_count, 2)
+        # a sync token handed out between the clicks and the flush sees the change
+        self.assertGreaterEqual(link.updated_at, flushed_after)
+        self.assertGreaterEqual(group.updated_at, flushed_after)
+        assert group.last_accessed_at is not None
+        self.assertLess(group.last_accessed_at, flushed_after)
+
+    @skipIf(clicks.get_buffer_connection() is not None, "clicks are buffered")
+    def test_unbuffered_click_updates_the_group(self) -> None:
+        link: Link = create_link(self.group, "clicked")
+        clicked_after = timezone.now()
+        self.assertEqual(clicks.record_click(link.id, self.group.id, self.user.pk), 1)
+        group: Group = Group.objects.get(id=self.group.id)
+        self.assertEqual(Link.objects.get(id=link.id).click_count, 1)
+        self.assertGreaterEqual(group.updated_at, clicked_after)
+        self.assertEqual(group.last_accessed_at, group.updated_at)
+
+    @skipUnless(clicks.get_buffer_connection() is not None, "needs a redis cache")
+    def test_failed_flush_is_retried(self) -> None:
+        link: Link = create_link(self.group, "clicked")
+        clicks.record_click(link.id, self.group.id, self.user.pk)
+        with mock.patch.object(
+            Link.objects, "bulk_update", side_effect=DatabaseError("down")
+        ):
+            with self.assertRaises(DatabaseError):
+                clicks.flush_clicks()
+        self.assertEqual(Link.objects.get(id=link.id).click_count, 0)
+        self.assertEqual(clicks.flush_clicks(), 1)
+        self.assertEqual(Link.objects.get(id=link.id).click_count, 1)
+
+    def test_flush_worker_survives_errors(self) -> None:
+        command = "apps.api.management.commands.flush_clicks"
+        with (
+            mock.patch(
+                f"{command}.flush_clicks", side_effect=[RedisError("down"), 1]
+            ) as flush,
+            mock.patch(f"{command}.time.sleep", side_effect=[None, StopWorker]),
+        ):
+            with self.assertRaises(StopWorker):
+                call_command("flush_clicks", interval=1, stdout=io.StringIO())
+        self.assertEqual(flush.call_count, 2)
+
+    def test_flush_once_reports_errors(self) -> None:
+        with mock.patch(
+            "apps.api.management.commands.flush_clicks.flush_clicks",
+            side_effect=RedisError("down"),
+        ):
+            with self.assertRaises(RedisError):
+                call_command("flush_clicks", stdout=io.StringIO())
+
+
+class RedirectTests(ApiTestCase):
+    """
+    Tests of the `/r/<link_id>` click redirect
+    """
+
+    def test_redirect_records_the_click(self) -> None:
+        link: Link = create_link(self.group, "clicked", "https://example.com/page")
+        with mock.patch.object(clicks, "record_click") as record_click:
+            response = self.client.get(f"/r/{link.id}")
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(response.headers["Location"], "https://example.com/page")
+            self.assertIn("no-store", response.headers["Cache-Control"])
+            # the beacon of the dashboard, which opens the URL itself
+            self.assertEqual(self.client.post(f"/r/{link.id}").status_code, 204)
+        record_click.assert_called_with(link.id, self.group.id, self.user.pk)
+        self.assertEqual(record_click.call_count, 2)
+
+    def test_url_without_a_scheme_redirects_away(self) -> None:
+        response = self.send_json(
+            "post",
+            "/api/batch/",
+            {
+                "operations": [
+                    {
+                        "op": "create",
+                        "type": "link",
+                        "group_id": self.group.id,
+                        "link_name": "bare",
+                        "link_url": "example.com/docs",
+                    }
+                ]
+            },
+        )
+        link_id: int = response.json()["results"][0]["id"]
+        with mock.patch.object(clicks, "record_click"):
+            response = self.client.get(f"/r/{link_id}")
+        self.assertEqual(response.headers["Location"], "http://example.com/docs")
+
+    def test_warm_redirect_runs_no_query(self) -> None:
+        link: Link = create_link(self.group, "clicked")
+        with mock.patch.object(clicks, "record_click"):
+            self.client.get(f"/r/{link.id}")
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(f"/r/{link.id}").status_code, 302)
+
+    def test_missing_links_are_not_found(self) -> None:
+        stranger: CustomUser = CustomUser.objects.create_user(
+            email="stranger@linkman.com", password=PASSWORD
+        )
+        theirs: Link = create_link(create_group(stranger, "Theirs"), "private")
+        self.assertEqual(self.client.get(f"/r/{theirs.id}").status_code, 404)
+        link: Link = create_link(self.group, "deleted")
+        self.client.get(f"/r/{link.id}")  # caches the target
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/api/links/{link.id}/")
+        self.assertEqual(self.client.get(f"/r/{link.id}").status_code, 404)
+
+    def test_method_and_login_are_required(self) -> None:
+        link: Link = create_link(self.group, "clicked")
+        self.assertEqual(self.client.put(f"/r/{link.id}").status_code, 405)
+        self.client.logout()
+        response = self.client.get(f"/r/{link.id}")
+        self.assertEqual(response.status_code, 302)
+        self.assertNotEqual(response.headers["Location"], link.url)
+
+
+class DuplicateTests(ApiTestCase):
+    """
+    Tests of the duplicate detection of `/api/links/duplicates/` and `/api/links/`
+    """
+
+    def test_duplicates_of_a_url(self) -> None:
+        first: Link = create_link(self.group, "first", "https://Example.com/docs/")
+        second: Link = create_link(self.group, "second", "example.com/docs?utm_id=9")
+        create_link(self.group, "other", "https://example.com/other")
+        data = self.client.get(
+            "/api/links/duplicates/", {"url": "https://example.com/docs"}
+        ).json()
+        self.assertEqual(data["url"], "https://example.com/docs")
+        self.assertEqual([link["id"] for link in data["links"]], [first.id])
+        # `http` and `https` are different links
+        data = self.client.get(
+            "/api/links/duplicates/", {"url": "http://example.com:80/docs"}
+        ).json()
+        self.assertEqual([link["id"] for link in data["links"]], [second.id])
+        first.url = "http://example.com/docs"
+        first.save(update_fields=["url"])  # the hash follows the URL
+        data = self.client.get(
+            "/api/links/duplicates/", {"url": "http://example.com/docs"}
+        ).json()
+        self.assertEqual({link["id"] for link in data["links"]}, {first.id, second.id})
+
+    def test_duplicates_of_other_users_are_ignored(self) -> None:
+        stranger: CustomUser = CustomUser.objects.create_user(
+            email="stranger@linkman.com", password=PASSWORD
+        )
+        create_link(create_group(stranger, "Theirs"), "theirs", "https://a.com")
+        data = self.client.get("/api/links/duplicates/", {"url": "https://a.com"})
+        self.assertEqual(data.json()["count"], 0)
+        self.assertEqual(self.client.get("/api/links/duplicates/").status_code, 400)
+
+    def test_create_rejects_duplicates_on_request(self) -> None:
+        existing: Link = create_link(self.group, "existing", "https://a.com/x")
+        body: dict[str, Any] = {
+            "group_id": self.group.id,
+            "link_name": "again",
+            "link_url": "HTTPS://A.COM/x/",
+            "reject_duplicates": True,
+        }
+        response = self.send_json("post", "/api/links/", body)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["link"]["id"], existing.id)
+        body["reject_duplicates"] = False
+        self.assertEqual(self.send_json("post", "/api/links/", body).status_code, 200)
+
+
+class DeletionTests(ApiTestCase):
+    """
+    Tests of the soft deletion and purge of `deletion.py`
+    """
+
+    def test_deleted_group_is_hidden_until_purged(self) -> None:
+        group: Group = create_group(self.user, "Doomed")
+        kept: Link = create_link(self.group, "kept")
+        doomed: list[int] = [create_link(group, f"doomed {i}").id for i in range(3)]
+        self.assertEqual(
+            self.client.delete(f"/api/groups/{group.id}/").status_code, 201
+        )
+        self.assertEqual(list(Link.objects.for_user(self.user)), [kept])
+        self.assertFalse(Group.objects.filter(id=group.id).exists())
+        self.assertEqual(self.client.get(f"/api/groups/{group.id}/").status_code, 404)
+        self.assertEqual(
+            self.client.delete(f"/api/groups/{group.id}/").status_code, 404
+        )
+        self.assertTrue(
+            Tombstone.objects.filter(kind=Tombstone.Kind.GROUP, object_id=group.id)
+        )
+        self.assertEqual(Link.all_objects.filter(id__in=doomed).count(), 3)
+        with mock.patch.object(deletion, "PURGE_BATCH_SIZE", 2):
+            purged: dict[str, int] = deletion.purge_deleted()
+        self.assertEqual(purged, {"users": 0, "groups": 1, "links": 3})
+        self.assertFalse(Link.all_objects.filter(id__in=doomed).exists())
+        self.assertFalse(Group.all_objects.filter(id=group.id).exists())
+        self.assertEqual(deletion.purge_deleted()["groups"], 0)
+
+    def test_group_is_deleted_once(self) -> None:
+        group: Group = create_group(self.user, "Doomed")
+        create_link(group, "doomed")
+        self.assertEqual(deletion.soft_delete_groups(self.user.pk, [group.id]), (1, 1))
+        self.assertEqual(deletion.soft_delete_groups(self.user.pk, [group.id]), (0, 0))
+        user: CustomUser = CustomUser.objects.get(pk=self.user.pk)
+        self.assertEqual((user.total_groups, user.total_links), (1, 0))
+        self.assertEqual(
+            Tombstone.objects.filter(
+                kind=Tombstone.Kind.GROUP, object_id=group.id
+            ).count(),
+            1,
+        )
+
+    def test_other_users_groups_are_not_deleted(self) -> None:
+        stranger: CustomUser = CustomUser.objects.create_user(
+            email="stranger@linkman.com", password=PASSWORD
+        )
+        theirs: Group = create_group(stranger, "Theirs")
+        self.assertEqual(deletion.soft_delete_groups(self.user.pk, [theirs.id]), (0, 0))
+        self.assertEqual(
+            self.client.delete(f"/api/groups/{theirs.id}/").status_code, 404
+        )
+        self.assertTrue(Group.objects.filter(id=theirs.id).exists())
+
+    def test_deleted_account_can_not_log_in_and_is_purged(self) -> None:
+        link_id: int = create_link(self.group, "link").id
+        response = self.client.delete("/api/users/me/")
+        self.assertEqual(response.status_code, 302)
+        user: CustomUser = CustomUser.objects.get(pk=self.user.pk)
+        self.assertIsNotNone(user.deleted_at)
+        self.assertFalse(self.client.login(email="user@linkman.com", password=PASSWORD))
+        # the email is free to sign up again right away
+        CustomUser.objects.create_user(email="user@linkman.com", password=PASSWORD)
+        self.assertEqual(
+            deletion.purge_deleted(), {"users": 1, "groups": 0, "links": 1}
+        )
+        self.assertFalse(CustomUser.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Link.all_objects.filter(id=link_id).exists())
+
+    def test_purge_limit(self) -> None:
+        groups: list[Group] = [create_group(self.user, f"Group {i}") for i in range(3)]
+        deletion.soft_delete_groups(self.user.pk, [group.id for group in groups])
+        self.assertEqual(deletion.purge_deleted(limit=2)["groups"], 2)
+        self.assertEqual(deletion.purge_deleted(limit=2)["groups"], 1)
+
+    def test_purge_worker_survives_database_errors(self) -> None:
+        command = "apps.api.management.commands.purge_deleted"
+        purged: dict[str, int] = {"users": 0, "groups": 0, "links": 0}
+        with (
+            mock.patch(
+                f"{command}.purge_deleted", side_effect=[DatabaseError("down"), purged]
+            ) as purge,
+            mock.patch(f"{command}.time.sleep", side_effect=[None, StopWorker]),
+        ):
+            with self.assertRaises(StopWorker):
+                call_command("purge_deleted", interval=1, stdout=io.StringIO())
+        self.assertEqual(purge.call_count, 2)
+        with mock.patch(f"{command}.purge_deleted", side_effect=DatabaseError("down")):
+            with self.assertRaises(DatabaseError):
+                call_command("purge_deleted", stdout=io.StringIO())
+
+
+class OwnershipTests(ApiTestCase):
+    """
+    Tests that the group and link endpoints only reach the rows of their user
+    """
+
+    stranger_group: Group
+    stranger_link: Link
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        super().setUpTestData()
+        stranger: CustomUser = CustomUser.objects.create_user(
+            email="stranger@linkman.com", password=PASSWORD
+        )
+        cls.stranger_group = create_group(stranger, "Theirs")
+        cls.stranger_link = create_link(cls.stranger_group, "theirs")
+
+    def test_groups_of_other_users(self) -> None:
+        path: str = f"/api/groups/{self.stranger_group.id}/"
+        self.assertEqual(self.client.get(path).status_code, 404)
+        response = self.send_json("patch", path, {"name": "Mine"})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(Group.objects.get(id=self.stranger_group.id).name, "Theirs")
+
+    def test_links_of_other_users(self) -> None:
+        path: str = f"/api/links/{self.stranger_link.id}/"
+        self.assertEqual(self.client.get(path).status_code, 400)
+        body: dict[str, Any] = {
+            "group_id": self.group.id,
+            "link_name": "mine",
+            "link_url": "https://mine.com",
+        }
+        self.assertEqual(self.send_json("put", path, body).status_code, 400)
+        self.assertEqual(self.client.delete(path).status_code, 400)
+        link: Link = Link.objects.get(id=self.stranger_link.id)
+        self.assertEqual((link.name, link.group_id), ("theirs", self.stranger_group.id))
+
+    def test_links_can_not_enter_groups_of_other_users(self) -> None:
+        body: dict[str, Any] = {
+            "group_id": self.stranger_group.id,
+            "link_name": "mine",
+            "link_url": "https://mine.com",
+        }
+        self.assertEqual(self.send_json("post", "/api/links/", body).status_code, 400)
+        link: Link = create_link(self.group, "mine")
+        response = self.send_json("put", f"/api/links/{link.id}/", body)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Link.objects.get(id=link.id).group_id, self.group.id)
+        self.assertEqual(Link.objects.filter(group=self.stranger_group).count(), 1)
+
+    def test_lookups_require_a_login(self) -> None:
+        self.client.logout()
+        self.assertEqual(
+            self.client.get(f"/api/groups/{self.group.id}/").status_code, 401
+        )
+        link: Link = create_link(self.group, "mine")
+        self.assertEqual(self.client.get(f"/api/links/{link.id}/").status_code, 401)
+
+    def test_link_lookup_joins_its_group(self) -> None:
+        link_id: int = create_link(self.group, "mine").id
+        with self.assertNumQueries(1):
+            link: Link | None = utils.get_link_from_db(link_id, self.user)
+            assert link is not None
+            self.assertEqual(link.group.name, "Default")
+        self.assertIsNone(utils.get_link_from_db(self.stranger_link.id, self.user))
+        self.assertIsNone(utils.get_group_from_db(self.stranger_group.id, self.user))
+
+
+class DriverError(Exception):
+    """Error of a database driver reporting the violated constraint, like psycopg"""
+
+    def __init__(self, constraint_name: str) -> None:
+        super().__init__("duplicate key value")
+        self.diag = mock.Mock(constraint_name=constraint_name)
+
+
+class SchemaTests(ApiTestCase):
+    """
+    Tests of the request schemas and constraint errors of `schemas.py`
+    """
+
+    def test_fields(self) -> None:
+        schema = schemas.RequestSchema(
+            schemas.GROUP_ID,
+            schemas.GROUP_NAME,
+            schemas.Field("flag", bool, missing="flag", required=False, default=False),
+        )
+        valid: dict[str, Any] = schema.validate(
+            {"group_id": 1, "group_name": " Work ", "unknown": 1}
+        )
+        self.assertEqual(valid, {"group_id": 1, "group_name": " Work ", "flag": False})
+        invalid: dict[str, Any] = {
+            "group id is a bool": {"group_id": True, "group_name": "a"},
+            "group id is a string": {"group_id": "1", "group_name": "a"},
+            "blank name": {"group_id": 1, "group_name": "   "},
+            "long name": {
+                "group_id": 1,
+                "group_name": "a" * (schemas.GROUP_NAME_LENGTH + 1),
+            },
+            "missing name": {"group_id": 1},
+            "flag is a string": {"group_id": 1, "group_name": "a", "flag": "yes"},
+            "not an object": ["group_id", 1],
+        }
+        for name, body in invalid.items():
+            with self.subTest(name), self.assertRaises(schemas.SchemaError):
+                schema.validate(body)
+
+    def test_invalid_bodies_are_rejected(self) -> None:
+        for body in (b"{", b"[]", b'"name"', b'{"group_name": 5}'):
+            response = self.client.post(
+                "/api/groups/", body, content_type="application/json"
+            )
+            self.assertEqual(response.status_code, 400, body)
+        self.assertEqual(Group.objects.for_user(self.user).count(), 1)
+
+    def test_group_names_are_unique_per_user(self) -> None:
+        response = self.send_json("post", "/api/groups/", {"group_name": "Default"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("already exists", response.json()["detail"])
+        other: Group = create_group(self.user, "Other")
+        response = self.send_json(
+            "patch", f"/api/groups/{other.id}/", {"name": "Default"}
+        )
+        self.assertEqual(response.status_code, 400)
+        # the request still queries after the violation
+        self.assertEqual(Group.objects.get(id=other.id).name, "Other")
+        response = self.batch_rename(other.id, "Default")
+        self.assertEqual(response.status_code, 400)
+        stranger: CustomUser = CustomUser.objects.create_user(
+            email="stranger@linkman.com", password=PASSWORD
+        )
+        self.assertTrue(create_group(stranger, "Default"))
+
+    def test_names_of_deleted_groups_are_free(self) -> None:
+        self.client.delete(f"/api/groups/{self.group.id}/")
+        response = self.send_json("post", "/api/groups/", {"group_name": "Default"})
+        self.assertEqual(response.status_code, 201)
+
+    def batch_rename(self, group_id: int, name: str) -> Any:
+        """
+        Renames a group through `/api/batch/`
+        :param group_id: ID of the group to rename
+        :param name: New name of the group
+        :return: Response of the test client
+        """
+        operation: dict[str, Any] = {
+            "op": "update",
+            "type": "group",
+            "id": group_id,
+            "name": name,
+        }
+        return self.send_json("post", "/api/batch/", {"operations": [operation]})
+
+    def test_other_integrity_errors_are_raised(self) -> None:
+        with self.assertRaises(IntegrityError):
+            with schemas.constraint_errors(
+                Group, schemas.GROUP_NAME_CONSTRAINT, "taken"
+            ):
+                raise IntegrityError("NOT NULL constraint failed: main_group.name")
+        with self.assertRaises(IntegrityError):
+            with schemas.constraint_errors(
+                Group, schemas.GROUP_NAME_CONSTRAINT, "taken"
+            ):
+                Group.objects.create(user=self.user, name=None)  # type: ignore[misc]
+
+    def test_violations_named_by_the_driver(self) -> None:
+        for constraint, violated in (
+            (schemas.GROUP_NAME_CONSTRAINT, True),
+            ("main_group_pkey", False),
+        ):
+            error = IntegrityError("duplicate key value")
+            error.__cause__ = DriverError(constraint)
+            self.assertEqual(
+                schemas.violates_constraint(
+                    error, Group, schemas.GROUP_NAME_CONSTRAINT
+                ),
+                violated,
+            )
+        error = IntegrityError(
+            'duplicate key value violates unique constraint "group_user_name_uniq"'
+        )
+        self.assertTrue(
+            schemas.violates_constraint(error, Group, schemas.GROUP_NAME_CONSTRAINT)
+        )
+
+
+class StopWorker(Exception):
+    """Raised by a mocked `time.sleep` to end the loop of a worker command"""
+
+
+class SerializerTests(ApiTestCase):
+    """
+    Tests of the schema serializers of `serializers.py`
+    """
+
+    def test_schemas_match_the_django_serializer(self) -> None:
+        link: Link = create_link(self.group, "serialized")
+        Link.objects.filter(id=link.id).update(click_count=3)
+        link.refresh_from_db()
+        for obj, schema in (
+            (link, serializers.LINK_SCHEMA),
+            (self.group, serializers.GROUP_SCHEMA),
+        ):
+            legacy: dict[str, Any] = benchmark.legacy_serialize(obj)
+            data: dict[str, Any] = schema.serialize(obj)
+            # columns added later (e.g. `url_hash`) are internal and left out
+            self.assertEqual(data, {key: legacy[key] for key in data})
+
+    def test_user_schema_skips_private_fields(self) -> None:
+        data: dict[str, Any] = serializers.USER_SCHEMA.serialize(self.user)
+        self.assertEqual(data["email"], self.user.email)
+        self.assertNotIn("password", data)
+
+    def test_relations_are_rejected(self) -> None:
+        with self.assertRaises(KeyError):
+            serializers.ModelSchema(Group, ("group_links",))
+
+    def test_format_datetime(self) -> None:
+        value = datetime.datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=datetime.UTC)
+        self.assertEqual(serializers.format_datetime(value), "2025-01-02T03:04:05.678Z")
+        self.assertEqual(
+            serializers.format_datetime(value.replace(microsecond=0)),
+            "2025-01-02T03:04:05Z",
+        )
+        self.assertIsNone(serializers.format_datetime(None))
+
+    def test_json_response(self) -> None:
+        now = timezone.now()
+        response = serializers.JsonResponse({"at": now, "ids": [1, 2]}, status=201)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(
+            json.loads(response.content),
+            {"at": serializers.format_datetime(now), "ids": [1, 2]},
+        )
+
+
+class ListingCacheTests(ApiTestCase):
+    """
+    Tests of the per-user listing cache of `cache.py`
+    """
+
+    def test_warm_listing_does_not_query_the_links(self) -> None:
+        create_link(self.group, "cached")
+        first = self.client.get("/api/links/")
+        with CaptureQueriesContext(connection) as context:
+            second = self.client.get("/api/links/")
+        self.assertEqual(second.content, first.content)
+        self.assertFalse(
+            [query for query in context.captured_queries if "main_link" in query["sql"]]
+        )
+
+    def test_writes_invalidate_the_listings(self) -> None:
+        self.client.get("/api/groups/")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.send_json("post", "/api/groups/", {"group_name": "New"})
+        self.assertEqual(response.status_code, 201)
+        data = self.client.get("/api/groups/").json()
+        self.assertEqual(
+            [group["name"] for group in data["groups"]], ["New", "Default"]
+        )
+
+    def test_version_is_bumped_on_commit(self) -> None:
+        version: int = api_cache.get_data_version(self.user.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            api_cache.bump_data_version(self.user.pk)
+        self.assertEqual(api_cache.get_data_version(self.user.pk), version)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(api_cache.get_data_version(self.user.pk), version)
+
+    def test_listings_are_per_user_and_parameters(self) -> None:
+        other: CustomUser = CustomUser.objects.create_user(
+            email="other@linkman.com", password=PASSWORD
+        )
+        create_link(create_group(other, "Default"), "not mine")
+        create_link(self.group, "mine")
+        self.client.force_login(other)
+        self.client.get("/api/links/")
+        self.client.force_login(self.user)
+        data = self.client.get("/api/links/").json()
+        self.assertEqual([link["name"] for link in data["links"]], ["mine"])
+        data = self.client.get("/api/links/", {"fields": "url"}).json()
+        self.assertEqual(data["links"], [{"url": "https://example.com"}])
+
+
+class ConditionalGetTests(ApiTestCase):
+    """
+    Tests of the ETags built from the data version of the user
+    """
+
+    def test_matching_etag_is_answered_with_304(self) -> None:
+        for path in ("/api/links/", "/api/groups/", f"/api/groups/{self.group.id}/"):
+            etag: str = self.client.get(path)["ETag"]
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(path, headers={"if-none-match": etag})
+            self.assertEqual(response.status_code, 304, path)
+            self.assertEqual(response.content, b"")
+            self.assertFalse(
+                [
+                    query
+                    for query in context.captured_queries
+                    if "main_" in query["sql"]
+                ],
+                path,
+            )
+
+    def test_writes_change_the_etag(self) -> None:
+        etag: str = self.client.get("/api/groups/")["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.send_json("post", "/api/groups/", {"group_name": "New"})
+        response = self.client.get("/api/groups/", headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_etag_depends_on_the_parameters(self) -> None:
+        etag: str = self.client.get("/api/links/")["ETag"]
+        response = self.client.get(
+            "/api/links/", {"limit": "1"}, headers={"if-none-match": etag}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_user_etag_follows_the_user_row(self) -> None:
+        etag: str = self.client.get("/api/users/me/")["ETag"]
+        self.assertEqual(
+            self.client.get(
+                "/api/users/me/", headers={"if-none-match": etag}
+            ).status_code,
+            304,
+        )
+        user: CustomUser = CustomUser.objects.get(pk=self.user.pk)
+        user.first_name = "Renamed"
+        user.save()
+        cache.clear()  # drops the cached user of the session
+        response = self.client.get("/api/users/me/", headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["user"]["first_name"], "Renamed")
+
+
+class SyncTests(ApiTestCase):
+    """
+    Tests of the incremental sync of `sync.py` and `/api/sync/`
+    """
+
+    def sync(self, token: str) -> dict[str, Any]:
+        """
+        Gets the changes since the provided token
+        :param token: Sync token of an earlier sync
+        :return: Response data of `/api/sync/`
+        """
+        response = self.client.get("/api/sync/", {"since": token})
+        self.assertEqual(response.status_code, 200)
+        data: dict[str, Any] = response.json()
+        return data
+
+    def test_first_sync_resets(self) -> None:
+        data = self.client.get("/api/sync/").json()
+        self.assertTrue(data["reset"])
+        self.assertTrue(data["next_token"])
+
+    def test_changes_and_deletions_since_the_token(self) -> None:
+        kept: Link = create_link(self.group, "kept")
+        deleted: Link = create_link(self.group, "deleted")
+        token: str = sync.encode_token(timezone.now())
+        Link.objects.filter(id=kept.id).update(
+            name="renamed", updated_at=timezone.now()
+        )
+        self.client.delete(f"/api/links/{deleted.id}/")
+        data = self.sync(token)
+        self.assertFalse(data["reset"])
+        self.assertEqual([link["name"] for link in data["links"]], ["renamed"])
+        self.assertEqual(data["deleted"]["links"], [deleted.id])
+        self.assertEqual(data["groups"], [])
+
+    def test_expired_and_invalid_tokens(self) -> None:
+        expired: str = sync.encode_token(
+            timezone.now() - sync.TOMBSTONE_RETENTION - datetime.timedelta(days=1)
+        )
+        self.assertTrue(self.sync(expired)["reset"])
+        self.assertEqual(
+            self.client.get("/api/sync/", {"since": "%%%"}).status_code, 400
+        )
+
+    def test_overlap_covers_a_click_flush(self) -> None:
+        self.assertGreaterEqual(
+            sync.SYNC_OVERLAP.total_seconds(), clicks.FLUSH_LOCK_TIMEOUT
+        )
+
+    @skipUnless(clicks.get_buffer_connection() is not None, "needs a redis cache")
+    def test_flushed_clicks_are_synced(self) -> None:
+        link: Link = create_link(self.group, "clicked")
+        clicked_at = timezone.now() - sync.SYNC_OVERLAP * 2
+        with mock.patch("apps.api.clicks.timezone.now", return_value=clicked_at):
+            clicks.record_click(link.id, self.group.id, self.user.pk)
+        # handed out after the click, before the flush
+        token: str = self.client.get("/api/sync/").json()["next_token"]
+        clicks.flush_clicks()
+        data = self.sync(token)
+        self.assertEqual(
+            [(link["id"], link["click_count"]) for link in data["links"]],
+            [(link.id, 1)],
+        )
+        self.assertEqual([group["id"] for group in data["groups"]], [self.group.id])
+
+
+class BulkTests(ApiTestCase):
+    """
+    Tests of the link import and export of `bulk.py`
+    """
+
+    def import_body(self, body: bytes, content_type: str) -> Any:
+        """
+        Sends an import request
+        :param body: Body of the import
+        :param content_type: Content type of the import
+        :return: Response of the test client
+        """
+        return self.client.post("/api/links/bulk/", body, content_type=content_type)
+
+    def test_json_lines_import(self) -> None:
+        body: bytes = b"\n".join(
+            [
+                json.dumps(
+                    {"name": "Docs", "url": "https://docs.example.com"}
+                ).encode(),
+                b"",
+                json.dumps(
+                    {"name": "News", "url": "https://news.example.com", "group": "Read"}
+                ).encode(),
+            ]
+        )
+        response = self.import_body(body, "application/x-ndjson")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["created_links"], 2)
+        self.assertEqual(response.json()["created_groups"], 1)
+        self.assertEqual(Link.objects.get(name="News").group.name, "Read")
+        user: CustomUser = CustomUser.objects.get(pk=self.user.pk)
+        self.assertEqual((user.total_groups, user.total_links), (2, 2))
+
+    def test_netscape_import(self) -> None:
+        body: bytes = b"""<!DOCTYPE NETSCAPE-Bookmark-file-1>
+<DL><p>
+<DT><H3>Work</H3>
+<DL><p>
+<DT><A HREF="https://work.example.com">Work &amp; more</A>
+</DL><p>
+<DT><A HREF="https://example.com/top">Top</A>
+<DT><A HREF="place:sort=8">Recent</A>
+</DL><p>
+"""
+        response = self.import_body(body, "text/html")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            set(Link.objects.for_user(self.user).values_list("group__name", "name")),
+            {("Work", "Work & more"), ("Default", "Top")},
+        )
+
+    def test_invalid_lines_import_nothing(self) -> None:
+        body: bytes = b'{"name": "ok", "url": "https://example.com"}\nnot json\n[]'
+        response = self.import_body(body, "application/x-ndjson")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error["line"] for error in response.json()["errors"]], [2, 3])
+        self.assertFalse(Link.objects.for_user(self.user).exists())
+        self.assertEqual(self.import_body(b"  ", "text/plain").status_code, 400)
+
+    def test_too_large_import(self) -> None:
+        chunks = bulk.read_chunks(io.BytesIO(b"x" * 11), max_bytes=10)
+        with self.assertRaises(bulk.ImportTooLargeError):
+            list(chunks)
+
+    def test_group_created_in_parallel_is_reused(self) -> None:
+        imported = [bulk.ImportedLink(1, "Default", "Docs", "https://example.com")]
+        # the group exists, but was created after the import looked for it
+        with mock.patch.object(
+            Group.objects, "for_user", return_value=Group.objects.none()
+        ):
+            created = bulk.import_links(self.user, imported)
+        self.assertEqual(created, (1, 0))
+        self.assertEqual(Link.objects.get(name="Docs").group_id, self.group.id)
+        self.assertEqual(CustomUser.objects.get(pk=self.user.pk).total_groups, 1)
+
+    def test_export_round_trips(self) -> None:
+        create_link(self.group, "exported", "https://example.com/export")
+        response = self.client.get("/api/links/export/")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines: list[dict[str, Any]] = [
+            json.loads(line) for line in response.getvalue().splitlines()
+        ]
+        self.assertEqual(
+            [(line["group"], line["name"], line["url"]) for line in lines],
+            [("Default", "exported", "https://example.com/export")],
+        )
+
+
+class BatchTests(ApiTestCase):
+    """
+    Tests of the batch operations of `batch.py` and `/api/batch/`
+    """
+
+    def batch(self, *operations: dict[str, Any]) -> Any:
+        """
+        Sends a batch request
+        :param operations: Operations of the batch
+        :return: Response of the test client
+        """
+        return self.send_json("post", "/api/batch/", {"operations": list(operations)})
+
+    def test_operations_are_applied_together(self) -> None:
+        link: Link = create_link(self.group, "old")
+        response = self.batch(
+            {"op": "create", "type": "group", "group_name": "Work"},
+            {
+                "op": "update",
+                "type": "link",
+                "id": link.id,
+                "link_name": "new",
+                "link_url": "https://example.com/new",
+            },
+            {
+                "op": "create",
+                "type": "link",
+                "group_id": self.group.id,
+                "link_name": "created",
+                "link_url": "https://example.com/created",
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        results: list[dict[str, Any]] = response.json()["results"]
+        self.assertEqual([result["index"] for result in results], [0, 1, 2])
+        self.assertTrue(Group.objects.filter(id=results[0]["id"], name="Work").exists())
+        self.assertEqual(Link.objects.get(id=link.id).name, "new")
+        user: CustomUser = CustomUser.objects.get(pk=self.user.pk)
+        self.assertEqual((user.total_groups, user.total_links), (2, 2))
+
+    def test_invalid_operation_applies_nothing(self) -> None:
+        link: Link = create_link(self.group, "kept")
+        response = self.batch(
+            {"op": "delete", "type": "link", "ids": [link.id]},
+            {"op": "update", "type": "group", "id": True, "name": "Renamed"},
+            {"op": "move", "type": "link", "ids": [link.id], "group_id": False},
+            {"op": "delete", "type": "group", "ids": [10**9]},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [error["index"] for error in response.json()["errors"]], [1, 2, 3]
+        )
+        self.assertTrue(Link.objects.filter(id=link.id).exists())
+
+    def test_counts_are_the_changed_rows(self) -> None:
+        links: list[int] = [create_link(self.group, f"link {i}").id for i in range(3)]
+        second: Group = create_group(self.user, "Second")
+        response = self.batch(
+            {"op": "move", "type": "link", "ids": links[:2], "group_id": second.id},
+            {"op": "delete", "type": "link", "ids": links},
+            {"op": "delete", "type": "link", "ids": links[:1]},
+            {"op": "delete", "type": "group", "ids": [second.id]},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [result["count"] for result in response.json()["results"]], [2, 3, 0, 1]
+        )
+        self.assertEqual(
+            sorted(
+                Tombstone.objects.filter(kind=Tombstone.Kind.LINK).values_list(
+                    "object_id", flat=True
+                )
+            ),
+            links,
+        )
+        user: CustomUser = CustomUser.objects.get(pk=self.user.pk)
+        self.assertEqual((user.total_groups, user.total_links), (1, 0))
+
+    def test_other_users_objects_are_rejected(self) -> None:
+        other: CustomUser = CustomUser.objects.create_user(
+            email="other@linkman.com", password=PASSWORD
+        )
+        foreign: Link = create_link(create_group(other, "Default"), "foreign")
+        response = self.batch({"op": "delete", "type": "link", "ids": [foreign.id]})
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(Link.objects.filter(id=foreign.id).exists())
+
+    def test_names_and_urls_are_stripped(self) -> None:
+        link: Link = create_link(self.group, "old")
+        response = self.batch(
+            {"op": "update", "type": "group", "id": self.group.id, "name": " Work "},
+            {
+                "op": "update",
+                "type": "link",
+                "id": link.id,
+                "link_name": " new ",
+                "link_url": " https://example.com/new ",
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Group.objects.get(id=self.group.id).name, "Work")
+        link.refresh_from_db()
+        self.assertEqual((link.name, link.url), ("new", "https://example.com/new"))
+
+    def test_rename_conflicts_are_reported_on_their_operation(self) -> None:
+        other: Group = create_group(self.user, "Other")
+        response = self.batch(
+            {"op": "update", "type": "group", "id": self.group.id, "name": "Default "},
+            {"op": "update", "type": "group", "id": other.id, "name": " Default"},
+            {"op": "create", "type": "group", "group_name": "New"},
+            {"op": "update", "type": "group", "id": other.id, "name": "New"},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()["errors"],
+            [
+                {
+                    "index": 1,
+                    "detail": "A group with the name 'Default' already exists",
+                },
+                {"index": 3, "detail": "A group with the name 'New' already exists"},
+            ],
+        )
+        self.assertEqual(Group.objects.get(id=other.id).name, "Other")
+
+    def test_malformed_batches(self) -> None:
+        bodies: list[dict[str, Any]] = [{}, {"operations": []}, {"operations": [1]}]
+        for body in bodies:
+            response = self.send_json("post", "/api/batch/", body)
+            self.assertEqual(response.status_code, 400, body)
+
+
+def rate_limited_view(request: HttpRequest, exception: Exception) -> HttpResponse:
+    """`RATELIMIT_VIEW` of the middleware tests"""
+    return HttpResponse("slow down", status=429)
+
+
+class AsyncApiTests(ApiTestCase):
+    """
+    Tests of the async views of `async_views.py` and the middleware they run under
+    """
+
+    def async_get(self, path: str, user: Any, **headers: str) -> HttpRequest:
+        """
+        Builds an async GET request sent by the provided user
+        :param path: Path of the request
+        :param user: User sending the request
+        :param headers: Extra headers of the request
+        :return: Request object, as the authentication middleware leaves it
+        """
+        request: HttpRequest = AsyncRequestFactory().get(path, headers=headers)
+
+        async def auser() -> Any:
+            return user
+
+        request.auser = auser
+        return request
+
+    def test_middleware_is_async_capable(self) -> None:
+        for path in settings.MIDDLEWARE:
+            self.assertTrue(import_string(path).async_capable, path)
+
+    async def test_listing_matches_the_sync_view(self) -> None:
+        await sync_to_async(create_link)(self.group, "async")
+        response = await async_views.link_all(self.async_get("/api/links/", self.user))
+        self.assertEqual(response.status_code, 200)
+        sync_response = await sync_to_async(self.client.get)("/api/links/")
+        self.assertEqual(json.loads(response.content), sync_response.json())
+        etag: str = response["ETag"]
+        cached = await async_views.link_all(
+            self.async_get("/api/links/", self.user, if_none_match=etag)
+        )
+        self.assertEqual(cached.status_code, 304)
+
+    async def test_details_are_scoped_to_the_user(self) -> None:
+        other: CustomUser = await CustomUser.objects.acreate(email="other@linkman.com")
+        request = self.async_get(f"/api/groups/{self.group.id}/", other)
+        response = await async_views.group_one(request, self.group.id)
+        self.assertEqual(response.status_code, 404)
+        request = self.async_get(f"/api/groups/{self.group.id}/", self.user)
+        response = await async_views.group_one(request, self.group.id)
+        self.assertEqual(json.loads(response.content)["group"]["id"], self.group.id)
+        link: Link = await sync_to_async(create_link)(self.group, "async")
+        request = self.async_get(f"/api/links/{link.id}/", other)
+        response = await async_views.link_one(request, link.id)
+        self.assertEqual(response.status_code, 400)
+        request = self.async_get(f"/api/links/{link.id}/", self.user)
+        response = await async_views.link_one(request, link.id)
+        self.assertEqual(json.loads(response.content)["link"]["id"], link.id)
+        # the links of a deleted group are hidden like on the sync path
+        await sync_to_async(deletion.soft_delete_groups)(self.user.pk, [self.group.id])
+        response = await async_views.link_one(request, link.id)
+        self.assertEqual(response.status_code, 400)
+
+    async def test_anonymous_requests_are_rejected(self) -> None:
+        request = self.async_get("/api/users/me/", AnonymousUser())
+        self.assertEqual((await async_views.users_one(request)).status_code, 401)
+
+    def test_rate_limited_requests(self) -> None:
+        middleware = RatelimitMiddleware(lambda request: HttpResponse())
+        request: HttpRequest = RequestFactory().post("/login/")
+        self.assertIsNone(middleware.process_exception(request, Ratelimited()))
+        with self.settings(RATELIMIT_VIEW="apps.api.tests.rate_limited_view"):
+            response = middleware.process_exception(request, Ratelimited())
+            assert response is not None
+            self.assertEqual(response.status_code, 429)
+            self.assertIsNone(middleware.process_exception(request, ValueError()))
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    """
+    Tests of the database connection profiles of `settings.py`
+    """
+
+    def load_database(self, **env: str) -> dict[str, Any]:
+        """
+        Evaluates the settings module with the provided environment
+        :param env: Environment variables to set, others of the profile are unset
+        :return: Default database of the evaluated settings
+        """
+        profile: dict[str, str] = {
+            "SERVER_MODE": "wsgi",
+            "DB_CONN_MAX_AGE": "",
+            "DB_POOL": "",
+        }
+        with mock.patch.dict("os.environ", {**profile, **env}):
+            for key in profile.keys() - env.keys():
+                del os.environ[key]
+            database: dict[str, Any] = runpy.run_path(
+                str(settings.BASE_DIR / "linkman" / "settings.py")
+            )["DATABASES"]["default"]
+        return database
+
+    def test_connections_persist_under_wsgi(self) -> None:
+        database: dict[str, Any] = self.load_database()
+        self.assertEqual(database["CONN_MAX_AGE"], 60)
+        self.assertTrue(database["CONN_HEALTH_CHECKS"])
+        self.assertNotIn("pool", database["OPTIONS"])
+
+    def test_connections_close_under_asgi(self) -> None:
+        self.assertEqual(self.load_database(SERVER_MODE="asgi")["CONN_MAX_AGE"], 0)
+
+    def test_pool(self) -> None:
+        database: dict[str, Any] = self.load_database(
+            DB_POOL="True", DB_POOL_MAX_SIZE="20", DB_CONN_MAX_AGE="60"
+        )
+        self.assertEqual(database["CONN_MAX_AGE"], 0)  # Django rejects both
+        self.assertEqual(
+            database["OPTIONS"]["pool"], {"min_size": 2, "max_size": 20, "timeout": 10}
+        )
+
+    def test_benchmark_profiles(self) -> None:
+        for name, env in benchmark.CONNECTION_PROFILES.items():
+            database: dict[str, Any] = self.load_database(**env)
+            self.assertEqual(
+                database["CONN_MAX_AGE"], int(env["DB_CONN_MAX_AGE"]), name
+            )
+            self.assertEqual(
+                "pool" in database["OPTIONS"], env["DB_POOL"] == "True", name
+            )
+
+
+class MetricsTests(ApiTestCase):
+    """
+    Tests of `metrics.py`, `RequestMetricsMiddleware` and `/api/internal/metrics/`
+    """
+
+    def test_request_is_measured(self) -> None:
+        response = self.client.get("/api/links/")
+        self.assertIn("total;dur=", response.headers["Server-Timing"])
+
+    def test_failed_recording_keeps_the_response(self) -> None:
+        with mock.patch.object(
+            metrics.buffer, "record", side_effect=RuntimeError("full")
+        ):
+            response = self.client.get("/api/links/")
+        self.assertEqual(response.status_code, 200)
+
+    def test_failed_flush_drops_the_samples(self) -> None:
+        conn = mock.Mock()
+        conn.pipeline.return_value.execute.side_effect = RedisError("down")
+        metrics.buffer.add('linkman_request_db_queries_count|view="links"', 1)
+        with mock.patch.object(metrics, "get_metrics_connection", return_value=conn):
+            metrics.buffer.flush()
+        self.assertEqual(metrics.buffer.pending, {})
+
+    def test_one_request_per_interval_flushes(self) -> None:
+        request_metrics = metrics.RequestMetrics()
+        with mock.patch.object(metrics.buffer, "last_flush", 0.0):
+            self.assertTrue(metrics.buffer.record("links", request_metrics, 0.1))
+            self.assertFalse(metrics.buffer.record("links", request_metrics, 0.1))
+
+    async def test_async_flush_runs_off_the_event_loop(self) -> None:
+        async def view(request: HttpRequest) -> HttpResponse:
+            return HttpResponse()
+
+        threads: list[int] = []
+        with (
+            mock.patch.object(metrics.buffer, "last_flush", 0.0),
+            mock.patch.object(
+                metrics.buffer,
+                "flush",
+                side_effect=lambda: threads.append(threading.get_ident()),
+            ),
+        ):
+            await RequestMetricsMiddleware(view).__acall__(
+                AsyncRequestFactory().get("/")
+            )
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], threading.get_ident())
+
+    def test_read_decodes_the_fields(self) -> None:
+        conn = mock.Mock()
+        conn.hgetall.return_value = {b"a|x": b"1.5", "b|y": "2"}
+        with mock.patch.object(metrics, "get_metrics_connection", return_value=conn):
+            self.assertEqual(metrics.buffer.read(), {"a|x": 1.5, "b|y": 2.0})
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_export_requires_the_token(self) -> None:
+        self.client.get("/api/links/")
+        response = self.client.get(
+            "/api/internal/metrics/", headers={"Authorization": "Bearer secret"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"linkman_request_duration_seconds", response.content)
+        for token in ("Bearer secre", "Bearer secret!", "Bearer s\u00e9cret", ""):
+            response = self.client.get(
+                "/api/internal/metrics/", headers={"Authorization": token}
+            )
+            self.assertEqual(response.status_code, 404, token)
+
+
+class LogHandlerTests(ApiTestCase):
+    """
+    Tests of the queued logging of `log_handlers.py`
+    """
+
+    def get_listener(self) -> StartedQueueListener:
+        """
+        Gets the listener of the configured queue handler
+        :return: Listener writing to the file and console handlers
+        """
+        queue_handler = logging.getLogger("apps.api").handlers[0]
+        self.assertIsInstance(queue_handler, ModelQueueHandler)
+        listener: StartedQueueListener = getattr(queue_handler, "listener")
+        self.assertIsInstance(listener, StartedQueueListener)
+        return listener
+
+    def test_records_reach_the_file_of_their_logger(self) -> None:
+        listener: StartedQueueListener = self.get_listener()
+        assert isinstance(listener.queue, queue.Queue)
+        handlers: dict[str, logging.Handler] = {
+            handler.name or "": handler for handler in listener.handlers
+        }
+        with (
+            mock.patch.object(handlers["api_file"], "emit") as api_emit,
+            mock.patch.object(handlers["main_file"], "emit") as main_emit,
+        ):
+            logging.getLogger("apps.api.views").warning(
+                "Queued", extra={"user": self.user, "group_name": "Default"}
+            )
+            listener.queue.join()  # wait for the listener thread
+        main_emit.assert_not_called()
+        record: logging.LogRecord = api_emit.call_args.args[0]
+        self.assertEqual(record.getMessage(), "Queued")
+        self.assertEqual(getattr(record, "user"), self.user.pk)  # not the instance
+        self.assertEqual(getattr(record, "group_name"), "Default")
+
+    def test_listener_stops_more_than_once(self) -> None:
+        listener = StartedQueueListener(queue.Queue(), logging.NullHandler())
+        listener.stop()
+        listener.stop()  # again at exit
+        atexit.unregister(listener.stop)
+
+
+class BenchmarkTests(ApiTestCase):
+    """
+    Tests of the test client phase of `benchmark.py`
+    """
+
+    def test_created_links_are_deleted_like_the_api_does(self) -> None:
+        link: Link = create_link(self.group, "Seeded")
+        with self.captureOnCommitCallbacks(execute=True):
+            results: dict[str, Any] = benchmark.run_client_benchmark(self.user, 2)
+        self.assertEqual(results.keys(), benchmark.SCENARIOS.keys())
+        self.assertEqual(results["POST /api/links/"]["errors"], 0)
+        self.assertEqual(list(Link.objects.for_user(self.user)), [link])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.total_links, 1)
+        # warm up and measured requests, every created link left a tombstone
+        self.assertEqual(
+            Tombstone.objects.filter(user=self.user, kind=Tombstone.Kind.LINK).count(),
+            3,
+        )
+
+
+class CounterTests(ApiTestCase):
+    """
+    Tests of the `total_groups` and `total_links` counters of the users
+    """
+
+    def assert_totals(self, groups: int, links: int) -> None:
+        """
+        Checks the counters of the user against the expected totals
+        :param groups: Expected amount of groups
+        :param links: Expected amount of links
+        """
+        self.user.refresh_from_db()
+        self.assertEqual(
+            (self.user.total_groups, self.user.total_links), (groups, links)
+        )
+
+    def test_api_writes_adjust_the_counters(self) -> None:
+        response = self.send_json("post", "/api/groups/", {"group_name": "Work"})
+        group_id: int = response.json()["group"]["id"]
+        response = self.send_json(
+            "post",
+            "/api/links/",
+            {"group_id": group_id, "link_name": "Docs", "link_url": "https://a.com"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assert_totals(2, 1)
+        self.client.delete(f"/api/links/{response.json()['link']['id']}/")
+        self.assert_totals(2, 0)
+        create_link(Group.objects.get(id=group_id), "Other")
+        self.client.delete(f"/api/groups/{group_id}/")
+        self.assert_totals(1, 0)  # with the links of the group
+
+    def test_drifted_counters_are_reconciled(self) -> None:
+        create_link(self.group, "Kept")
+        create_link(create_group(self.user, "Deleted"), "Deleted")
+        Group.objects.filter(name="Deleted").update(deleted_at=timezone.now())
+        CustomUser.objects.filter(pk=self.user.pk).update(total_links=7)
+        self.assertEqual(counters.reconcile_counters(dry_run=True), [self.user.pk])
+        self.assert_totals(2, 7)
+        out = io.StringIO()
+        call_command("reconcile_counters", stdout=out)
+        self.assertIn("Repaired 1 user(s)", out.getvalue())
+        self.assert_totals(1, 1)  # the soft deleted group and its links are not counted
+        self.assertEqual(counters.get_drifted_user_ids(), [])
+
+    def test_migration_backfills_the_counters(self) -> None:
+        create_link(self.group, "Link")
+        CustomUser.objects.filter(pk=self.user.pk).update(total_groups=0, total_links=0)
+        migration = importlib.import_module(
+            "apps.main.migrations.0007_backfill_user_totals"
+        )
+        migration.backfill_user_totals(apps, None)
+        self.assert_totals(1, 1)
+
+
+# a sort node of a PostgreSQL plan, the rows of a listing must come from the index in order
+PLAN_SORT = re.compile(r"^\s*(->\s*)?(Incremental )?Sort\b", re.MULTILINE)
+
+
+@skipUnless(connection.vendor == "postgresql", "plans are checked on PostgreSQL")
+class QueryPlanTests(ApiTestCase):
+    """
+    Tests that the hot api queries are served by the composite indexes
+
+    Sequential scans are turned off while explaining, so on the few rows of a
+    test a missing index shows up as a `Seq Scan` instead of a cheaper plan.
+    """
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        super().setUpTestData()
+        for index in range(3):
+            create_link(cls.group, f"Link {index}", f"https://example.com/{index}")
+
+    def assert_index(self, queryset: Any, index: str) -> None:
+        """
+        Checks that a query reads the provided index, in order if it is sorted
+        :param queryset: Query to explain
+        :param index: Name of the index the query must use
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")  # undone with the test
+        plan: str = queryset.explain()
+        self.assertIn(index, plan)
+        self.assertNotIn("Seq Scan on main_", plan)
+        if queryset.query.order_by:
+            self.assertNotRegex(plan, PLAN_SORT)
+
+    def link_page(self, params: dict[str, Any], group: bool = False) -> Any:
+        """
+        Builds the first page query of the links listing
+        :param params: Query parameters of the listing
+        :param group: Whether to narrow the listing to the group of the user
+        :return: Page queryset
+        """
+        links = Link.objects.for_user(self.user)
+        if group:
+            links = pagination.filter_group(links, str(self.group.id))
+        return pagination.page_query(
+            links, params, pagination.LINK_FIELDS, pagination.LINK_SORTS
+        )[0]
+
+    def test_link_listings(self) -> None:
+        last: Link = Link.objects.for_user(self.user).earliest("created_at")
+        cases: dict[str, tuple[Any, str]] = {
+            "created": (self.link_page({}), "link_user_created_idx"),
+            "next page": (
+                self.link_page(
+                    {
+                        "cursor": pagination.encode_cursor(
+                            {"created_at": last.created_at, "id": last.id}
+                        )
+                    }
+                ),
+                "link_user_created_idx",
+            ),
+            "clicks": (self.link_page({"sort": "clicks"}), "link_user_clicks_idx"),
+            "last used": (
+                self.link_page({"sort": "last_used"}),
+                "link_user_used_idx",
+            ),
+            "group": (self.link_page({}, group=True), "link_group_created_idx"),
+        }
+        for name, (queryset, index) in cases.items():
+            with self.subTest(name):
+                self.assert_index(queryset, index)
+
+    def test_link_lookups(self) -> None:
+        since = timezone.now() - datetime.timedelta(days=1)
+        self.assert_index(
+            utils.find_duplicate_links(self.user, "https://example.com/0"),
+            "link_user_url_idx",
+        )
+        self.assert_index(
+            Link.objects.for_user(self.user).filter(updated_at__gt=since),
+            "link_user_used_idx",
+        )
+
+    def test_search(self) -> None:
+        with connection.cursor() as cursor:
+            # leaves bitmap scans, only the trigram indexes can serve the filter
+            cursor.execute("SET LOCAL enable_indexscan = off")
+        matches = Link.all_objects.filter(
+            search.match_condition("example", search.SEARCH_KEYS)
+        )
+        for key in search.SEARCH_KEYS:
+            with self.subTest(key):
+                self.assert_index(matches, f"main_link_{key}_trgm")
+
+    def test_group_queries(self) -> None:
+        since = timezone.now() - datetime.timedelta(days=1)
+        self.assert_index(
+            pagination.page_query(
+                Group.objects.for_user(self.user), {}, pagination.GROUP_FIELDS
+            )[0],
+            "group_user_created_idx",
+        )
+        self.assert_index(
+            Group.objects.for_user(self.user).filter(updated_at__gt=since),
+            "group_user_updated_idx",
+        )
+        self.assert_index(
+            Tombstone.objects.filter(user=self.user, deleted_at__gt=since),
+            "tombstone_user_deleted_idx",
+        )
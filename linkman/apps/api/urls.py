@@ -1,11 +1,22 @@
+from django.conf import settings
 from django.urls import path
 
-from ..api import views
+from ..api import async_views, views
+
+# read heavy views with an async version, see `async_views.py`
+api_views = async_views if settings.ASYNC_API else views
 
 urlpatterns = [
-    path("groups/", views.group_all, name="groups"),
-    path("groups/<int:group_id>/", views.group_one, name="group"),
-    path("links/", views.link_all, name="links"),
-    path("links/<int:link_id>/", views.link_one, name="link"),
-    path("users/me/", views.users_one, name="user"),
+    path("groups/", api_views.group_all, name="groups"),
+    path("groups/<int:group_id>/", api_views.group_one, name="group"),
+    path("links/", api_views.link_all, name="links"),
+    path("links/bulk/", views.link_bulk, name="link_bulk"),
+    path("links/export/", views.link_export, name="link_export"),
+    path("links/search/", views.link_search, name="link_search"),
+    path("links/duplicates/", views.link_duplicates, name="link_duplicates"),
+    path("links/<int:link_id>/", api_views.link_one, name="link"),
+    path("users/me/", api_views.users_one, name="user"),
+    path("batch/", views.batch_operations, name="batch"),
+    path("sync/", views.sync_changes, name="sync"),
+    path("internal/metrics/", views.metrics_export, name="metrics"),
 ]
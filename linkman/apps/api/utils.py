@@ -2,34 +2,15 @@
 This module stores utility functions for the `api` application
 """
 
-import json
 from typing import Any
 
 from django.contrib.auth.models import AbstractBaseUser, AnonymousUser
-from django.core import serializers
+from django.db.models import QuerySet
 from django.utils import timezone
 
-from ..main.models import CustomUser, Group, Link
-
-
-def validate_group_name(group_name: str) -> bool:
-    """
-    Validates the provided group name
-    :param group_name: Group name to validate
-    :return: True if the group name is valid, false otherwise
-    """
-    group_name = group_name.strip()
-    return 0 < len(group_name) <= 50
-
-
-def validate_unique_group_name(group_name: str, user: CustomUser) -> bool:
-    """
-    Checks if the user already has a group with the provided name
-    :param group_name: Group name to check for
-    :param user: User object to check in
-    :return: True if the user does not have a group with the provided group name, false otherwise
-    """
-    return not Group.objects.filter(name=group_name, user=user).exists()
+from ..api import clicks, sync
+from ..main.models import CustomUser, Group, Link, Tombstone
+from ..main.normalization import hash_url
 
 
 def validate_authentication(user: AbstractBaseUser | AnonymousUser) -> bool:
@@ -41,58 +22,70 @@ def validate_authentication(user: AbstractBaseUser | AnonymousUser) -> bool:
     return isinstance(user, CustomUser) and user.pk is not None
 
 
-def validate_link_name(link_name: str) -> bool:
-    link_name = link_name.strip()
-    return 0 < len(link_name) <= 50
-
-
-def validate_link_url(link_url: str) -> bool:
-    link_url = link_url.strip()
-    return 0 < len(link_url) <= 2000
-
-
-def validate_group_exists(group_id: int, user: CustomUser) -> Group | None:
+def parse_int_param(
+    value: str | None, default: int, minimum: int, maximum: int | None = None
+) -> int | None:
     """
-    Validates that a group exists with the provided id and belongs to the provided user
-    :param group_id: ID of the group to check
-    :param user: User object to check with
-    :return: Group object if it exists, false otherwise
+    Parses an integer query parameter
+    :param value: Raw query parameter value
+    :param default: Value to use when the parameter is missing
+    :param minimum: Smallest accepted value
+    :param maximum: Largest accepted value, larger values are clamped to it
+    :return: Parsed integer, else None if the value is invalid
     """
-    return Group.objects.filter(id=group_id, user=user).first()
+    if value is None or value == "":
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        return None
+    if number < minimum:
+        return None
+    return number if maximum is None else min(number, maximum)
 
 
-def delete_link_in_db(link_id: int) -> bool:
+def delete_link_in_db(link_id: int, user: CustomUser) -> bool:
     """
-    Deletes a link from the database
+    Deletes a link of the provided user from the database
     :param link_id: ID of the link to delete
+    :param user: User object the link must belong to
     :return: True if the link was deleted, false otherwise
     """
-    try:
-        link = Link.objects.get(id=link_id)
-        link.delete()
-        return True
-    except Link.DoesNotExist:
+    # one DELETE, the ownership check is part of its WHERE clause
+    deleted, _ = Link.objects.for_user(user).filter(id=link_id).delete()
+    if not deleted:
         return False
+    sync.record_deletion(user.pk, Tombstone.Kind.LINK, link_id)
+    CustomUser.objects.adjust_totals(user.pk, links=-1)
+    return True
+
+
+def find_duplicate_links(user: CustomUser, url: str) -> QuerySet[Link]:
+    """
+    Finds the links of the provided user with the same normalized URL
+    :param user: User object to search the links of
+    :param url: URL as entered by the user
+    :return: Unordered queryset of the duplicates, served by `link_user_url_idx`
+    """
+    return Link.objects.for_user(user).filter(url_hash=hash_url(url))
 
 
-def update_link_in_db(link_id: int, data: dict[str, Any]) -> str | Link:
+def update_link_in_db(link: Link, data: dict[str, Any], user: CustomUser) -> str | Link:
     """
     Updates a link in the database
-    :param link_id: ID of the link to update
+    :param link: Link object to update, fetched with `get_link_from_db`
     :param data: data to update the link
+    :param user: User object the link and its new group must belong to
     :return: Link object if it was updated else string explaining why the update failed
     """
-
-    link: Link | None = get_link_from_db(link_id)
-    if link is None:
-        return "Unable to update link. Link not found."
-    group: Group | None = get_group_from_db(data["group_id"])
+    # the current group was fetched with the link, only a moved link needs a query
+    group: Group | None = (
+        link.group
+        if data["group_id"] == link.group_id
+        else get_group_from_db(data["group_id"], user)
+    )
     if group is None:
         return "Unable to update link. Group not found."
-    if data["for_clicked"] is True:
-        link.click_count += 1
-        link.save()
-        return link
     # update the link stats
     link.name = data["link_name"]
     link.url = data["link_url"]
@@ -104,6 +97,17 @@ def update_link_in_db(link_id: int, data: dict[str, Any]) -> str | Link:
     return link
 
 
+def record_link_click(link: Link) -> Link:
+    """
+    Records a click of the provided link through the click buffer
+    :param link: Link object that was clicked
+    :return: Link object with the click stats applied, the row itself is updated by the buffer
+    """
+    link.click_count += clicks.record_click(link.id, link.group_id, link.user_id)
+    link.updated_at = timezone.now()
+    return link
+
+
 def update_group_in_db(group: Group, name: str) -> Group:
     """
     Updates a group in the database
@@ -116,38 +120,21 @@ def update_group_in_db(group: Group, name: str) -> Group:
     return group
 
 
-def get_group_from_db(group_id: int) -> Group | None:
+def get_group_from_db(group_id: int, user: CustomUser) -> Group | None:
     """
-    Gets a group from the database
+    Gets a group of the provided user from the database
     :param group_id: ID of the group to retrieve
+    :param user: User object the group must belong to
     :return: Group object if found, else None
     """
-    try:
-        group = Group.objects.get(id=group_id)
-        return group
-    except Group.DoesNotExist:
-        return None
+    return Group.objects.for_user(user).filter(id=group_id).first()
 
 
-def get_link_from_db(link_id: int) -> Link | None:
+def get_link_from_db(link_id: int, user: CustomUser) -> Link | None:
     """
-    Gets a link from the database
+    Gets a link of the provided user from the database, with its group
     :param link_id: ID of the link to retrieve
+    :param user: User object the link must belong to
     :return: Link object if found, else None
     """
-    try:
-        link = Link.objects.get(id=link_id)
-        return link
-    except Link.DoesNotExist:
-        return None
-
-
-def serialize_object(obj: Any) -> dict[str, Any]:
-    """
-    Serializes the provided object to a dict
-    :param obj: Object to serialize
-    :return: Serialized object json dictionary
-    """
-    data: dict[str, Any] = json.loads(serializers.serialize("json", [obj]))[0]["fields"]
-    data["id"] = obj.id
-    return data
+    return Link.objects.for_user(user).filter(id=link_id).first()
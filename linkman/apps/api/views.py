@@ -1,20 +1,51 @@
+import hmac
 import json
 import logging
 from typing import Any
 
+from django.conf import settings
 from django.contrib.auth import logout
-from django.http import HttpRequest, HttpResponseRedirect, JsonResponse
+from django.contrib.auth.decorators import login_required
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
 from django.shortcuts import redirect
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 
-from ..api import utils
+from ..api import (
+    batch,
+    bulk,
+    cache,
+    clicks,
+    deletion,
+    metrics,
+    pagination,
+    schemas,
+    search,
+    sync,
+    utils,
+)
+from ..api.serializers import (
+    GROUP_SCHEMA,
+    LINK_SCHEMA,
+    USER_SCHEMA,
+    JsonResponse,
+)
 from ..authentication.models import CustomUser
 from ..authentication.utils import HttpMethod, LogLevel
 from ..main.models import Group, Link
+from ..main.normalization import absolute_url, normalize_url
 
 logger = logging.getLogger(__name__)
 
 
-def group_all(request: HttpRequest) -> JsonResponse:
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=cache.data_version_etag)
+def group_all(request: HttpRequest) -> HttpResponse:
     if request.method == HttpMethod.POST.value:
         """Equivalent to api/group POST"""
         # ensure that the user is authenticated
@@ -23,39 +54,27 @@ def group_all(request: HttpRequest) -> JsonResponse:
         assert isinstance(
             request.user, CustomUser
         )  # user is confirmed to be a custom user by now
-        # parse the data
-        data: dict[str, Any] = json.loads(request.body)
-        group_name: str | None = data.get("group_name")
-        if group_name is None:
-            return JsonResponse(
-                {"detail": "Error Occurred. Group name is missing"}, status=400
-            )
-        # Validate the group name
-        name_validation_result: bool = utils.validate_group_name(group_name)
-        if not name_validation_result:
-            return JsonResponse(
-                {
-                    "detail": "Invalid group name. Group name must be between 0 - 50 characters"
-                },
-                status=400,
-            )
-        name_uniqueness_result: bool = utils.validate_unique_group_name(
-            group_name, request.user
-        )
-        if not name_uniqueness_result:
-            return JsonResponse(
-                {"detail": f"A group with the name '{group_name}' already exists "},
-                status=400,
-            )
-        # Group name is valid by now
-        new_group = Group(user=request.user, name=group_name)
-        new_group.save()
+        try:
+            data: dict[str, Any] = schemas.GROUP_CREATE_SCHEMA.parse(request.body)
+            group_name: str = data["group_name"]
+            new_group = Group(user=request.user, name=group_name)
+            # the unique constraint checks the name, also against parallel requests
+            with schemas.constraint_errors(
+                Group,
+                schemas.GROUP_NAME_CONSTRAINT,
+                f"A group with the name '{group_name}' already exists ",
+            ):
+                new_group.save()
+        except schemas.SchemaError as e:
+            return JsonResponse({"detail": str(e)}, status=400)
+        CustomUser.objects.adjust_totals(request.user.pk, groups=1)
         logger.log(
             level=LogLevel.INFO.value,
             msg="New Group created",
             extra={"group": new_group, "user": request.user},
         )
-        new_group_data: dict[str, Any] = utils.serialize_object(new_group)
+        cache.bump_data_version(request.user.pk)
+        new_group_data: dict[str, Any] = GROUP_SCHEMA.serialize(new_group)
         return JsonResponse(
             {"detail": "Group successfully created", "group": new_group_data},
             status=201,
@@ -64,63 +83,85 @@ def group_all(request: HttpRequest) -> JsonResponse:
     if not utils.validate_authentication(request.user):
         return JsonResponse({"detail": "User not authenticated"}, status=401)
     assert isinstance(request.user, CustomUser)
-    groups = list(Group.objects.filter(user=request.user).values())
-    return JsonResponse({"groups": groups})
+    user: CustomUser = request.user
+    params: dict[str, Any] = request.GET.dict()
+
+    def build_listing() -> dict[str, Any]:
+        groups, next_cursor = pagination.paginate(
+            Group.objects.for_user(user), params, pagination.GROUP_FIELDS
+        )
+        return {"groups": groups, "next_cursor": next_cursor}
 
+    try:
+        body: bytes = cache.get_cached_listing(user.pk, "groups", params, build_listing)
+    except pagination.PaginationError as e:
+        return JsonResponse({"detail": str(e)}, status=400)
+    return HttpResponse(body, content_type="application/json")
 
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=cache.data_version_etag)
 def group_one(request: HttpRequest, group_id: int) -> JsonResponse:
     if request.method == HttpMethod.DELETE.value:
         """Equivalent to api/groups/id DELETE"""
         if not utils.validate_authentication(request.user):
             return JsonResponse({"detail": "User not authenticated"}, status=401)
-        # user is confirmed to be a custom user now
-        group: Group | None = utils.get_group_from_db(group_id)
-        if not group:
+        assert isinstance(request.user, CustomUser)
+        # the group and its links are hidden now and purged in the background
+        deleted_groups, _ = deletion.soft_delete_groups(request.user.pk, [group_id])
+        if not deleted_groups:
             return JsonResponse({"detail": "Group not found"}, status=404)
-        # group is found by now
-        row_count = group.delete()
-        if not row_count:
-            return JsonResponse({"detail": "Unable to delete the group"}, status=500)
         logger.log(
             level=LogLevel.INFO.value,
             msg="Group deleted",
             extra={"group_id": group_id, "user": request.user},
         )
+        cache.bump_data_version(request.user.pk)
         # group has been deleted by now
         return JsonResponse({"detail": "Group deleted"}, status=201)
     if request.method == HttpMethod.PATCH.value:
         """Equivalent to api/groups/id PATCH"""
         if not utils.validate_authentication(request.user):
             return JsonResponse({"detail": "User not authenticated"}, status=401)
-        # user is confirmed to be a custom user now
-        group: Group | None = utils.get_group_from_db(group_id)
+        assert isinstance(request.user, CustomUser)
+        group: Group | None = utils.get_group_from_db(group_id, request.user)
         if not group:
             return JsonResponse({"detail": "Group not found"}, status=404)
-        # group is found
-        data: dict[str, Any] = json.loads(request.body)
-        name: str | None = data.get("name")
-        if not name:
-            return JsonResponse({"detail": "Missing name field"}, status=400)
-        # name is received
-        updated_group: Group = utils.update_group_in_db(group, name)
+        # group is found and belongs to the user
+        try:
+            name: str = schemas.GROUP_UPDATE_SCHEMA.parse(request.body)["name"]
+            with schemas.constraint_errors(
+                Group,
+                schemas.GROUP_NAME_CONSTRAINT,
+                f"A group with the name '{name}' already exists ",
+            ):
+                updated_group: Group = utils.update_group_in_db(group, name)
+        except schemas.SchemaError as e:
+            return JsonResponse({"detail": str(e)}, status=400)
         logger.log(
             level=LogLevel.INFO.value,
             msg="Group updated",
             extra={"group": updated_group, "user": request.user},
         )
-        updated_group_data: dict[str, Any] = utils.serialize_object(updated_group)
+        cache.bump_data_version(request.user.pk)
+        updated_group_data: dict[str, Any] = GROUP_SCHEMA.serialize(updated_group)
         return JsonResponse(
             {"detail": "Group Updated", "group": updated_group_data}, status=200
         )
     # Request is a simple api/group GET
-    group: Group | None = utils.get_group_from_db(group_id)
+    if not utils.validate_authentication(request.user):
+        return JsonResponse({"detail": "User not authenticated"}, status=401)
+    assert isinstance(request.user, CustomUser)
+    group = utils.get_group_from_db(group_id, request.user)
     if not group:
         return JsonResponse({"detail": "Group not found"}, status=404)
-    group_data: dict[str, Any] = utils.serialize_object(group)
+    group_data: dict[str, Any] = GROUP_SCHEMA.serialize(group)
     return JsonResponse({"detail": "group found", "group": group_data}, status=200)
 
 
-def link_all(request: HttpRequest) -> JsonResponse:
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=cache.data_version_etag)
+def link_all(request: HttpRequest) -> HttpResponse:
     if request.method == HttpMethod.POST.value:
         """Equivalent to api/link POST"""
         if not utils.validate_authentication(request.user):
@@ -128,42 +169,38 @@ def link_all(request: HttpRequest) -> JsonResponse:
         assert isinstance(
             request.user, CustomUser
         )  # user is confirmed to be a custom user by now
-        # parse the data
-        data: dict[str, Any] = json.loads(request.body)
-        # validate group
-        group_id: int | None = data.get("group_id")
-        if group_id is None:
-            return JsonResponse({"detail": "Group id is missing"}, status=400)
-        group: Group | None = utils.validate_group_exists(group_id, request.user)
+        try:
+            data: dict[str, Any] = schemas.LINK_CREATE_SCHEMA.parse(request.body)
+        except schemas.SchemaError as e:
+            return JsonResponse({"detail": str(e)}, status=400)
+        group: Group | None = utils.get_group_from_db(data["group_id"], request.user)
         if not group:
             return JsonResponse({"detail": "Group does not exist"}, status=400)
-        # validate link name
-        link_name: str | None = data.get("link_name")
-        if link_name is None:
-            return JsonResponse({"detail": "Missing Link Name Field"}, status=400)
-        name_validation_result: bool = utils.validate_link_name(link_name)
-        if not name_validation_result:
-            return JsonResponse(
-                {"detail": "Link Name must be between 0 to 50 characters"}, status=400
-            )
-        # validate link url
-        link_url = data.get("link_url")
-        if link_url is None:
-            return JsonResponse({"detail": "Missing Link URL Field"}, status=400)
-        url_validation_result: bool = utils.validate_link_url(link_url)
-        if not url_validation_result:
-            return JsonResponse(
-                {"detail": "Link URL must be between 0 to 2000 characters"}, status=400
-            )
+        link_name: str = data["link_name"]
+        link_url: str = data["link_url"]
+        if data["reject_duplicates"]:
+            duplicate: Link | None = utils.find_duplicate_links(
+                request.user, link_url
+            ).first()
+            if duplicate is not None:
+                return JsonResponse(
+                    {
+                        "detail": "Link URL already exists",
+                        "link": LINK_SCHEMA.serialize(duplicate),
+                    },
+                    status=409,
+                )
         # Link is valid by now
         new_link = Link(name=link_name, url=link_url, user=request.user, group=group)
         new_link.save()
+        CustomUser.objects.adjust_totals(request.user.pk, links=1)
         logger.log(
             level=LogLevel.INFO.value,
             msg="New Link created",
             extra={"link": new_link, "user": request.user},
         )
-        new_link_data: dict[str, Any] = utils.serialize_object(new_link)
+        cache.bump_data_version(request.user.pk)
+        new_link_data: dict[str, Any] = LINK_SCHEMA.serialize(new_link)
         return JsonResponse(
             {"detail": "Link successfully created", "link": new_link_data}
         )
@@ -171,10 +208,129 @@ def link_all(request: HttpRequest) -> JsonResponse:
     if not utils.validate_authentication(request.user):
         return JsonResponse({"detail": "User not authenticated"}, status=401)
     assert isinstance(request.user, CustomUser)
-    links = list(Link.objects.filter(user=request.user).values())
-    return JsonResponse({"links": links})
+    user: CustomUser = request.user
+    params: dict[str, Any] = request.GET.dict()
+
+    def build_listing() -> dict[str, Any]:
+        links, next_cursor = pagination.paginate(
+            pagination.filter_group(Link.objects.for_user(user), params.get("group")),
+            params,
+            pagination.LINK_FIELDS,
+            pagination.LINK_SORTS,
+        )
+        return {"links": links, "next_cursor": next_cursor}
+
+    try:
+        body: bytes = cache.get_cached_listing(user.pk, "links", params, build_listing)
+    except pagination.PaginationError as e:
+        return JsonResponse({"detail": str(e)}, status=400)
+    return HttpResponse(body, content_type="application/json")
+
+
+def link_bulk(request: HttpRequest) -> JsonResponse:
+    """Equivalent to api/links/bulk POST"""
+    if request.method != HttpMethod.POST.value:
+        return JsonResponse({"detail": "Method not allowed"}, status=405)
+    if not utils.validate_authentication(request.user):
+        return JsonResponse({"detail": "User not authenticated"}, status=401)
+    assert isinstance(request.user, CustomUser)
+    try:
+        # the body is streamed instead of loaded through `request.body`
+        links, errors = bulk.parse_import(request, request.content_type or "")
+    except bulk.ImportTooLargeError as e:
+        return JsonResponse({"detail": str(e)}, status=413)
+    except bulk.BulkImportError as e:
+        return JsonResponse({"detail": str(e)}, status=400)
+    if errors:
+        return JsonResponse(
+            {
+                "detail": f"{len(errors)} invalid link(s), nothing was imported",
+                "errors": errors[: bulk.MAX_REPORTED_ERRORS],
+            },
+            status=400,
+        )
+    created_links, created_groups = bulk.import_links(request.user, links)
+    logger.log(
+        level=LogLevel.INFO.value,
+        msg="Links imported",
+        extra={
+            "links": created_links,
+            "groups": created_groups,
+            "user": request.user,
+        },
+    )
+    return JsonResponse(
+        {
+            "detail": "Links successfully imported",
+            "created_links": created_links,
+            "created_groups": created_groups,
+        },
+        status=201,
+    )
+
+
+def link_export(request: HttpRequest) -> JsonResponse | StreamingHttpResponse:
+    """Equivalent to api/links/export GET"""
+    if not utils.validate_authentication(request.user):
+        return JsonResponse({"detail": "User not authenticated"}, status=401)
+    assert isinstance(request.user, CustomUser)
+    response = StreamingHttpResponse(
+        bulk.export_lines(request.user), content_type="application/x-ndjson"
+    )
+    response["Content-Disposition"] = 'attachment; filename="linkman-links.jsonl"'
+    return response
+
+
+def link_duplicates(request: HttpRequest) -> JsonResponse:
+    """Equivalent to api/links/duplicates GET"""
+    if not utils.validate_authentication(request.user):
+        return JsonResponse({"detail": "User not authenticated"}, status=401)
+    assert isinstance(request.user, CustomUser)
+    try:
+        url: str = schemas.DUPLICATES_QUERY_SCHEMA.validate(request.GET.dict())["url"]
+    except schemas.SchemaError as e:
+        return JsonResponse({"detail": str(e)}, status=400)
+    duplicates: list[dict[str, Any]] = list(
+        utils.find_duplicate_links(request.user, url).values(*pagination.LINK_FIELDS)
+    )
+    return JsonResponse(
+        {"url": normalize_url(url), "links": duplicates, "count": len(duplicates)}
+    )
+
+
+def link_search(request: HttpRequest) -> JsonResponse:
+    """Equivalent to api/links/search GET"""
+    if request.method != HttpMethod.GET.value:
+        return JsonResponse({"detail": "Method not allowed"}, status=405)
+    if not utils.validate_authentication(request.user):
+        return JsonResponse({"detail": "User not authenticated"}, status=401)
+    assert isinstance(request.user, CustomUser)
+    query: str = request.GET.get("q", "")
+    keys: tuple[str, ...] | None = search.parse_search_keys(request.GET.get("keys"))
+    if keys is None:
+        return JsonResponse(
+            {"detail": f"Search keys must be one of {', '.join(search.SEARCH_KEYS)}"},
+            status=400,
+        )
+    limit: int | None = utils.parse_int_param(
+        request.GET.get("limit"), search.DEFAULT_PAGE_SIZE, 1, search.MAX_PAGE_SIZE
+    )
+    offset: int | None = utils.parse_int_param(request.GET.get("offset"), 0, 0)
+    if limit is None or offset is None:
+        return JsonResponse({"detail": "Invalid limit or offset"}, status=400)
+    links = Link.objects.for_user(request.user)
+    group_id: str | None = request.GET.get("group")
+    if group_id:
+        if not group_id.isdigit():
+            return JsonResponse({"detail": "Invalid group id"}, status=400)
+        links = links.filter(group_id=int(group_id))
+    page, count = search.search_links(links, query, keys, offset, limit)
+    next_offset: int | None = offset + limit if offset + limit < count else None
+    return JsonResponse({"results": page, "count": count, "next_offset": next_offset})
 
 
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=cache.data_version_etag)
 def link_one(request: HttpRequest, link_id: int) -> JsonResponse:
     if request.method == HttpMethod.DELETE.value:
         """Equivalent to api/link/:id DELETE"""
@@ -182,7 +338,7 @@ def link_one(request: HttpRequest, link_id: int) -> JsonResponse:
         if not utils.validate_authentication(request.user):
             return JsonResponse({"detail": "User not authenticated"}, status=401)
         assert isinstance(request.user, CustomUser)
-        deletion_result: bool = utils.delete_link_in_db(link_id)
+        deletion_result: bool = utils.delete_link_in_db(link_id, request.user)
         if not deletion_result:
             return JsonResponse({"detail": "Link does not exist"}, status=400)
         logger.log(
@@ -190,17 +346,32 @@ def link_one(request: HttpRequest, link_id: int) -> JsonResponse:
             msg="Link Deleted",
             extra={"link_id": link_id, "user": request.user},
         )
+        cache.bump_data_version(request.user.pk)
         return JsonResponse({"detail": "Link successfully deleted"}, status=200)
-    link: Link | None = utils.get_link_from_db(link_id)
+    if not utils.validate_authentication(request.user):
+        return JsonResponse({"detail": "User not authenticated"}, status=401)
+    assert isinstance(request.user, CustomUser)
+    # one query, the ownership check and the group come with the link
+    link: Link | None = utils.get_link_from_db(link_id, request.user)
     if link is None:
         return JsonResponse({"detail": "Link does not exist"}, status=400)
     if request.method == HttpMethod.PUT.value:
         """Equivalent to api/link/:id PUT"""
-        if not utils.validate_authentication(request.user):
-            return JsonResponse({"detail": "User not authenticated"}, status=401)
-        assert isinstance(request.user, CustomUser)
-        data: dict[str, Any] = json.loads(request.body)
-        updated_link: str | Link = utils.update_link_in_db(link_id, data)
+        try:
+            body: Any = schemas.parse_json(request.body)
+            for_clicked: bool = schemas.LINK_CLICK_SCHEMA.validate(body)["for_clicked"]
+            data: dict[str, Any] = (
+                {} if for_clicked else schemas.LINK_UPDATE_SCHEMA.validate(body)
+            )
+        except schemas.SchemaError as e:
+            return JsonResponse({"detail": str(e)}, status=400)
+        if for_clicked:
+            clicked_link: Link = utils.record_link_click(link)
+            clicked_link_data: dict[str, Any] = LINK_SCHEMA.serialize(clicked_link)
+            return JsonResponse(
+                {"detail": "Link click recorded", "link": clicked_link_data}
+            )
+        updated_link: str | Link = utils.update_link_in_db(link, data, request.user)
         # if updated link is a string, then an error occurred
         if not isinstance(updated_link, Link):
             return JsonResponse({"detail": f"{updated_link}"}, status=400)
@@ -209,13 +380,92 @@ def link_one(request: HttpRequest, link_id: int) -> JsonResponse:
             msg="Link updated",
             extra={"link": updated_link, "user": request.user},
         )
-        updated_link_data: dict[str, Any] = utils.serialize_object(updated_link)
+        cache.bump_data_version(request.user.pk)
+        updated_link_data: dict[str, Any] = LINK_SCHEMA.serialize(updated_link)
         return JsonResponse(
             {"detail": "Link successfully updated", "link": updated_link_data},
         )
-    return JsonResponse({"detail": "Link found", "link": link}, status=200)
+    link_data: dict[str, Any] = LINK_SCHEMA.serialize(link)
+    return JsonResponse({"detail": "Link found", "link": link_data}, status=200)
+
 
+@cache_control(private=True, no_store=True)
+@login_required
+def link_redirect(request: HttpRequest, link_id: int) -> HttpResponse:
+    """
+    Equivalent to r/:id GET, redirects to the URL of the link and records the click
 
+    A POST is the `navigator.sendBeacon` ping of the dashboard, which opens the
+    URL itself: the click is recorded and nothing is returned.
+    """
+    if request.method not in (HttpMethod.GET.value, HttpMethod.POST.value):
+        return JsonResponse({"detail": "Method not allowed"}, status=405)
+    assert isinstance(request.user, CustomUser)
+    target: tuple[int, str] | None = clicks.get_click_target(link_id, request.user.pk)
+    if target is None:
+        return JsonResponse({"detail": "Link does not exist"}, status=404)
+    group_id, url = target
+    clicks.record_click(link_id, group_id, request.user.pk)
+    if request.method == HttpMethod.POST.value:
+        return HttpResponse(status=204)
+    # the API stores URLs as sent, without a scheme the redirect would stay in the app
+    return HttpResponseRedirect(absolute_url(url))
+
+
+def batch_operations(request: HttpRequest) -> JsonResponse:
+    """Equivalent to api/batch POST"""
+    if request.method != HttpMethod.POST.value:
+        return JsonResponse({"detail": "Method not allowed"}, status=405)
+    if not utils.validate_authentication(request.user):
+        return JsonResponse({"detail": "User not authenticated"}, status=401)
+    assert isinstance(request.user, CustomUser)
+    try:
+        operations: list[dict[str, Any]] = batch.parse_batch(json.loads(request.body))
+    except ValueError as e:  # also covers invalid JSON
+        detail: str = str(e) if isinstance(e, batch.BatchError) else "Invalid JSON"
+        return JsonResponse({"detail": detail}, status=400)
+    errors: list[dict[str, Any]] = batch.validate_batch(request.user, operations)
+    if errors:
+        return JsonResponse(
+            {"detail": "Invalid operations, nothing was applied", "errors": errors},
+            status=400,
+        )
+    try:
+        # a renamed group can take the name of another group
+        with schemas.constraint_errors(
+            Group,
+            schemas.GROUP_NAME_CONSTRAINT,
+            "A group name is already taken, nothing was applied",
+        ):
+            results: list[dict[str, Any]] = batch.run_batch(request.user, operations)
+    except schemas.SchemaError as e:
+        return JsonResponse({"detail": str(e)}, status=400)
+    logger.log(
+        level=LogLevel.INFO.value,
+        msg="Batch applied",
+        extra={"operations": len(operations), "user": request.user},
+    )
+    return JsonResponse({"detail": "Batch successfully applied", "results": results})
+
+
+def sync_changes(request: HttpRequest) -> JsonResponse:
+    """Equivalent to api/sync GET"""
+    if not utils.validate_authentication(request.user):
+        return JsonResponse({"detail": "User not authenticated"}, status=401)
+    assert isinstance(request.user, CustomUser)
+    token: str | None = request.GET.get("since")
+    if not token:
+        # the client has no local replica yet, it loads the listings after this
+        return JsonResponse({"reset": True, "next_token": sync.new_token()})
+    try:
+        since = sync.decode_token(token)
+    except sync.SyncTokenError as e:
+        return JsonResponse({"detail": str(e)}, status=400)
+    return JsonResponse(sync.get_changes(request.user, since))
+
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=cache.user_etag)
 def users_one(request: HttpRequest) -> JsonResponse | HttpResponseRedirect:
     if request.method == HttpMethod.DELETE.value:
         """Equivalent to api/users/:id DELETE"""
@@ -224,7 +474,8 @@ def users_one(request: HttpRequest) -> JsonResponse | HttpResponseRedirect:
         # user is authenticated
         assert isinstance(request.user, CustomUser)
         user_id: int = request.user.pk
-        request.user.delete()  # delete the user from the database
+        # the account can not log in from now on, its data is purged in the background
+        deletion.soft_delete_user(request.user)
         logger.log(
             level=LogLevel.INFO.value, msg="User Deleted", extra={"user_id": user_id}
         )
@@ -234,7 +485,23 @@ def users_one(request: HttpRequest) -> JsonResponse | HttpResponseRedirect:
     if not utils.validate_authentication(request.user):
         return JsonResponse({"detail": "User not authenticated"}, status=401)
     assert isinstance(request.user, CustomUser)
-    user_data: dict[str, Any] = utils.serialize_object(request.user)
+    user_data: dict[str, Any] = USER_SCHEMA.serialize(request.user)
     return JsonResponse(
         {"detail": "User successfully retrieved", "user": user_data}, status=201
     )
+
+
+def metrics_export(request: HttpRequest) -> HttpResponse:
+    """Equivalent to api/internal/metrics GET, scraped by Prometheus"""
+    token: str = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    metrics_token: str = settings.METRICS_TOKEN or ""
+    # constant time, so the response time does not reveal a prefix of the token
+    has_token: bool = bool(metrics_token) and hmac.compare_digest(
+        token.encode(), metrics_token.encode()
+    )
+    if not has_token and not request.user.is_staff:
+        # internal endpoint, do not reveal that it exists
+        return JsonResponse({"detail": "Not found"}, status=404)
+    return HttpResponse(
+        metrics.render_prometheus(), content_type="text/plain; version=0.0.4"
+    )
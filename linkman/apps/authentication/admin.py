@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import CustomUser
+from .models import CustomUser, OutboundEmail
 
 admin.site.register(CustomUser)
+admin.site.register(OutboundEmail)
@@ -0,0 +1,31 @@
+"""
+This module stores the authentication backends of the `authentication` app
+"""
+
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from .models import USER_CACHE_KEY, CustomUser
+
+USER_CACHE_TIMEOUT: int = 60  # seconds, bounds staleness of updates made without save()
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    `ModelBackend` that loads the user of a session from the cache
+
+    Every authenticated request loads its user, the cached copy saves that
+    SELECT. `CustomUser.save()` and `delete()` drop the cached copy, so a
+    password change or deactivation is seen by the next request.
+    """
+
+    def get_user(self, user_id: int) -> CustomUser | None:
+        key: str = USER_CACHE_KEY.format(user_id=user_id)
+        user: CustomUser | None = cache.get(key)
+        if user is None:
+            try:
+                user = CustomUser._default_manager.get(pk=user_id)
+            except CustomUser.DoesNotExist:
+                return None
+            cache.set(key, user, timeout=USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
@@ -6,6 +6,9 @@ from typing import Any
 
 from django import forms
 from django.contrib.auth.forms import PasswordResetForm, SetPasswordForm
+from django.template import loader
+
+from . import outbox
 
 
 class SignupForm(forms.Form):
@@ -35,7 +38,33 @@ class LoginForm(forms.Form):
 
 
 class ForgotPasswordForm(PasswordResetForm):
-    pass
+    def send_mail(
+        self,
+        subject_template_name: str,
+        email_template_name: str,
+        context: dict[str, Any],
+        from_email: str | None,
+        to_email: str,
+        html_email_template_name: str | None = None,
+    ) -> None:
+        """
+        Queues the password reset email in the outbox instead of sending it in the request
+        """
+        subject: str = loader.render_to_string(subject_template_name, context)
+        subject = "".join(
+            subject.splitlines()
+        )  # email subjects can not contain newlines
+        body: str = loader.render_to_string(email_template_name, context)
+        html_body: str = ""
+        if html_email_template_name is not None:
+            html_body = loader.render_to_string(html_email_template_name, context)
+        outbox.enqueue_email(
+            subject=subject,
+            body=body,
+            to_email=to_email,
+            html_body=html_body,
+            from_email=from_email,
+        )
 
 
 class ResetPasswordForm(SetPasswordForm):
@@ -0,0 +1,71 @@
+"""
+Management command that sends the emails waiting in the outbox
+
+Run it once (e.g. from cron) or keep it running with `--interval`. The
+interval is the upper bound on how long a new email waits before it is sent.
+A running worker logs a database error and retries on the next interval:
+the emails it had claimed are sent again once their claim times out.
+"""
+
+import logging
+import time
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import DatabaseError, close_old_connections
+
+from ...outbox import SEND_BATCH_SIZE, purge_sent_emails, send_queued_emails
+from ...utils import LogLevel
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Sends the emails queued in the outbox, retrying the failed ones"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Keep sending every INTERVAL seconds instead of sending once",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=SEND_BATCH_SIZE,
+            help="Largest amount of emails sent over one connection",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        interval: float = options["interval"]
+        batch_size: int = options["batch_size"]
+        while True:
+            # drops a connection the database closed while the worker slept
+            close_old_connections()
+            try:
+                self.drain(batch_size)
+                purge_sent_emails()
+            except DatabaseError as e:
+                if interval <= 0:
+                    raise
+                logger.log(
+                    level=LogLevel.ERROR.value,
+                    msg="Unable to send queued emails, retrying on the next interval",
+                    extra={"error": str(e)},
+                )
+            if interval <= 0:
+                return
+            time.sleep(interval)
+
+    def drain(self, batch_size: int) -> None:
+        """
+        Sends batches of due emails until the outbox has none left
+        :param batch_size: Largest amount of emails sent over one connection
+        """
+        while True:
+            sent, failed = send_queued_emails(batch_size)
+            if sent or failed:
+                self.stdout.write(f"Sent {sent} email(s), {failed} failed")
+            if sent + failed < batch_size:
+                return
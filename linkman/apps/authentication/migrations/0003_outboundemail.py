@@ -0,0 +1,82 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("authentication", "0002_customuser_is_verified"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutboundEmail",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "to_email",
+                    models.EmailField(
+                        help_text="Recipient of the email", max_length=254
+                    ),
+                ),
+                (
+                    "from_email",
+                    models.CharField(help_text="Sender of the email", max_length=254),
+                ),
+                ("subject", models.CharField(max_length=255)),
+                ("body", models.TextField(help_text="Plain text body")),
+                (
+                    "html_body",
+                    models.TextField(
+                        blank=True, help_text="HTML alternative of the body"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("sent", "Sent"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveSmallIntegerField(
+                        default=0, help_text="Amount of failed send attempts"
+                    ),
+                ),
+                (
+                    "next_attempt_at",
+                    models.DateTimeField(
+                        help_text="Earliest time the email is sent (or retried)"
+                    ),
+                ),
+                ("last_error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["status", "next_attempt_at"],
+                        name="outbox_status_due_idx",
+                    ),
+                    models.Index(
+                        fields=["status", "sent_at"], name="outbox_status_sent_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -1,8 +1,13 @@
 from typing import Any, Optional
 
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.db import models
-from django.db.models import CheckConstraint, Q
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import CheckConstraint, F, Q
+from django.db.models.functions import Greatest
+
+USER_CACHE_KEY: str = "auth:user:{user_id}"  # see `backends.CachedModelBackend`
+EMAIL_CONSTRAINT: str = "user_email_uniq"
 
 
 class CustomUserManager(BaseUserManager["CustomUser"]):
@@ -41,16 +46,40 @@ class CustomUserManager(BaseUserManager["CustomUser"]):
             raise ValueError("Superuser must have is_superuser=True.")
         return self.create_user(email, password, **extra_fields)
 
+    def adjust_totals(self, user_id: int, groups: int = 0, links: int = 0) -> None:
+        """
+        Atomically adds to the `total_groups` and `total_links` counters of a user.
+        Loaded user objects keep their old values.
+        :param user_id: ID of the user whose counters to adjust
+        :param groups: Amount of created (positive) or deleted (negative) groups
+        :param links: Amount of created (positive) or deleted (negative) links
+        """
+        if not groups and not links:
+            return
+        # clamped at 0, a drifted counter must not fail the request that deletes
+        self.filter(pk=user_id).update(
+            total_groups=Greatest(F("total_groups") + groups, 0),
+            total_links=Greatest(F("total_links") + links, 0),
+        )
+        transaction.on_commit(
+            lambda: cache.delete(USER_CACHE_KEY.format(user_id=user_id))
+        )
+
 
 class CustomUser(AbstractUser):
     username = None  # type: ignore[assignment]  # Not needed in the application
-    email = models.EmailField(max_length=254, unique=True, null=False, blank=False)
+    email = models.EmailField(
+        max_length=254, null=False, blank=False
+    )  # unique through `EMAIL_CONSTRAINT`
     # password is handled by django's built in session authentication
     total_groups = models.PositiveIntegerField(default=0)
     total_links = models.PositiveIntegerField(default=0)
     is_verified = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(
+        null=True, blank=True
+    )  # set when the account is deleted, its data is purged later
     USERNAME_FIELD = "email"  # NOTE: This is used for authentication
     REQUIRED_FIELDS = []  # Empty since username and email are required by default
     objects = CustomUserManager()  # type: ignore[assignment]
@@ -61,7 +90,73 @@ class CustomUser(AbstractUser):
         # Database constraints
         constraints = [
             CheckConstraint(condition=~Q(email=""), name="email_not_empty"),
+            # named, so the signup can tell a taken email from other violations
+            models.UniqueConstraint(fields=["email"], name=EMAIL_CONSTRAINT),
+        ]
+        indexes = [
+            # finds the deleted accounts to purge
+            models.Index(
+                fields=["deleted_at"],
+                condition=Q(deleted_at__isnull=False),
+                name="user_deleted_idx",
+            ),
         ]
 
     def __str__(self) -> str:
         return f"{self.email}"
+
+    def save(self, *args: Any, **kwargs: Any) -> None:
+        super().save(*args, **kwargs)
+        self.invalidate_cache()
+
+    def delete(self, *args: Any, **kwargs: Any) -> tuple[int, dict[str, int]]:
+        user_id: int | None = self.pk
+        result = super().delete(*args, **kwargs)
+        cache.delete(USER_CACHE_KEY.format(user_id=user_id))
+        return result
+
+    def invalidate_cache(self) -> None:
+        """
+        Drops the cached copy of this user, must be called after updating the row
+        without `save()` (e.g. through `QuerySet.update`)
+        """
+        cache.delete(USER_CACHE_KEY.format(user_id=self.pk))
+
+
+class OutboundEmail(models.Model):
+    """Email waiting in the outbox, sent by the `send_queued_emails` worker"""
+
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        SENT = "sent"
+        FAILED = "failed"  # gave up after `outbox.MAX_ATTEMPTS`
+
+    to_email = models.EmailField(max_length=254, help_text="Recipient of the email")
+    from_email = models.CharField(max_length=254, help_text="Sender of the email")
+    subject = models.CharField(max_length=255)
+    body = models.TextField(help_text="Plain text body")
+    html_body = models.TextField(blank=True, help_text="HTML alternative of the body")
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0, help_text="Amount of failed send attempts"
+    )
+    next_attempt_at = models.DateTimeField(
+        help_text="Earliest time the email is sent (or retried)"
+    )
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # serves the worker's "due emails" query
+            models.Index(
+                fields=["status", "next_attempt_at"], name="outbox_status_due_idx"
+            ),
+            models.Index(fields=["status", "sent_at"], name="outbox_status_sent_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Email '{self.subject}' To: {self.to_email} ({self.status})"
@@ -0,0 +1,176 @@
+"""
+This module stores the email outbox of the `authentication` app
+
+Views render their emails and enqueue them as `OutboundEmail` rows instead
+of calling the email backend, so a request never waits on SendGrid. The
+`send_queued_emails` worker sends the due emails in batches over a single
+backend connection. A failed email, or every email of a batch whose
+connection could not be opened, is retried with an exponential backoff until
+`MAX_ATTEMPTS`, then marked as failed. The delays are capped so every retry
+happens while the verification link of the email is still valid.
+
+Due emails are claimed in a short transaction with
+`select_for_update(skip_locked=True)`, which moves their `next_attempt_at`
+`CLAIM_TIMEOUT` ahead and commits, so several workers can run without
+sending an email twice and no row lock is held while the backend is called.
+The results are recorded after the batch is sent. A worker that dies in
+between leaves its claimed emails to be retried once the claim times out.
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+error_logger = logging.getLogger("error")
+
+MAX_ATTEMPTS: int = 5
+RETRY_BACKOFF: timedelta = timedelta(seconds=30)  # doubled after every failure
+# the retries of `MAX_ATTEMPTS` take 5.5 minutes, verification links expire after 15
+MAX_RETRY_DELAY: timedelta = timedelta(minutes=2)
+CLAIM_TIMEOUT: timedelta = timedelta(minutes=2)  # longest time to send a batch
+SEND_BATCH_SIZE: int = 50
+SENT_RETENTION: timedelta = timedelta(days=7)
+
+
+def enqueue_email(
+    subject: str,
+    body: str,
+    to_email: str,
+    html_body: str = "",
+    from_email: str | None = None,
+) -> OutboundEmail:
+    """
+    Adds an email to the outbox
+    :param subject: Subject of the email
+    :param body: Plain text body of the email
+    :param to_email: Recipient of the email
+    :param html_body: HTML alternative of the body
+    :param from_email: Sender of the email, defaults to `EMAIL_FROM_USER`
+    :return: Queued email
+    """
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        to_email=to_email,
+        html_body=html_body,
+        from_email=from_email or settings.EMAIL_FROM_USER,
+        next_attempt_at=timezone.now(),
+    )
+
+
+def build_message(email: OutboundEmail) -> EmailMultiAlternatives:
+    """
+    Builds the message to hand to the email backend
+    :param email: Queued email
+    :return: Email message
+    """
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email,
+        to=[email.to_email],
+    )
+    if email.html_body:
+        message.attach_alternative(content=email.html_body, mimetype="text/html")
+    return message
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """
+    Gets the delay before the next attempt of an email
+    :param attempts: Amount of failed attempts so far
+    :return: Exponential backoff delay, at most `MAX_RETRY_DELAY`
+    """
+    return min(RETRY_BACKOFF * (1 << (attempts - 1)), MAX_RETRY_DELAY)
+
+
+def claim_due_emails(batch_size: int) -> list[OutboundEmail]:
+    """
+    Claims the due emails for this worker, other workers skip them until the claim times out
+    :param batch_size: Largest amount of emails to claim
+    :return: Claimed emails
+    """
+    with transaction.atomic():
+        now: datetime = timezone.now()
+        emails: list[OutboundEmail] = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboundEmail.Status.PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at")[:batch_size]
+        )
+        OutboundEmail.objects.filter(id__in=[email.id for email in emails]).update(
+            next_attempt_at=now + CLAIM_TIMEOUT
+        )
+    return emails
+
+
+def record_failure(email: OutboundEmail, error: Exception) -> None:
+    """
+    Counts a failed attempt, scheduling the next one or giving up
+    :param email: Email that could not be sent
+    :param error: Error raised by the email backend
+    """
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = OutboundEmail.Status.FAILED
+        error_logger.error(
+            f"Gave up sending email {email.pk} to {email.to_email}: {error}"
+        )
+    else:
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+
+
+def send_queued_emails(batch_size: int = SEND_BATCH_SIZE) -> tuple[int, int]:
+    """
+    Sends one batch of due emails
+    :param batch_size: Largest amount of emails to send
+    :return: Tuple of (sent emails, failed attempts)
+    """
+    emails: list[OutboundEmail] = claim_due_emails(batch_size)
+    if not emails:
+        return 0, 0
+    sent: int = 0
+    failed: int = 0
+    attempted: set[int] = set()
+    try:
+        # one connection for the whole batch, opened outside of any transaction
+        with get_connection() as connection:
+            for email in emails:
+                attempted.add(email.pk)
+                try:
+                    connection.send_messages([build_message(email)])
+                except Exception as e:
+                    failed += 1
+                    record_failure(email, e)
+                else:
+                    sent += 1
+                    email.status = OutboundEmail.Status.SENT
+                    email.sent_at = timezone.now()
+    except Exception as e:
+        # opening the connection failed, every email that was not tried counts an attempt
+        for email in emails:
+            if email.pk not in attempted:
+                failed += 1
+                record_failure(email, e)
+    OutboundEmail.objects.bulk_update(
+        emails, ["status", "attempts", "next_attempt_at", "last_error", "sent_at"]
+    )
+    return sent, failed
+
+
+def purge_sent_emails() -> int:
+    """
+    Deletes the sent emails older than `SENT_RETENTION`
+    :return: Amount of deleted emails
+    """
+    cutoff: datetime = timezone.now() - SENT_RETENTION
+    deleted, _ = OutboundEmail.objects.filter(
+        status=OutboundEmail.Status.SENT, sent_at__lt=cutoff
+    ).delete()
+    return deleted
@@ -47,15 +47,25 @@ function formatTime(datetime) {
  */
 async function getAllGroups() {
     try {
-        const response = await fetch('/api/groups', { method: 'GET' });
-        const data = await response.json();
-        if (!response.ok) {
-            console.log(`Unable to fetch all groups: ${data.detail}`);
-            return;
-        }
-        data.groups.forEach((item) => {
-            ALL_GROUPS.push(item);
-        });
+        // the listing is cursor paginated, keep fetching until the last page
+        let cursor = null;
+        do {
+            const params = new URLSearchParams();
+            if (cursor) {
+                params.set('cursor', cursor);
+            }
+            const response = await fetch(`/api/groups/?${params}`, {
+                method: 'GET',
+                cache: 'no-cache', // revalidate with the stored ETag
+            });
+            const data = await response.json();
+            if (!response.ok) {
+                console.log(`Unable to fetch all groups: ${data.detail}`);
+                return;
+            }
+            ALL_GROUPS.push(...data.groups);
+            cursor = data.next_cursor;
+        } while (cursor);
         populateGroupSelect();
     } catch (error) {
         console.log(`Error occurred fetching all groups: ${error}`);
@@ -1 +1,217 @@
-# Create your tests here.
+import io
+from datetime import timedelta
+from typing import Any
+from unittest import mock
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError
+from django.test import TestCase
+from django.utils import timezone
+
+from . import outbox
+from .backends import CachedModelBackend
+from .models import CustomUser, OutboundEmail
+from .tokens import EXPIRATION_SECONDS
+
+BACKEND: str = "apps.authentication.backends.CachedModelBackend"
+
+
+class StopWorker(Exception):
+    """Raised by a mocked `time.sleep` to end the loop of a worker command"""
+
+
+class OutboxTests(TestCase):
+    """
+    Tests of the email outbox of `outbox.py`
+    """
+
+    def enqueue(self, to_email: str = "user@linkman.com") -> OutboundEmail:
+        """
+        Queues a verification like email
+        :param to_email: Recipient of the email
+        :return: Queued email
+        """
+        return outbox.enqueue_email(
+            "Verify", "Verify your account", to_email, html_body="<p>Verify</p>"
+        )
+
+    def test_due_emails_are_sent(self) -> None:
+        email: OutboundEmail = self.enqueue()
+        self.assertEqual(outbox.send_queued_emails(), (1, 0))
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.Status.SENT)
+        self.assertIsNotNone(email.sent_at)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["user@linkman.com"])
+        self.assertEqual(outbox.send_queued_emails(), (0, 0))
+
+    def test_failed_send_is_retried_then_given_up(self) -> None:
+        email: OutboundEmail = self.enqueue()
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=OSError("refused"),
+        ):
+            for attempt in range(1, outbox.MAX_ATTEMPTS + 1):
+                OutboundEmail.objects.filter(id=email.id).update(
+                    next_attempt_at=timezone.now()
+                )
+                self.assertEqual(outbox.send_queued_emails(), (0, 1))
+                email.refresh_from_db()
+                self.assertEqual(email.attempts, attempt)
+                self.assertEqual(email.last_error, "refused")
+        self.assertEqual(email.status, OutboundEmail.Status.FAILED)
+
+    def test_connection_failure_counts_an_attempt(self) -> None:
+        emails: list[OutboundEmail] = [self.enqueue(), self.enqueue("b@linkman.com")]
+        with mock.patch.object(
+            outbox, "get_connection", side_effect=OSError("no route")
+        ):
+            self.assertEqual(outbox.send_queued_emails(), (0, 2))
+        for email in emails:
+            email.refresh_from_db()
+            self.assertEqual(email.attempts, 1)
+            self.assertGreater(email.next_attempt_at, timezone.now())
+
+    def test_claimed_emails_are_skipped(self) -> None:
+        email: OutboundEmail = self.enqueue()
+        self.assertEqual(outbox.claim_due_emails(10), [email])
+        # a second worker, or this one after a crash, waits for the claim to time out
+        self.assertEqual(outbox.claim_due_emails(10), [])
+        email.refresh_from_db()
+        self.assertGreater(
+            email.next_attempt_at,
+            timezone.now() + outbox.CLAIM_TIMEOUT - timedelta(seconds=5),
+        )
+
+    def test_retries_happen_while_the_link_is_valid(self) -> None:
+        retries: timedelta = sum(
+            (outbox.retry_delay(n) for n in range(1, outbox.MAX_ATTEMPTS)),
+            timedelta(),
+        )
+        self.assertLess(retries, timedelta(seconds=EXPIRATION_SECONDS))
+        self.assertEqual(outbox.retry_delay(1), outbox.RETRY_BACKOFF)
+
+    def test_sent_emails_are_purged(self) -> None:
+        email: OutboundEmail = self.enqueue()
+        outbox.send_queued_emails()
+        OutboundEmail.objects.filter(id=email.id).update(
+            sent_at=timezone.now() - outbox.SENT_RETENTION - timedelta(days=1)
+        )
+        self.assertEqual(outbox.purge_sent_emails(), 1)
+
+    def test_worker_survives_database_errors(self) -> None:
+        command = "apps.authentication.management.commands.send_queued_emails"
+        with (
+            mock.patch(
+                f"{command}.send_queued_emails",
+                side_effect=[DatabaseError("down"), (0, 0)],
+            ) as send,
+            mock.patch(f"{command}.time.sleep", side_effect=[None, StopWorker]),
+        ):
+            with self.assertRaises(StopWorker):
+                call_command("send_queued_emails", interval=1, stdout=io.StringIO())
+        self.assertEqual(send.call_count, 2)
+
+
+class CachedModelBackendTests(TestCase):
+    """
+    Tests of the cached user lookups of `backends.py`
+    """
+
+    user: CustomUser
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = CustomUser.objects.create_user(
+            email="user@linkman.com", password="password"
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.backend = CachedModelBackend()
+
+    def test_user_is_loaded_once(self) -> None:
+        with self.assertNumQueries(1):
+            self.assertEqual(self.backend.get_user(self.user.pk), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.backend.get_user(self.user.pk), self.user)
+
+    def test_missing_user(self) -> None:
+        self.assertIsNone(self.backend.get_user(self.user.pk + 1))
+
+    def test_save_drops_the_cached_user(self) -> None:
+        self.backend.get_user(self.user.pk)
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(self.backend.get_user(self.user.pk))
+
+    def test_delete_drops_the_cached_user(self) -> None:
+        user_id: int = self.user.pk
+        self.backend.get_user(user_id)
+        self.user.delete()
+        self.assertIsNone(self.backend.get_user(user_id))
+
+    def test_adjusted_totals_drop_the_cached_user(self) -> None:
+        self.backend.get_user(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomUser.objects.adjust_totals(self.user.pk, links=2)
+        user: CustomUser | None = self.backend.get_user(self.user.pk)
+        assert user is not None
+        self.assertEqual(user.total_links, 2)
+
+    def test_session_resolves_the_cached_user(self) -> None:
+        self.client.force_login(self.user, backend=BACKEND)
+        self.client.get("/api/users/me/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/users/me/")
+        self.assertEqual(response.json()["user"]["email"], self.user.email)
+
+
+class SignupTests(TestCase):
+    """
+    Tests of the signup page of `views.py`
+    """
+
+    def setUp(self) -> None:
+        cache.clear()  # the signup rate limit
+
+    def signup(self, email: str) -> Any:
+        """
+        Submits the signup form
+        :param email: Email to sign up with
+        :return: Response of the test client
+        """
+        password: str = "Str0ng!password"
+        return self.client.post(
+            "/signup/",
+            {"email": email, "password_one": password, "password_two": password},
+        )
+
+    def test_signup_creates_the_account(self) -> None:
+        response = self.signup("new@linkman.com")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["email_sent"])
+        user: CustomUser = CustomUser.objects.get(email="new@linkman.com")
+        self.assertEqual((user.total_groups, user.is_verified), (1, False))
+        self.assertTrue(OutboundEmail.objects.filter(to_email=user.email).exists())
+
+    def test_existing_email_is_rejected(self) -> None:
+        CustomUser.objects.create_user(email="taken@linkman.com", password="password")
+        response = self.signup("taken@linkman.com")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.context["email_exists"], "A user already exists with that email"
+        )
+        # the request still queries after the violation
+        self.assertEqual(
+            CustomUser.objects.filter(email="taken@linkman.com").count(), 1
+        )
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    def test_other_integrity_errors_are_raised(self) -> None:
+        error = IntegrityError("CHECK constraint failed: email_not_empty")
+        with mock.patch.object(CustomUser, "save", side_effect=error):
+            with self.assertRaises(IntegrityError):
+                self.signup("new@linkman.com")
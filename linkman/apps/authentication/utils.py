@@ -5,13 +5,13 @@ This file stores utility functions for the `authentication` app
 import logging
 from enum import Enum
 
-from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
+from django.db import DatabaseError
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import render
 from django.template.loader import render_to_string
 
 from ..main.models import Group
+from . import outbox
 from .forms import LoginForm, SignupForm
 from .models import CustomUser
 
@@ -77,15 +77,6 @@ def validate_login_form(
         )
 
 
-def user_exists(email: str) -> bool:
-    """
-    Checks if a user exists with the provided email
-    :param email: Email to check with
-    :return: True if user exists, else False
-    """
-    return CustomUser.objects.filter(email=email).exists()
-
-
 def create_user(email: str, password: str) -> CustomUser:
     """
     Creates a new user and returns the created user
@@ -95,7 +86,8 @@ def create_user(email: str, password: str) -> CustomUser:
     """
     user = CustomUser(email=email)
     user.set_password(password)
-    user.full_clean()
+    # the unique email and the constraints are enforced by the INSERT instead
+    user.full_clean(validate_unique=False, validate_constraints=False)
     return user
 
 
@@ -112,7 +104,7 @@ def send_account_verification_email(
     token: str, user_email: str, request: HttpRequest
 ) -> str | None:
     """
-    Sends a verification email to the provided user email
+    Queues a verification email to the provided user email, sent by the outbox worker
 
     :param token: Token to embed in the email
     :param user_email: Email to send to
@@ -132,16 +124,14 @@ def send_account_verification_email(
             "minutes": "15",
         },
     )
-    msg = EmailMultiAlternatives(
-        subject=subject,
-        body=text_content,
-        from_email=settings.EMAIL_FROM_USER,
-        to=[user_email],
-    )
-    msg.attach_alternative(content=html_message, mimetype="text/html")
     try:
-        msg.send()
+        outbox.enqueue_email(
+            subject=subject,
+            body=text_content,
+            to_email=user_email,
+            html_body=html_message,
+        )
         return None
-    except Exception as e:
-        error_logger.error(f"Failed to send verify account email: {str(e)}")
+    except DatabaseError as e:
+        error_logger.error(f"Failed to queue verify account email: {str(e)}")
         return "Failed to send verification email. Please try again."
@@ -2,12 +2,13 @@ import logging
 
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.decorators import login_required
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.http import HttpRequest, HttpResponseRedirect
 from django.http.response import HttpResponse
 from django.shortcuts import redirect, render
 from django_ratelimit.decorators import ratelimit
 
+from ..api import schemas
 from ..authentication import utils as auth_utils
 from ..authentication.tokens import (
     generate_verification_token,
@@ -17,7 +18,7 @@ from ..authentication.tokens import (
 from ..authentication.utils import LogLevel
 from ..main.models import Group
 from .forms import LoginForm, SignupForm
-from .models import CustomUser
+from .models import EMAIL_CONSTRAINT, CustomUser
 
 logger = logging.getLogger(__name__)
 error_logger = logging.getLogger("error")
@@ -44,48 +45,41 @@ def signup_page(request: HttpRequest) -> HttpResponse:
             return validation_result
         # form is clean by this point
         cleaned_form = validation_result
-        # ensure that a user does not exist with the same email
-        if auth_utils.user_exists(cleaned_form.cleaned_data["email"]):
-            return render(
-                request,
-                template_name="authentication/signup.html",
-                context={
-                    "form": cleaned_form,
-                    "email_exists": "A user already exists with that email",
-                    "email_sent": False,
-                    "email_sent_error": None,
-                    "user_email": None,
-                },
-                status=400,
-            )
-        # User does not exist and form data is valid, now we can create the new user
+        # form data is valid, now we can create the new user
         new_user: CustomUser = auth_utils.create_user(
             cleaned_form.cleaned_data["email"],
             cleaned_form.cleaned_data["password_one"],
         )
-        # handle the edge cass if a parallel request makes a user with the same email
+        # the unique constraint on the email rejects an existing user, including one
+        # created by a parallel request, without querying for it beforehand
         try:
-            new_user.save()
+            # a savepoint, so the violation leaves the transaction of the request usable
+            with transaction.atomic():
+                new_user.save()
             logger.log(level=LogLevel.INFO.value, msg=f"Created new user {new_user}")
-        except IntegrityError:
-            error_logger.log(
-                level=LogLevel.ERROR.value,
-                msg=f"Integrity Error occurred saving new user with email {new_user.email}",
+        except IntegrityError as e:
+            if not schemas.violates_constraint(e, CustomUser, EMAIL_CONSTRAINT):
+                raise
+            logger.log(
+                level=LogLevel.WARNING.value,
+                msg=f"Signup with an existing email {new_user.email}",
             )
             return render(
                 request,
-                "authentication/signup.html",
-                {
+                template_name="authentication/signup.html",
+                context={
                     "form": cleaned_form,
                     "email_exists": "A user already exists with that email",
                     "email_sent": False,
                     "email_sent_error": None,
                     "user_email": None,
                 },
+                status=400,
             )
         # Create and link the default group to the user
         default_group: Group = auth_utils.create_default_group(new_user)
         default_group.save()
+        CustomUser.objects.adjust_totals(new_user.pk, groups=1)
         logger.log(level=LogLevel.INFO.value, msg=f"Created new group {default_group}")
         # Email the user
         token: str = generate_verification_token(new_user)
@@ -338,8 +332,9 @@ def settings_page(request: HttpRequest) -> HttpResponse:
     assert isinstance(request.user, CustomUser)
     user: CustomUser = request.user
     created_at: str = user.created_at.strftime("%B %d, %Y")
-    total_groups: int = user.user_groups.count()  # pyright: ignore[reportAttributeAccessIssue]
-    total_links: int = user.links.count()  # pyright: ignore[reportAttributeAccessIssue]
+    # maintained on every create and delete, see `CustomUserManager.adjust_totals`
+    total_groups: int = user.total_groups
+    total_links: int = user.total_links
     return render(
         request,
         "authentication/settings.html",
@@ -0,0 +1,26 @@
+import apps.main.models
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0004_group_last_accessed_at"),
+    ]
+
+    # both are skipped on other databases, they use the python search
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name="link",
+            index=apps.main.models.TrigramIndex(
+                fields=["name"], name="main_link_name_trgm", opclasses=["gin_trgm_ops"]
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="link",
+            index=apps.main.models.TrigramIndex(
+                fields=["url"], name="main_link_url_trgm", opclasses=["gin_trgm_ops"]
+            ),
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0005_link_trigram_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tombstone",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("group", "Group"), ("link", "Link")],
+                        help_text="Type of the deleted object",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "object_id",
+                    models.BigIntegerField(help_text="ID of the deleted object"),
+                ),
+                (
+                    "deleted_at",
+                    models.DateTimeField(
+                        auto_now_add=True,
+                        help_text="Date and time when the object was deleted",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="group",
+            name="last_accessed_at",
+            field=models.DateTimeField(
+                blank=True,
+                db_index=True,
+                help_text="Last time a link related to this group was clicked",
+                null=True,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="group",
+            index=models.Index(
+                fields=["user", "updated_at"], name="group_user_updated_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="link",
+            index=models.Index(
+                fields=["user", "updated_at"], name="link_user_updated_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="tombstone",
+            name="user",
+            field=models.ForeignKey(
+                help_text="The User who the deleted object belonged to",
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="tombstones",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tombstone",
+            index=models.Index(
+                fields=["user", "deleted_at"], name="tombstone_user_deleted_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tombstone",
+            index=models.Index(fields=["deleted_at"], name="tombstone_deleted_idx"),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Counts the groups and links of every user once, `adjust_totals` keeps them from here on
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_user_totals(apps, schema_editor) -> None:  # type: ignore[no-untyped-def]
+    CustomUser = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    Group = apps.get_model("main", "Group")
+    Link = apps.get_model("main", "Link")
+
+    def count_rows(model):  # type: ignore[no-untyped-def]
+        rows = (
+            model.objects.filter(user=OuterRef("pk"))
+            .order_by()
+            .values("user")
+            .annotate(total=Count("pk"))
+            .values("total")
+        )
+        return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+    CustomUser.objects.update(
+        total_groups=count_rows(Group), total_links=count_rows(Link)
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0006_tombstone_and_updated_at_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_user_totals, migrations.RunPython.noop),
+    ]
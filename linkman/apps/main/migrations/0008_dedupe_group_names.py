@@ -0,0 +1,49 @@
+# Renames the groups sharing a name with an older group of the same user, so
+# `group_user_name_uniq` (0009) can be created. Nothing is merged or deleted.
+
+from django.db import migrations
+from django.db.models import Count
+
+GROUP_NAME_MAX_LENGTH: int = 50
+
+
+def rename_duplicate_groups(apps, schema_editor) -> None:  # type: ignore[no-untyped-def]
+    Group = apps.get_model("main", "Group")
+    duplicates = (
+        Group.objects.values("user_id", "name")
+        .annotate(total=Count("id"))
+        .filter(total__gt=1)
+    )
+    for duplicate in duplicates:
+        taken: set[str] = set(
+            Group.objects.filter(user_id=duplicate["user_id"]).values_list(
+                "name", flat=True
+            )
+        )
+        # the oldest group keeps the name
+        groups = Group.objects.filter(
+            user_id=duplicate["user_id"], name=duplicate["name"]
+        ).order_by("id")[1:]
+        number: int = 2
+        for group in groups:
+            while True:
+                suffix: str = f" ({number})"
+                name: str = (
+                    duplicate["name"][: GROUP_NAME_MAX_LENGTH - len(suffix)] + suffix
+                )
+                number += 1
+                if name not in taken:
+                    break
+            taken.add(name)
+            group.name = name
+            group.save(update_fields=["name", "updated_at"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0007_backfill_user_totals"),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicate_groups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0008_dedupe_group_names"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="group",
+            index=models.Index(
+                fields=["user", "-created_at", "-id"], name="group_user_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="link",
+            index=models.Index(
+                fields=["user", "-created_at", "-id"], name="link_user_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="link",
+            index=models.Index(
+                fields=["user", "-click_count", "-id"], name="link_user_clicks_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="link",
+            index=models.Index(
+                fields=["group", "-created_at", "-id"], name="link_group_created_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="group",
+            constraint=models.UniqueConstraint(
+                fields=("user", "name"), name="group_user_name_uniq"
+            ),
+        ),
+        # dropped once the composite indexes exist, they start with these columns
+        migrations.AlterField(
+            model_name="group",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                help_text="The User who this group belongs to",
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="user_groups",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="link",
+            name="group",
+            field=models.ForeignKey(
+                db_index=False,
+                help_text="The Group who this link belongs to",
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="group_links",
+                to="main.group",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="link",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                help_text="The User who this link belongs to",
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="links",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+    ]
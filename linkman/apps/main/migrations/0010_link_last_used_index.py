@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0009_composite_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="link",
+            name="link_user_updated_idx",
+        ),
+        migrations.AddIndex(
+            model_name="link",
+            index=models.Index(
+                fields=["user", "-updated_at", "-id"], name="link_user_used_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Stores the hash of the normalized URL of every link, see `normalization.py`
+
+from apps.main.normalization import hash_url
+from django.conf import settings
+from django.db import migrations, models
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_url_hashes(apps, schema_editor) -> None:  # type: ignore[no-untyped-def]
+    Link = apps.get_model("main", "Link")
+    last_id = 0
+    while True:
+        links = list(
+            Link.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .only("id", "url")[:BACKFILL_BATCH_SIZE]
+        )
+        if not links:
+            break
+        for link in links:
+            # the hash `Link.save()` stores, a later change of the normalization
+            # ships its own migration rehashing the links
+            link.url_hash = hash_url(link.url)
+        Link.objects.bulk_update(links, ["url_hash"])
+        last_id = links[-1].id
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0010_link_last_used_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="link",
+            name="url_hash",
+            field=models.CharField(
+                default="",
+                editable=False,
+                help_text="Hash of the normalized URL, see `normalization.py`",
+                max_length=32,
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_url_hashes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="link",
+            index=models.Index(fields=["user", "url_hash"], name="link_user_url_idx"),
+        ),
+    ]
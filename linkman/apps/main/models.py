@@ -1,6 +1,75 @@
+from typing import Any
+
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.db.backends.ddl_references import Statement
 
 from ..authentication.models import CustomUser
+from ..main.normalization import URL_HASH_LENGTH, hash_url
+
+
+class TrigramIndex(GinIndex):
+    """
+    `gin_trgm_ops` index serving the `pg_trgm` lookups of `api/search.py`
+
+    `pg_trgm` only exists on PostgreSQL, other databases search in python and
+    skip the index, including when SQLite rebuilds the table.
+    """
+
+    def create_sql(
+        self,
+        model: type[models.Model],
+        schema_editor: BaseDatabaseSchemaEditor,
+        using: str = "",
+        **kwargs: Any,
+    ) -> Statement:
+        if schema_editor.connection.vendor != "postgresql":
+            return Statement("")
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
+
+    def remove_sql(
+        self,
+        model: type[models.Model],
+        schema_editor: BaseDatabaseSchemaEditor,
+        **kwargs: Any,
+    ) -> str:
+        if schema_editor.connection.vendor != "postgresql":
+            return ""
+        return super().remove_sql(model, schema_editor, **kwargs)
+
+
+class GroupManager(models.Manager["Group"]):
+    """Default manager of `Group`, hides the groups waiting to be purged"""
+
+    def get_queryset(self) -> models.QuerySet["Group"]:
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+    def for_user(self, user: CustomUser) -> models.QuerySet["Group"]:
+        """
+        Scopes the groups to the ones owned by the provided user
+        :param user: User object owning the groups
+        :return: Queryset of the groups of the user
+        """
+        return self.get_queryset().filter(user=user)
+
+
+class LinkManager(models.Manager["Link"]):
+    """Default manager of `Link`, hides the links of the groups waiting to be purged"""
+
+    def get_queryset(self) -> models.QuerySet["Link"]:
+        # the deleted groups are few, they are found through `group_deleted_idx`
+        deleted_groups = Group.all_objects.filter(deleted_at__isnull=False)
+        return super().get_queryset().exclude(group_id__in=deleted_groups.values("id"))
+
+    def for_user(self, user: CustomUser) -> models.QuerySet["Link"]:
+        """
+        Scopes the links to the ones owned by the provided user, with their group
+        :param user: User object owning the links
+        :return: Queryset of the links of the user, joined to their group
+        """
+        # ignored by `values()`, so listings built on it do not pay for the join
+        return self.get_queryset().filter(user=user).select_related("group")
 
 
 class Group(models.Model):
@@ -8,6 +77,7 @@ class Group(models.Model):
         CustomUser,
         on_delete=models.CASCADE,
         null=False,
+        db_index=False,  # leading column of the composite indexes below
         help_text="The User who this group belongs to",
         related_name="user_groups",
     )  # One group can belong to Many users
@@ -30,6 +100,38 @@ class Group(models.Model):
     updated_at = models.DateTimeField(
         auto_now=True, help_text="Date and time when this group was last updated"
     )
+    deleted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Date and time when this group was deleted, it is purged later",
+    )
+    objects = GroupManager()
+    all_objects = models.Manager()  # includes the groups waiting to be purged
+
+    class Meta:
+        constraints = [
+            # also serves the name uniqueness check of group creation, the name
+            # of a deleted group can be reused before the group is purged
+            models.UniqueConstraint(
+                fields=["user", "name"],
+                condition=models.Q(deleted_at__isnull=True),
+                name="group_user_name_uniq",
+            ),
+        ]
+        indexes = [
+            # serves the `/api/sync` "changed since" query
+            models.Index(fields=["user", "updated_at"], name="group_user_updated_idx"),
+            # serves the `/api/groups` listing, in the order of its cursor
+            models.Index(
+                fields=["user", "-created_at", "-id"], name="group_user_created_idx"
+            ),
+            # serves the exclusion of deleted groups and finding them to purge
+            models.Index(
+                fields=["deleted_at"],
+                condition=models.Q(deleted_at__isnull=False),
+                name="group_deleted_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"Group: {self.name}"
@@ -40,6 +142,7 @@ class Link(models.Model):
         CustomUser,
         on_delete=models.CASCADE,
         null=False,
+        db_index=False,  # leading column of the composite indexes below
         help_text="The User who this link belongs to",
         related_name="links",
     )
@@ -47,6 +150,7 @@ class Link(models.Model):
         Group,
         on_delete=models.CASCADE,
         null=False,
+        db_index=False,  # leading column of `link_group_created_idx`
         help_text="The Group who this link belongs to",
         related_name="group_links",
     )
@@ -56,6 +160,11 @@ class Link(models.Model):
     url = models.CharField(
         max_length=2000, null=False, blank=False, help_text="URL of the link"
     )
+    url_hash = models.CharField(
+        max_length=URL_HASH_LENGTH,
+        editable=False,
+        help_text="Hash of the normalized URL, see `normalization.py`",
+    )
     click_count = models.PositiveIntegerField(
         default=0, help_text="Click count of the link"
     )
@@ -65,6 +174,78 @@ class Link(models.Model):
     updated_at = models.DateTimeField(
         auto_now=True, help_text="Date and time when this link was last updated"
     )
+    objects = LinkManager()
+    all_objects = models.Manager()  # includes the links waiting to be purged
+
+    class Meta:
+        indexes = [
+            # serve the `/api/links` listing sorts, in the order of their cursor
+            models.Index(
+                fields=["user", "-created_at", "-id"], name="link_user_created_idx"
+            ),
+            models.Index(
+                fields=["user", "-click_count", "-id"], name="link_user_clicks_idx"
+            ),
+            # also serves the `/api/sync` "changed since" query
+            models.Index(
+                fields=["user", "-updated_at", "-id"], name="link_user_used_idx"
+            ),
+            # serves the links of one group and the cascade of a group deletion
+            models.Index(
+                fields=["group", "-created_at", "-id"], name="link_group_created_idx"
+            ),
+            # serves the duplicate checks of a URL
+            models.Index(fields=["user", "url_hash"], name="link_user_url_idx"),
+            # serve the fuzzy matching of `/api/links/search`
+            TrigramIndex(
+                fields=["name"], name="main_link_name_trgm", opclasses=["gin_trgm_ops"]
+            ),
+            TrigramIndex(
+                fields=["url"], name="main_link_url_trgm", opclasses=["gin_trgm_ops"]
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"Link: {self.name} Belonging to Group: {self.group.name} Of User: {self.user.email}"
+
+    def save(self, *args: Any, **kwargs: Any) -> None:
+        # `bulk_create()` and `bulk_update()` skip this, their callers set the hash
+        self.url_hash = hash_url(self.url)
+        update_fields: Any = kwargs.get("update_fields")
+        if update_fields is not None and "url" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "url_hash"}
+        super().save(*args, **kwargs)
+
+
+class Tombstone(models.Model):
+    """Record of a deleted group or link, used to sync deletions to the dashboard"""
+
+    class Kind(models.TextChoices):
+        GROUP = "group"
+        LINK = "link"
+
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        null=False,
+        help_text="The User who the deleted object belonged to",
+        related_name="tombstones",
+    )
+    kind = models.CharField(
+        max_length=10, choices=Kind.choices, help_text="Type of the deleted object"
+    )
+    object_id = models.BigIntegerField(help_text="ID of the deleted object")
+    deleted_at = models.DateTimeField(
+        auto_now_add=True, help_text="Date and time when the object was deleted"
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "deleted_at"], name="tombstone_user_deleted_idx"
+            ),
+            models.Index(fields=["deleted_at"], name="tombstone_deleted_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Tombstone: {self.kind} {self.object_id} Of User: {self.user_id}"
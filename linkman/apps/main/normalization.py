@@ -0,0 +1,90 @@
+"""
+This module stores the URL normalization of the `main` application
+
+Two URLs a user would call "the same link" normalize to the same string:
+the scheme and host are lowercased, default ports, trailing slashes and
+tracking parameters are removed and the remaining query parameters are
+sorted. A URL without a scheme is read as `http`.
+
+`Link.url_hash` stores the hash of the normalized URL, so finding the links
+of a user with the same URL is one probe of the `(user, url_hash)` index
+instead of comparing every stored URL. Changing the normalization changes
+these hashes: the change ships with a data migration that rehashes every link,
+so the stored hashes always match the ones this module computes.
+"""
+
+import hashlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+URL_HASH_LENGTH: int = 32  # hex characters of a 16 byte digest
+DEFAULT_PORTS: dict[str, int] = {"http": 80, "https": 443}
+TRACKING_PARAMS: frozenset[str] = frozenset(
+    ("fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid")
+)
+TRACKING_PREFIXES: tuple[str, ...] = ("utm_",)
+
+
+def is_tracking_param(name: str) -> bool:
+    """
+    Checks if a query parameter only tracks where a click came from
+    :param name: Name of the query parameter
+    :return: True if the parameter does not change what the URL points to
+    """
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def absolute_url(url: str) -> str:
+    """
+    Gives a URL without a scheme the `http` scheme
+    :param url: URL as entered by the user
+    :return: Stripped URL with a scheme
+    """
+    url = url.strip()
+    return url if "://" in url else f"http://{url}"
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalizes a URL into its canonical form
+    :param url: URL as entered by the user
+    :return: Canonical URL, the stripped URL itself if it can not be parsed
+    """
+    url = url.strip()
+    raw: str = absolute_url(url)
+    try:
+        parts = urlsplit(raw)
+        port: int | None = parts.port
+    except ValueError:  # e.g. an invalid port or IPv6 address
+        return url
+    scheme: str = parts.scheme.lower()
+    host: str = (parts.hostname or "").lower()
+    if ":" in host:
+        host = f"[{host}]"  # IPv6 address
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    if parts.username is not None:
+        credentials: str = parts.username
+        if parts.password is not None:
+            credentials = f"{credentials}:{parts.password}"
+        host = f"{credentials}@{host}"
+    path: str = parts.path.rstrip("/") or "/"
+    query: str = urlencode(
+        sorted(
+            (name, value)
+            for name, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not is_tracking_param(name)
+        )
+    )
+    return urlunsplit((scheme, host, path, query, parts.fragment))
+
+
+def hash_url(url: str) -> str:
+    """
+    Hashes the normalized form of a URL
+    :param url: URL as entered by the user
+    :return: Fixed width hex digest, see `URL_HASH_LENGTH`
+    """
+    return hashlib.blake2b(
+        normalize_url(url).encode(), digest_size=URL_HASH_LENGTH // 2
+    ).hexdigest()
@@ -0,0 +1,68 @@
+"""
+This module stores the per-user dashboard snapshot of the `main` application
+
+The snapshot holds everything the dashboard needs for its first paint: the
+groups, the first page of links of every sort and the counters of the user.
+It is embedded into `main/dashboard.html` with `json_script`, so the page does
+not have to call the api before it can show anything.
+
+Snapshots are stored in the `default` cache under the data version of the
+user (see `apps/api/cache.py`). A create/update/delete bumps that version, so
+the next dashboard load rebuilds the snapshot with a few index-backed queries
+(see `pagination.py`); until then, loading the dashboard queries nothing.
+"""
+
+from typing import Any
+
+from django.core.cache import cache as django_cache
+
+from ..api import cache, metrics, pagination, sync
+from ..authentication.models import CustomUser
+from ..main.models import Group, Link
+
+SNAPSHOT_KEY: str = "main:user:{user_id}:v{version}:dashboard"
+SNAPSHOT_PAGE_SIZE: int = 50  # links of every sort, the client pages past them
+
+
+def build_snapshot(user: CustomUser) -> dict[str, Any]:
+    """
+    Builds the dashboard snapshot of the provided user
+    :param user: User to build the snapshot of
+    :return: Dictionary of the sync token, groups, first link pages and counters
+    """
+    token: str = sync.new_token()  # taken before querying so no change falls in between
+    groups, groups_cursor = pagination.paginate(
+        Group.objects.for_user(user), {}, pagination.GROUP_FIELDS
+    )
+    links: dict[str, dict[str, Any]] = {}
+    for sort in pagination.LINK_SORTS:
+        rows, next_cursor = pagination.paginate(
+            Link.objects.for_user(user),
+            {"sort": sort, "limit": str(SNAPSHOT_PAGE_SIZE)},
+            pagination.LINK_FIELDS,
+            pagination.LINK_SORTS,
+        )
+        links[sort] = {"links": rows, "next_cursor": next_cursor}
+    return {
+        "sync_token": token,
+        "groups": {"groups": groups, "next_cursor": groups_cursor},
+        "links": links,
+        "counts": {"groups": user.total_groups, "links": user.total_links},
+    }
+
+
+def get_snapshot(user: CustomUser) -> dict[str, Any]:
+    """
+    Gets the dashboard snapshot of the provided user, building and caching it on a miss
+    :param user: User to get the snapshot of
+    :return: Dashboard snapshot, see `build_snapshot`
+    """
+    key: str = SNAPSHOT_KEY.format(
+        user_id=user.pk, version=cache.get_data_version(user.pk)
+    )
+    snapshot: dict[str, Any] | None = django_cache.get(key)
+    metrics.record_cache(hit=snapshot is not None)
+    if snapshot is None:
+        snapshot = build_snapshot(user)
+        django_cache.set(key, snapshot, timeout=cache.LISTING_TIMEOUT)
+    return snapshot
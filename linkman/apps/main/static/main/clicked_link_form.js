@@ -9,29 +9,29 @@ import * as utils from './utils.js';
 // ============================================================================
 
 /**
- * Updates the `click_count` and related stats of a provided link
- * @param link Link to update
+ * Records a click of the provided link with a `sendBeacon` ping to `/r/:id`
+ *
+ * The ping is sent even if the page is left, so the caller can open the link right away.
+ * The click stats are applied to the local link without waiting for the server
+ * @param link Link that was clicked
  * @returns link Updated link
  */
-export async function updateLinkStats(link) {
-    const csrfToken = utils.getCSRFToken();
-    const url = `/api/links/${link.id}/`;
-    const groupID = link.group || link.group_id;
-    const payload = { group_id: groupID, for_clicked: true };
-    // alert the server of the link being clicked
-    try {
-        const response = await fetch(url, {
-            method: 'PUT',
-            headers: {
-                'Content-Type': 'application/json',
-                'X-CSRFToken': csrfToken,
-            },
-            body: JSON.stringify(payload),
-        });
-        const data = await response.json();
-        utils.replaceLink(data.link.id, data.link);
-        return utils.getLink(data.link.id);
-    } catch (error) {
-        console.log(`Error updating link stats: ${error.message}`);
+export function recordLinkClick(link) {
+    const url = `/r/${link.id}`;
+    const body = new FormData();
+    body.append('csrfmiddlewaretoken', utils.getCSRFToken());
+    if (!navigator.sendBeacon(url, body)) {
+        // the beacon queue is full, fall back to a request that survives navigation
+        fetch(url, { method: 'POST', body: body, keepalive: true }).catch(
+            (error) => console.log(`Error recording link click: ${error}`),
+        );
     }
+    const current = utils.getLink(link.id) || link;
+    const clickedLink = {
+        ...current,
+        click_count: (current.click_count || 0) + 1,
+        updated_at: new Date().toISOString(),
+    };
+    utils.replaceLink(link.id, clickedLink);
+    return clickedLink;
 }
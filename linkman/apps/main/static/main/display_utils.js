@@ -10,89 +10,71 @@ import * as clicked_link_form from './clicked_link_form.js';
 // CONSTANTS
 const LINKS_CONTAINER = document.getElementById('links-container');
 const NO_RESULTS_CONTAINER = document.getElementById('no-results');
-export let CURRENT_FILTERED_LINKS = []; // links that are filtered when group filter is on
-let CURRENT_DISPLAYED_COUNT = 0; // tracks the amount of currently displayed links
+// state of the displayed listing, its pages are fetched from `/api/links/` as the user scrolls
+let CURRENT_SORT = 'created';
+let CURRENT_GROUP_ID = null;
+let NEXT_CURSOR = null;
+let HAS_MORE_LINKS = false; // more pages can be fetched after `NEXT_CURSOR`
+let PENDING_LINK_IDS = []; // links of the snapshot page that are not displayed yet
+let LISTING_VERSION = 0; // discards the pages of a listing that was replaced while loading
 
 /**
- * Displays all links in the `utils.LINKS` array by recently created
+ * Replaces the displayed links with the first page of a listing
+ * @param sort Sort of the listing, `created`, `clicks` or `last_used`
+ * @param groupID Optional ID of the group to list the links of
  */
-export function displayRecentlyCreated() {
+async function displayListing(sort, groupID = null) {
     hideNoResults();
     LINKS_CONTAINER.innerHTML = '';
-    // sort by updated_at field
-    utils.LINKS.sort((a, b) => new Date(b.created_at) - new Date(a.created_at));
+    CURRENT_SORT = sort;
+    CURRENT_GROUP_ID = groupID;
+    // the first page of a sort may be part of the dashboard snapshot
+    const snapshotPage = groupID ? null : utils.getSnapshotPage(sort);
+    PENDING_LINK_IDS = snapshotPage
+        ? snapshotPage.links.map((link) => link.id)
+        : [];
+    NEXT_CURSOR = snapshotPage ? snapshotPage.next_cursor : null;
+    HAS_MORE_LINKS = snapshotPage ? NEXT_CURSOR !== null : true;
+    LISTING_VERSION++;
+    await loadMoreLinks();
     // handle empty links possibility
-    if (handleEmptyLinksArrayDisplay()) {
-        return;
-    }
-    CURRENT_FILTERED_LINKS = [];
-    CURRENT_DISPLAYED_COUNT = 0;
-    loadMoreLinks(); // load more links as necessary
-    // set current state
+    handleEmptyLinksDisplay();
+}
+
+/**
+ * Displays the links of the user by recently created
+ */
+export async function displayRecentlyCreated() {
     utils.setCurrentDisplay(utils.CURRENT_DISPLAY.RECENTLY_CREATED);
+    await displayListing('created');
 }
 
 /**
- * Displays all links in the `utils.LINKS` array by last used
+ * Displays the links of the user by last used
  */
-export function displayLastUsed() {
-    hideNoResults();
-    LINKS_CONTAINER.innerHTML = '';
-    // sort by last_used field
-    utils.LINKS.sort((a, b) => new Date(b.updated_at) - new Date(a.updated_at));
-    // handle empty links possibility
-    if (handleEmptyLinksArrayDisplay()) {
-        return;
-    }
-    CURRENT_FILTERED_LINKS = [];
-    CURRENT_DISPLAYED_COUNT = 0;
-    loadMoreLinks(); // load more links as necessary
-    // set current state
+export async function displayLastUsed() {
     utils.setCurrentDisplay(utils.CURRENT_DISPLAY.LAST_USED);
+    await displayListing('last_used');
 }
 
-export function displayMostUsed() {
-    hideNoResults();
-    LINKS_CONTAINER.innerHTML = '';
-    // sort by click_count field
-    utils.LINKS.sort((a, b) => b.click_count - a.click_count);
-    // handle empty links possibility
-    if (handleEmptyLinksArrayDisplay()) {
-        return;
-    }
-    CURRENT_FILTERED_LINKS = [];
-    CURRENT_DISPLAYED_COUNT = 0;
-    loadMoreLinks(); // load more links as necessary
-    // set current state
+/**
+ * Displays the links of the user by click count
+ */
+export async function displayMostUsed() {
     utils.setCurrentDisplay(utils.CURRENT_DISPLAY.MOST_USED);
+    await displayListing('clicks');
 }
 
 /**
  * Displays all links that match to the provided group
  * @param groupID ID of the group to filter by
  */
-export function displayByGroup(groupID) {
-    LINKS_CONTAINER.innerHTML = '';
-    hideNoResults();
+export async function displayByGroup(groupID) {
     // get the current group object
     const group = utils.getGroup(groupID);
-    // only display current group
-    CURRENT_FILTERED_LINKS = utils.LINKS.filter(
-        (link) => link.group_id === group.id || link.group === group.id,
-    );
-    // handle empty links display
-    if (CURRENT_FILTERED_LINKS.length <= 0) {
-        utils.setCurrentDisplay(utils.CURRENT_DISPLAY.GROUP);
-        utils.setCurrentGroup(group);
-        showNoResults();
-        return;
-    }
-    // showcase group links
-    CURRENT_DISPLAYED_COUNT = 0;
-    loadMoreLinks();
-    // update display
     utils.setCurrentDisplay(utils.CURRENT_DISPLAY.GROUP);
     utils.setCurrentGroup(group);
+    await displayListing('created', group.id);
 }
 
 /**
@@ -135,9 +117,10 @@ export function createLinkCard(link) {
     deleteBtn.addEventListener('click', async function (e) {
         e.stopPropagation();
         await delete_link_form.deleteLinkAPI(link, card);
-        if (utils.getLinksCount() <= 0) {
-            showNoResults(); // there are no more links to display
+        if (!LINKS_CONTAINER.querySelector('.link-card')) {
+            await loadMoreLinks(); // the deleted card was the last one loaded
         }
+        handleEmptyLinksDisplay();
     });
 
     // EDIT LINK FUNCTIONALITY
@@ -148,12 +131,10 @@ export function createLinkCard(link) {
     });
 
     // CARD UPDATE FUNCTIONALITY
-    card.addEventListener('click', async function (e) {
+    card.addEventListener('click', function (e) {
         e.stopPropagation();
-        const updated_link_object =
-            await clicked_link_form.updateLinkStats(link);
-        updateLinkCard(updated_link_object);
         window.open(link.url, '_blank'); // redirect the user to the specified links url
+        updateLinkCard(clicked_link_form.recordLinkClick(link));
     });
 
     // ENTER KEY TO CLICK
@@ -197,6 +178,7 @@ export function updateLinkCard(link) {
  * Reloads the current links display
  */
 export function reloadLinksDisplay() {
+    utils.clearSnapshotPages(); // the links may have changed since the snapshot
     const currentDisplayValue = utils.getCurrentDisplay();
     switch (currentDisplayValue) {
         case utils.CURRENT_DISPLAY.RECENTLY_CREATED: {
@@ -243,11 +225,10 @@ export function hideNoResults() {
 
 /**
  * Handles displaying the page when there are no links
- * @returns {boolean}
+ * @returns {boolean} True if no link is displayed, else False
  */
-export function handleEmptyLinksArrayDisplay() {
-    const links_count = utils.LINKS.length;
-    if (links_count <= 0) {
+export function handleEmptyLinksDisplay() {
+    if (!LINKS_CONTAINER.querySelector('.link-card')) {
         // show no results if there are no links
         showNoResults();
         return true;
@@ -281,22 +262,45 @@ CLOSE_GROUP_FILTER_MODAL.addEventListener('click', closeGroupFilterModal);
 // INFINITE SCROLL FUNCTIONALITY
 
 /**
- * Loads the next batch of links into the display
- * @returns {boolean} True if more links are available to load, else False
+ * Fetches the next page of the current listing into the display
+ * @returns {Promise<boolean>} True if more links are available to load, else False
  */
-export function loadMoreLinks() {
-    const linksToUse =
-        CURRENT_FILTERED_LINKS.length > 0
-            ? CURRENT_FILTERED_LINKS
-            : utils.LINKS;
-    const start = CURRENT_DISPLAYED_COUNT;
-    const end = Math.min(start + utils.LINKS_PER_PAGE, linksToUse.length);
-
-    for (let i = start; i < end; i++) {
-        const card = createLinkCard(linksToUse[i]);
-        LINKS_CONTAINER.appendChild(card);
+export async function loadMoreLinks() {
+    if (PENDING_LINK_IDS.length > 0) {
+        appendLinkCards(PENDING_LINK_IDS.splice(0, utils.LINKS_PER_PAGE));
+        return PENDING_LINK_IDS.length > 0 || HAS_MORE_LINKS;
     }
+    if (!HAS_MORE_LINKS) {
+        return false;
+    }
+    const version = LISTING_VERSION;
+    const page = await utils.getLinksPage(
+        CURRENT_SORT,
+        CURRENT_GROUP_ID,
+        NEXT_CURSOR,
+    );
+    if (version !== LISTING_VERSION) {
+        return HAS_MORE_LINKS; // another listing was displayed in the meantime
+    }
+    if (page === null) {
+        return false;
+    }
+    appendLinkCards(page.links.map((link) => link.id));
+    NEXT_CURSOR = page.next_cursor;
+    HAS_MORE_LINKS = NEXT_CURSOR !== null;
+    return HAS_MORE_LINKS;
+}
 
-    CURRENT_DISPLAYED_COUNT = end;
-    return end < linksToUse;
+/**
+ * Appends the cards of the provided links to the display
+ * @param linkIDs IDs of the links, in display order
+ */
+function appendLinkCards(linkIDs) {
+    linkIDs.forEach((id) => {
+        const link = utils.getLink(id);
+        if (link) {
+            // links deleted since they were fetched are skipped
+            LINKS_CONTAINER.appendChild(createLinkCard(link));
+        }
+    });
 }
@@ -84,33 +84,26 @@ closeGroupFilterButton.addEventListener('click', function () {
     document.getElementById('filter-select').value = currentDisplay;
 });
 
-// Fuse Search input handler
-const fuseOptions = {
-    keys: ['name'],
-    threshold: 0.3,
-    ignoreLocation: true,
-    includeScore: true,
-    includeMatches: true,
-    minMatchCharLength: 2,
-};
+// Search input handler (fuzzy search runs server side via `/api/links/search`)
 let searchTimeout;
 let linksContainer = document.getElementById('links-container');
 document.getElementById('search-input').addEventListener('input', function (e) {
     clearTimeout(searchTimeout);
-    searchTimeout = setTimeout(() => {
+    searchTimeout = setTimeout(async () => {
         const query = e.target.value;
         if (!query) {
             // user hasn't inputted anything
             display_utils.reloadLinksDisplay();
             return;
         }
-        // if we are filtering by group, use the group links, else use the standard utils.LINKS
-        const dataSet =
-            display_utils.CURRENT_FILTERED_LINKS.length > 0
-                ? display_utils.CURRENT_FILTERED_LINKS
-                : utils.LINKS;
-        const fuseObj = new Fuse(dataSet, fuseOptions); // fuse object for implementing the fuzzy search
-        const results = fuseObj.search(query);
+        // if we are filtering by group, only search the group links
+        const group =
+            utils.getCurrentDisplay() === utils.CURRENT_DISPLAY.GROUP
+                ? utils.getCurrentGroup()
+                : null;
+        const results = await utils.searchLinks(query, group?.id);
+        // a newer query was typed while this one was in flight
+        if (results === null || e.target.value !== query) return;
         // reset the links container
         linksContainer.innerHTML = '';
         // handle no results
@@ -121,7 +114,8 @@ document.getElementById('search-input').addEventListener('input', function (e) {
         // showcase the results
         display_utils.hideNoResults();
         results.forEach((result) => {
-            const card = display_utils.createLinkCard(result.item);
+            const link = utils.getLink(result.item.id) || result.item;
+            const card = display_utils.createLinkCard(link);
             linksContainer.appendChild(card);
         });
     }, 200);
@@ -129,7 +123,7 @@ document.getElementById('search-input').addEventListener('input', function (e) {
 
 // Infinite scroll implementation
 let isLoading = false;
-window.addEventListener('scroll', function () {
+window.addEventListener('scroll', async function () {
     if (isLoading) return;
 
     const scrollPosition = window.innerHeight + window.scrollY;
@@ -138,12 +132,9 @@ window.addEventListener('scroll', function () {
     if (scrollPosition >= threshold) {
         isLoading = true;
         document.getElementById('loading-indicator').classList.remove('hidden');
-        const hasMore = display_utils.loadMoreLinks();
-        if (!hasMore) {
-            document
-                .getElementById('loading-indicator')
-                .classList.add('hidden');
-        }
+        // the next page is fetched from the server
+        await display_utils.loadMoreLinks();
+        document.getElementById('loading-indicator').classList.add('hidden');
         isLoading = false;
     }
 });
@@ -153,17 +144,33 @@ window.addEventListener('scroll', function () {
  * @returns {Promise<void>}
  */
 async function init() {
-    // Load user data
-    await utils.getGroups();
-    await utils.getLinks();
+    // Load user data, embedded in the page when the dashboard snapshot is present
+    const snapshot = utils.getDashboardSnapshot();
+    if (snapshot) {
+        await utils.loadSnapshot(snapshot);
+    } else {
+        await utils.startSync();
+        await utils.getGroups();
+    }
     // Populate group filter select
     populateGroupFilterSelect();
-    // Display initial view
-    display_utils.displayRecentlyCreated();
+    // Display initial view, only its first page of links is fetched
+    await display_utils.displayRecentlyCreated();
 }
 
 window.addEventListener('DOMContentLoaded', init);
 
+// Pull the changes made in other tabs or devices when the page becomes visible again
+document.addEventListener('visibilitychange', async () => {
+    if (document.visibilityState !== 'visible') return;
+    const changed = await utils.syncChanges();
+    // don't replace search results the user is looking at
+    if (changed && !document.getElementById('search-input').value) {
+        populateGroupFilterSelect();
+        display_utils.reloadLinksDisplay();
+    }
+});
+
 window.addEventListener(
     'resize',
     utils.debounce(() => {
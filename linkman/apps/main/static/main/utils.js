@@ -56,6 +56,35 @@ export function setLinksPerPage(value) {
     LINKS_PER_PAGE = value;
 }
 
+/**
+ * Sends `GET` requests to fetch every page of a cursor paginated listing
+ * @param url Listing endpoint to fetch
+ * @param key Key of the listing in the response body
+ * @param cursor Optional cursor of the first page to fetch, `null` to start at the beginning
+ * @returns {Promise<Array>} All received items
+ */
+export async function fetchAllPages(url, key, cursor = null) {
+    const items = [];
+    do {
+        const params = new URLSearchParams();
+        if (cursor) {
+            params.set('cursor', cursor);
+        }
+        // `no-cache` revalidates with the stored ETag, unchanged pages are a 304
+        const response = await fetch(`${url}?${params}`, {
+            method: 'GET',
+            cache: 'no-cache',
+        });
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.detail);
+        }
+        items.push(...data[key]);
+        cursor = data.next_cursor;
+    } while (cursor);
+    return items;
+}
+
 /**
  * Sends a `GET` request to fetch all groups associated with the user
  *
@@ -63,38 +92,223 @@ export function setLinksPerPage(value) {
  */
 export async function getGroups() {
     try {
-        const response = await fetch('/api/groups', { method: 'GET' });
+        const groups = await fetchAllPages('/api/groups/', 'groups');
+        GROUPS.push(...groups);
+    } catch (error) {
+        console.log(`Error occurred fetching all groups: ${error}`);
+    }
+}
+
+/**
+ * Sends a `GET` request to fetch one page of the links, sorted and filtered server side
+ *
+ * Upserts the received links into the `LINKS` array
+ * @param sort Sort of the listing, `created`, `clicks` or `last_used`
+ * @param groupID Optional ID of the group to list the links of
+ * @param cursor Optional cursor of the page, `null` for the first page
+ * @returns {Promise<{links: Array, next_cursor: string|null}|null>} The page, or null if the request failed
+ */
+export async function getLinksPage(sort, groupID = null, cursor = null) {
+    const params = new URLSearchParams({ sort: sort, limit: LINKS_PER_PAGE });
+    if (groupID) {
+        params.set('group', groupID);
+    }
+    if (cursor) {
+        params.set('cursor', cursor);
+    }
+    try {
+        // `no-cache` revalidates with the stored ETag, unchanged pages are a 304
+        const response = await fetch(`/api/links/?${params}`, {
+            method: 'GET',
+            cache: 'no-cache',
+        });
+        const data = await response.json();
+        if (!response.ok) {
+            console.log(`Unable to fetch links: ${data.detail}`);
+            return null;
+        }
+        upsertById(LINKS, data.links);
+        return data;
+    } catch (error) {
+        console.log(`Error occurred fetching links: ${error}`);
+        return null;
+    }
+}
+
+let SYNC_TOKEN = null; // point in time the local `LINKS` and `GROUPS` are synced up to
+
+/**
+ * Sends a `GET` request to start syncing, must be called before the first `getGroups`/`getLinksPage`
+ */
+export async function startSync() {
+    try {
+        const response = await fetch('/api/sync/', { method: 'GET' });
         const data = await response.json();
         if (!response.ok) {
-            console.log(`Unable to fetch all groups: ${data.detail}`);
+            console.log(`Unable to start syncing: ${data.detail}`);
             return;
         }
-        data.groups.forEach((item) => {
-            GROUPS.push(item);
-        });
+        SYNC_TOKEN = data.next_token;
     } catch (error) {
-        console.log(`Error occurred fetching all groups: ${error}`);
+        console.log(`Error occurred starting sync: ${error}`);
     }
 }
 
+let SNAPSHOT_PAGES = {}; // first page of every sort of the dashboard snapshot, until the links change
+
 /**
- * Sends a `GET` request to fetch all links associated with the user
+ * Reads the dashboard snapshot embedded in the page by `json_script`
+ * @returns {Object|null} The snapshot, or null if the page has none
+ */
+export function getDashboardSnapshot() {
+    const element = document.getElementById('dashboard-snapshot');
+    if (!element) {
+        return null;
+    }
+    return JSON.parse(element.textContent);
+}
+
+/**
+ * Loads the dashboard snapshot, replaces the `startSync`/`getGroups` requests on page load
  *
- * Pushes all received links into the `LINKS` array
+ * Only the groups past the first page of the snapshot are fetched
+ * @param snapshot Dashboard snapshot, see `getDashboardSnapshot`
  */
-export async function getLinks() {
+export async function loadSnapshot(snapshot) {
+    SYNC_TOKEN = snapshot.sync_token;
+    GROUPS.push(...snapshot.groups.groups);
+    Object.values(snapshot.links).forEach((page) =>
+        upsertById(LINKS, page.links),
+    );
+    SNAPSHOT_PAGES = snapshot.links;
+    if (!snapshot.groups.next_cursor) {
+        return;
+    }
     try {
-        const response = await fetch('/api/links', { method: 'GET' });
+        const groups = await fetchAllPages(
+            '/api/groups/',
+            'groups',
+            snapshot.groups.next_cursor,
+        );
+        GROUPS.push(...groups);
+    } catch (error) {
+        console.log(`Error occurred fetching all groups: ${error}`);
+    }
+}
+
+/**
+ * Gets the first page of a sort from the dashboard snapshot
+ * @param sort Sort of the listing, `created`, `clicks` or `last_used`
+ * @returns {{links: Array, next_cursor: string|null}|null} The page, or null if the links changed since
+ */
+export function getSnapshotPage(sort) {
+    return SNAPSHOT_PAGES[sort] || null;
+}
+
+/**
+ * Drops the pages of the dashboard snapshot, must be called when the links change
+ */
+export function clearSnapshotPages() {
+    SNAPSHOT_PAGES = {};
+}
+
+/**
+ * Upserts the provided items into a list by id
+ * @param list List of groups or links to update
+ * @param items Changed items
+ */
+function upsertById(list, items) {
+    items.forEach((item) => {
+        const index = list.findIndex((existing) => existing.id === item.id);
+        if (index === -1) {
+            list.push(item);
+        } else {
+            list[index] = item;
+        }
+    });
+}
+
+/**
+ * Sends a `GET` request for the changes since the last sync and applies them to `LINKS` and `GROUPS`
+ * @returns {Promise<boolean>} True if anything changed, else False
+ */
+export async function syncChanges() {
+    if (!SYNC_TOKEN) {
+        return false;
+    }
+    try {
+        const params = new URLSearchParams({ since: SYNC_TOKEN });
+        const response = await fetch(`/api/sync/?${params}`, { method: 'GET' });
         const data = await response.json();
         if (!response.ok) {
-            console.log(`Unable to fetch links: ${data.links}`);
-            return;
+            console.log(`Unable to sync changes: ${data.detail}`);
+            return false;
         }
-        data.links.forEach((item) => {
-            LINKS.push(item);
+        if (data.reset) {
+            // too far behind, reload everything
+            SYNC_TOKEN = data.next_token;
+            GROUPS.length = 0;
+            LINKS.length = 0; // the displayed pages are fetched again on reload
+            await getGroups();
+            return true;
+        }
+        const deletedGroups = new Set(data.deleted.groups);
+        const deletedLinks = new Set(data.deleted.links);
+        upsertById(GROUPS, data.groups);
+        upsertById(LINKS, data.links);
+        // deleting a group also deletes its links
+        GROUPS = GROUPS.filter((g) => !deletedGroups.has(g.id));
+        LINKS = LINKS.filter(
+            (l) =>
+                !deletedLinks.has(l.id) &&
+                !deletedGroups.has(l.group_id || l.group),
+        );
+        SYNC_TOKEN = data.next_token;
+        return (
+            data.groups.length > 0 ||
+            data.links.length > 0 ||
+            deletedGroups.size > 0 ||
+            deletedLinks.size > 0
+        );
+    } catch (error) {
+        console.log(`Error occurred syncing changes: ${error}`);
+        return false;
+    }
+}
+
+let searchController = null; // aborts the previous search request
+
+/**
+ * Sends a `GET` request to fuzzy search the links of the user
+ * @param query Search query
+ * @param groupID Optional ID of the group to search in
+ * @returns {Promise<Array|null>} Fuse style results, or null if the request failed or was aborted
+ */
+export async function searchLinks(query, groupID = null) {
+    if (searchController) {
+        searchController.abort();
+    }
+    searchController = new AbortController();
+    const params = new URLSearchParams({ q: query, limit: '100' });
+    if (groupID) {
+        params.set('group', groupID);
+    }
+    try {
+        const response = await fetch(`/api/links/search/?${params}`, {
+            method: 'GET',
+            signal: searchController.signal,
         });
+        const data = await response.json();
+        if (!response.ok) {
+            console.log(`Unable to search links: ${data.detail}`);
+            return null;
+        }
+        return data.results;
     } catch (error) {
-        console.log(`Error occurred fetching links: ${error}`);
+        if (error.name !== 'AbortError') {
+            console.log(`Error occurred searching links: ${error}`);
+        }
+        return null;
     }
 }
 
@@ -156,6 +370,7 @@ export function getLinksCount() {
  * @param id ID of the link to remove
  */
 export function deleteLinkFromList(id) {
+    clearSnapshotPages();
     LINKS = LINKS.filter((l) => l.id !== Number(id));
 }
 
@@ -170,6 +385,7 @@ export function replaceLink(id, link) {
     if (index === -1) {
         return false;
     }
+    clearSnapshotPages();
     LINKS[index] = link;
     return true;
 }
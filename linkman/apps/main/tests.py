@@ -1 +1,166 @@
-# Create your tests here.
+import importlib
+import json
+from typing import Any
+from unittest import mock
+
+from django.apps import apps
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from ..api import cache as api_cache
+from ..api import pagination
+from ..authentication.models import CustomUser
+from ..main import normalization, snapshot
+from ..main.models import Group, Link
+
+
+class SnapshotTests(TestCase):
+    """
+    Tests of the dashboard snapshot of `snapshot.py`
+    """
+
+    user: CustomUser
+    group: Group
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = CustomUser.objects.create_user(
+            email="user@linkman.com", password="password"
+        )
+        cls.group = Group.objects.create(user=cls.user, name="Default")
+        for index in range(3):
+            Link.objects.create(
+                user=cls.user,
+                group=cls.group,
+                name=f"Link {index}",
+                url=f"https://example.com/{index}",
+                click_count=index,
+            )
+        CustomUser.objects.filter(pk=cls.user.pk).update(total_groups=1, total_links=3)
+        cls.user.refresh_from_db()
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_snapshot_holds_the_first_pages(self) -> None:
+        data: dict[str, Any] = snapshot.get_snapshot(self.user)
+        self.assertEqual(data["counts"], {"groups": 1, "links": 3})
+        self.assertEqual(
+            [group["name"] for group in data["groups"]["groups"]], ["Default"]
+        )
+        self.assertEqual(data["links"].keys(), set(pagination.LINK_SORTS))
+        self.assertEqual(
+            [link["name"] for link in data["links"]["clicks"]["links"]],
+            ["Link 2", "Link 1", "Link 0"],
+        )
+        self.assertIsNone(data["links"]["created"]["next_cursor"])
+        self.assertTrue(data["sync_token"])
+
+    def created_names(self) -> list[str]:
+        """
+        Lists the newest links of the snapshot of the user
+        :return: Link names of the `created` page of the snapshot
+        """
+        page: dict[str, Any] = snapshot.get_snapshot(self.user)["links"]["created"]
+        return [link["name"] for link in page["links"]]
+
+    def test_snapshot_is_cached_until_the_data_changes(self) -> None:
+        snapshot.get_snapshot(self.user)
+        with self.assertNumQueries(0):
+            snapshot.get_snapshot(self.user)
+        Link.objects.create(
+            user=self.user, group=self.group, name="New", url="https://new.com"
+        )
+        self.assertNotIn("New", self.created_names())
+        with self.captureOnCommitCallbacks(execute=True):
+            api_cache.bump_data_version(self.user.pk)
+        self.assertEqual(self.created_names()[0], "New")
+
+    def test_dashboard_embeds_the_snapshot(self) -> None:
+        response = self.client.get("/dashboard/")
+        self.assertEqual(response.status_code, 200)
+        embedded: str = (
+            response.content.decode()
+            .split('<script id="dashboard-snapshot" type="application/json">', 1)[1]
+            .split("</script>", 1)[0]
+        )
+        self.assertEqual(
+            json.loads(embedded)["counts"], snapshot.get_snapshot(self.user)["counts"]
+        )
+
+    def test_dashboard_requires_a_login(self) -> None:
+        self.client.logout()
+        response = self.client.get("/dashboard/")
+        self.assertEqual(response.status_code, 302)
+
+
+class NormalizationTests(SimpleTestCase):
+    """
+    Tests of the URL normalization of `normalization.py`
+    """
+
+    def test_equivalent_urls_share_a_form(self) -> None:
+        cases: dict[str, list[str]] = {
+            "https://example.com/docs": [
+                "HTTPS://Example.COM/docs/",
+                "https://example.com:443/docs",
+                "  https://example.com/docs?utm_source=mail&fbclid=1 ",
+            ],
+            "http://example.com/?a=1&b=2": [
+                "example.com?b=2&a=1",
+                "http://example.com:80/?b=2&UTM_campaign=x&a=1",
+            ],
+            "https://user:pw@[::1]:8443/": ["https://user:pw@[::1]:8443"],
+        }
+        for expected, urls in cases.items():
+            for url in urls:
+                with self.subTest(url):
+                    self.assertEqual(normalization.normalize_url(url), expected)
+                    self.assertEqual(
+                        normalization.hash_url(url), normalization.hash_url(expected)
+                    )
+
+    def test_different_urls_keep_their_differences(self) -> None:
+        urls: list[str] = [
+            "https://example.com/docs",
+            "http://example.com/docs",
+            "https://example.com/Docs",
+            "https://example.com:8443/docs",
+            "https://example.com/docs?page=2",
+            "https://example.com/docs#intro",
+        ]
+        hashes: set[str] = {normalization.hash_url(url) for url in urls}
+        self.assertEqual(len(hashes), len(urls))
+        self.assertEqual(
+            {len(url_hash) for url_hash in hashes}, {normalization.URL_HASH_LENGTH}
+        )
+
+    def test_unparsable_url_is_kept(self) -> None:
+        self.assertEqual(
+            normalization.normalize_url(" http://example.com:port/ "),
+            "http://example.com:port/",
+        )
+
+
+class UrlHashMigrationTests(TestCase):
+    """
+    Tests of the backfill of `0011_link_url_hash.py`
+    """
+
+    def test_backfill_stores_the_hash_of_every_link(self) -> None:
+        user: CustomUser = CustomUser.objects.create_user(
+            email="user@linkman.com", password="password"
+        )
+        group: Group = Group.objects.create(user=user, name="Default")
+        urls: list[str] = ["Example.com/a/", "https://example.com/b?utm_id=1"]
+        for url in urls:
+            Link.objects.create(user=user, group=group, name=url, url=url)
+        Link.objects.update(url_hash="")
+        migration = importlib.import_module("apps.main.migrations.0011_link_url_hash")
+        with mock.patch.object(migration, "BACKFILL_BATCH_SIZE", 1):
+            migration.backfill_url_hashes(apps, None)
+        self.assertEqual(
+            sorted(Link.objects.values_list("url_hash", flat=True)),
+            sorted(normalization.hash_url(url) for url in urls),
+        )
@@ -3,8 +3,16 @@ from django.contrib.auth.decorators import login_required
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import render
 
+from ..authentication.models import CustomUser
+from ..main import snapshot
+
 
 @login_required
 def dashboard(request: HttpRequest) -> HttpResponse:
     """Dashboard page for the application"""
-    return render(request, "main/dashboard.html")
+    assert isinstance(request.user, CustomUser)  # `login_required` rejects anonymous
+    return render(
+        request,
+        "main/dashboard.html",
+        {"snapshot": snapshot.get_snapshot(request.user)},
+    )
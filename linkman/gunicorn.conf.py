@@ -0,0 +1,27 @@
+"""
+Gunicorn configuration for linkman, run `gunicorn` from the directory of `manage.py`
+
+SERVER_MODE=wsgi (default): sync workers serving `linkman.wsgi`, one request per
+worker at a time, so they must sit behind a buffering proxy (nginx).
+SERVER_MODE=asgi: uvicorn workers serving `linkman.asgi`, one worker serves many
+requests while they wait on I/O, `ASYNC_API=True` also routes the async api views
+(requires `linkman[asgi]`).
+"""
+
+import multiprocessing
+import os
+
+SERVER_MODE: str = os.getenv("SERVER_MODE", "wsgi").lower()
+
+bind: str = os.getenv("GUNICORN_BIND", "127.0.0.1:8000")
+workers: int = int(
+    os.getenv("GUNICORN_WORKERS", str(multiprocessing.cpu_count() * 2 + 1))
+)
+timeout: int = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+
+if SERVER_MODE == "asgi":
+    wsgi_app: str = "linkman.asgi:application"
+    worker_class: str = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "linkman.wsgi:application"
+    worker_class = "sync"
@@ -0,0 +1,58 @@
+"""
+This module stores the logging handlers of the project
+
+Every logger writes to one `ModelQueueHandler`, which only puts the record on a
+queue. A `StartedQueueListener` thread takes the records off the queue and
+hands them to the file and console handlers, so the JSON formatting, the disk
+writes and the rotation never run on a request thread.
+"""
+
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from queue import Queue
+from typing import Any
+
+from django.db.models import Model
+
+# attributes every record has, anything else was passed through `extra`
+RECORD_ATTRIBUTES: frozenset[str] = frozenset(
+    (*vars(logging.makeLogRecord({})), "message", "asctime", "taskName")
+)
+
+
+class ModelQueueHandler(QueueHandler):
+    """
+    Queue handler reducing the model instances passed through `extra` to their id
+
+    The listener formats the record later, in another thread. By then the
+    instance may have been changed, and formatting it may load deferred fields
+    or the lazy `request.user` on a connection of the wrong thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = super().prepare(record)
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and isinstance(value, Model):
+                setattr(record, key, value.pk)
+        return record
+
+
+class StartedQueueListener(QueueListener):
+    """
+    Queue listener starting its thread as soon as logging is configured
+
+    `dictConfig` creates the listener but leaves starting it to the caller,
+    which would be a different place for the server, the workers and every
+    management command. Stopping it at exit writes the records still queued.
+    """
+
+    def __init__(
+        self,
+        queue: Queue[Any],
+        *handlers: logging.Handler,
+        respect_handler_level: bool = False,
+    ) -> None:
+        super().__init__(queue, *handlers, respect_handler_level=respect_handler_level)
+        self.start()
+        atexit.register(self.stop)
@@ -72,6 +72,7 @@ INSTALLED_APPS: list[str | Any] = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",  # pg_trgm lookups used by the link search
     "tailwind",
     "theme",
     *MY_APPS,
@@ -87,6 +88,7 @@ TAILWIND_APP_NAME = "theme"
 TAILWIND_DEV_MODE = DEV_ENV
 
 MIDDLEWARE = [
+    "apps.api.middleware.RequestMetricsMiddleware",  # first, so it times everything
     "django.middleware.security.SecurityMiddleware",
     "django_browser_reload.middleware.BrowserReloadMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -95,13 +97,19 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "django_ratelimit.middleware.RatelimitMiddleware",
+    # every middleware is async capable, so the async api views run on the event loop
+    "apps.api.middleware.RatelimitMiddleware",
 ]
 
 # Session Configuration
-SESSION_ENGINE = (
-    "django.contrib.sessions.backends.db"  # Store the session in the Database
-)
+SESSION_ENGINES: dict[str, str] = {
+    "db": "django.contrib.sessions.backends.db",  # one SELECT per request
+    # read from redis, written through to the database so sessions survive a flush
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "cache": "django.contrib.sessions.backends.cache",  # redis only
+}
+SESSION_ENGINE = SESSION_ENGINES[os.getenv("SESSION_MODE", "cached_db").lower()]
+SESSION_CACHE_ALIAS: str = "default"  # the django-redis pool
 SESSION_COOKIE_AGE: int = (
     60 * 60 * 24 * 7 * 2
 )  # Cookie length stored in seconds (2 Weeks Here)
@@ -122,12 +130,29 @@ if not DEV_ENV:
     )  # noqa: E731
     RATELIMIT_USE_CACHE = "default"
 
+# The cached backend first, sessions created through the plain backend stay valid
+AUTHENTICATION_BACKENDS: list[str] = [
+    "apps.authentication.backends.CachedModelBackend",
+    "django.contrib.auth.backends.ModelBackend",
+]
+
+# Bearer token Prometheus scrapes `/api/internal/metrics/` with, staff can always read it
+METRICS_TOKEN: str | None = os.getenv("METRICS_TOKEN")
+
 LOGIN_URL: str = "login_page"
 LOGOUT_REDIRECT_URL: str = "landing_page"
 
 # EMAIL CONFIGURATION (Working via django-sendgrid package)
+# Emails are queued in the outbox and sent by `manage.py send_queued_emails`
 SENDGRID_API_KEY = get_env_var("SENDGRID_API_KEY")
-EMAIL_BACKEND = "sendgrid_backend.SendgridBackend"
+EMAIL_BACKENDS: dict[str, str] = {
+    "sendgrid": "sendgrid_backend.SendgridBackend",
+    "file": "django.core.mail.backends.filebased.EmailBackend",  # no network
+    "console": "django.core.mail.backends.console.EmailBackend",
+    "locmem": "django.core.mail.backends.locmem.EmailBackend",
+}
+EMAIL_BACKEND = EMAIL_BACKENDS[os.getenv("EMAIL_MODE", "sendgrid").lower()]
+EMAIL_FILE_PATH = BASE_DIR / "logs" / "emails"  # used by the file backend
 DEFAULT_FROM_EMAIL = get_env_var("EMAIL_FROM_USER")
 EMAIL_FROM_USER = get_env_var("EMAIL_FROM_USER")
 
@@ -159,6 +184,17 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "linkman.wsgi.application"
+ASGI_APPLICATION = "linkman.asgi.application"
+
+# "wsgi" (gunicorn sync workers) or "asgi" (uvicorn workers), see gunicorn.conf.py
+SERVER_MODE: str = os.getenv("SERVER_MODE", "wsgi").lower()
+# Route the async api views when served over ASGI. Opt-in: the async ORM and cache
+# still run every query in a thread: on the `benchmark` http phase (2 uvicorn
+# workers, 20 clients) GET /api/links/ served 192 req/s with the sync views and
+# 93 req/s with the async views. Slow clients are handled by the event loop either way.
+ASYNC_API: bool = SERVER_MODE == "asgi" and (
+    os.getenv("ASYNC_API", "False").lower() in ("true", "yes", "1")
+)
 
 # Ensure logs directory and files exist
 LOGS_DIR = BASE_DIR / "logs"
@@ -174,6 +210,8 @@ for log_file in [
     log_path = LOGS_DIR / log_file
     log_path.touch(exist_ok=True)
 
+# Loggers only enqueue their records, a listener thread formats and writes them,
+# see `log_handlers.py`. The filters route every record to the file of its logger.
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -191,12 +229,34 @@ LOGGING = {
             "style": "{",
         },
     },
+    "filters": {
+        # App names must match logger names
+        "error": {"name": "error"},
+        "django": {"name": "django"},
+        "authentication": {"name": "apps.authentication"},
+        "main": {"name": "apps.main"},
+        "api": {"name": "apps.api"},
+    },
     "handlers": {
+        "queue": {
+            "class": "linkman.log_handlers.ModelQueueHandler",
+            "listener": "linkman.log_handlers.StartedQueueListener",
+            "handlers": [
+                "error_file",
+                "django_file",
+                "authentication_file",
+                "main_file",
+                "api_file",
+                "console",
+            ],
+            "respect_handler_level": True,
+        },
         "error_file": {
             "level": "INFO",
             "class": "logging.handlers.RotatingFileHandler",
             "filename": BASE_DIR / "logs" / "error.log",
             "formatter": "json",
+            "filters": ["error"],
             "maxBytes": 10485760,  # 10MB
             "backupCount": 3,
         },
@@ -205,6 +265,7 @@ LOGGING = {
             "class": "logging.handlers.RotatingFileHandler",
             "filename": BASE_DIR / "logs" / "django.log",
             "formatter": "verbose",
+            "filters": ["django"],
             "maxBytes": 10485760,  # 10MB
             "backupCount": 3,
         },
@@ -213,6 +274,7 @@ LOGGING = {
             "class": "logging.handlers.RotatingFileHandler",
             "filename": BASE_DIR / "logs" / "authentication.log",
             "formatter": "json",
+            "filters": ["authentication"],
             "maxBytes": 10485760,  # 10MB
             "backupCount": 3,
         },
@@ -221,6 +283,7 @@ LOGGING = {
             "class": "logging.handlers.RotatingFileHandler",
             "filename": BASE_DIR / "logs" / "main.log",
             "formatter": "json",
+            "filters": ["main"],
             "maxBytes": 10485760,  # 10MB
             "backupCount": 3,
         },
@@ -229,6 +292,7 @@ LOGGING = {
             "class": "logging.handlers.RotatingFileHandler",
             "filename": BASE_DIR / "logs" / "api.log",
             "formatter": "json",
+            "filters": ["api"],
             "maxBytes": 10485760,  # 10MB
             "backupCount": 3,
         },
@@ -239,29 +303,28 @@ LOGGING = {
         },
     },
     "loggers": {
-        # App names must match logger names
         "error": {
-            "handlers": ["error_file", "console"],
+            "handlers": ["queue"],
             "level": "ERROR",
             "propagate": False,
         },
         "django": {
-            "handlers": ["django_file", "console"],
+            "handlers": ["queue"],
             "level": "INFO",
             "propagate": True,
         },
         "apps.authentication": {  # Custom logger for 'authentication'
-            "handlers": ["authentication_file", "console"],
+            "handlers": ["queue"],
             "level": "INFO",
             "propagate": False,
         },
         "apps.main": {  # Custom logger for 'main'
-            "handlers": ["main_file", "console"],
+            "handlers": ["queue"],
             "level": "INFO",
             "propagate": False,
         },
         "apps.api": {  # Custom logger for 'api'
-            "handlers": ["api_file", "console"],
+            "handlers": ["queue"],
             "level": "INFO",
             "propagate": False,
         },
@@ -270,28 +333,34 @@ LOGGING = {
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
-if DEV_ENV:
-    DATABASES = {
-        "default": {
-            "ENGINE": "django.db.backends.postgresql",
-            "NAME": get_env_var("DB_NAME"),
-            "USER": get_env_var("DB_USER"),
-            "PASSWORD": get_env_var("DB_PASSWORD"),
-            "HOST": get_env_var("DB_HOST"),
-            "PORT": get_env_var("DB_PORT"),
-        }
+DATABASES: dict[str, dict[str, Any]] = {
+    "default": {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": get_env_var("DB_NAME" if DEV_ENV else "PROD_NAME"),
+        "USER": get_env_var("DB_USER" if DEV_ENV else "PROD_USER"),
+        "PASSWORD": get_env_var("DB_PASSWORD"),
+        "HOST": get_env_var("DB_HOST"),
+        "PORT": get_env_var("DB_PORT"),
+        # check reused connections before a request uses them
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {},
     }
-else:
-    DATABASES = {
-        "default": {
-            "ENGINE": "django.db.backends.postgresql",
-            "NAME": get_env_var("PROD_NAME"),
-            "USER": get_env_var("PROD_USER"),
-            "PASSWORD": get_env_var("DB_PASSWORD"),
-            "HOST": get_env_var("DB_HOST"),
-            "PORT": get_env_var("DB_PORT"),
-        }
+}
+# psycopg 3 native connection pool (`linkman[pool]`), shared by the threads of a worker
+DB_POOL: bool = os.getenv("DB_POOL", "False").lower() in ("true", "yes", "1")
+if DB_POOL:
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+        "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+        "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),  # seconds to wait
     }
+    DATABASES["default"]["CONN_MAX_AGE"] = 0  # the pool does the reuse
+else:
+    # Seconds a connection is reused across requests. Async views run every request
+    # in a new thread, which can not reuse a connection, so ASGI uses the pool instead.
+    DATABASES["default"]["CONN_MAX_AGE"] = int(
+        os.getenv("DB_CONN_MAX_AGE", "0" if SERVER_MODE == "asgi" else "60")
+    )
 
 
 CACHES = {
@@ -15,6 +15,7 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+from apps.api import views as api_views
 from django.contrib import admin
 from django.urls import include, path
 
@@ -26,4 +27,7 @@ urlpatterns = [
     path("", include("apps.authentication.urls")),  # Auth application
     path("dashboard/", include("apps.main.urls")),  # Main application
     path("api/", include("apps.api.urls")),  # Api application for AJAX calls
+    path(
+        "r/<int:link_id>", api_views.link_redirect, name="link_redirect"
+    ),  # Click redirect of a link
 ]